@@ -1,20 +1,15 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support import expected_conditions as EC
 import time
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
 import pandas as pd
-import time
-import re
-import requests
 from dotenv import load_dotenv
 import os
 import logging
+from clean_pool import CleaningPool
+from file_lock import file_lock
+from catalog import SnapshotCatalog, register_snapshot
+from snapshot_events import record_snapshot_events
+from delinquency import record_delinquency
+from run_ledger import RunLedger, DOWNLOADED, CLEANED, PUBLISHED, FAILED
 
 load_dotenv()
 
@@ -25,8 +20,7 @@ logging.basicConfig(
 )
 
 
-# Define paths and credentials
-CHROMEDRIVER_PATH = r"C:\Users\SelengeTulga\Documents\chromedriver64\chromedriver.exe"
+# Define paths and credentials (chromedriver, headless mode and the browser profile: see browser_profile.py)
 LOGIN_URL = os.getenv('APPFOLIO_LOGIN_URL')
 WORK_ORDER_URL = os.getenv('WORK_ORDER_URL')
 LEASING_FUNNEL_URL = os.getenv('LEASING_FUNNEL_URL')
@@ -39,7 +33,22 @@ BILL_URL = os.getenv('BILL_URL')
 USERNAME = os.getenv('APPFOLIO_USERNAME')
 PASSWORD = os.getenv('APPFOLIO_PASSWORD')
 
-BASE_DOWNLOAD_FOLDER = r"C:\Users\SelengeTulga\Documents\GitHub\infinity_bh_appfolio\data"
+# APPFOLIO_DATA_FOLDER points a run elsewhere, e.g. a scratch folder for bench_ingestion.py
+BASE_DOWNLOAD_FOLDER = os.getenv('APPFOLIO_DATA_FOLDER', r"C:\Users\SelengeTulga\Documents\GitHub\infinity_bh_appfolio\data")
+
+# Exports larger than this are cleaned in streaming mode, CLEAN_CHUNK_ROWS rows at a time
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+CLEAN_CHUNK_ROWS = 50000
+
+# Cumulative general ledger every ledger export is merged into (relative to the working directory)
+GENERAL_LEDGER_HISTORY = "data/general_ledger3_cleaned.csv"
+
+# Set APPFOLIO_DOWNLOAD_WATCHER=1 when download_watcher.py is running on BASE_DOWNLOAD_FOLDER
+WATCHER_MODE = os.getenv('APPFOLIO_DOWNLOAD_WATCHER') == '1'
+
+# A failed report download is retried on a fresh tab after 30s, then 60s, ...
+DOWNLOAD_ATTEMPTS = int(os.getenv('APPFOLIO_DOWNLOAD_ATTEMPTS', '3'))
+RETRY_BACKOFF_SECONDS = float(os.getenv('APPFOLIO_RETRY_BACKOFF', '30'))
 
 # Define separate folders for each CSV type
 TENANT_FOLDER = os.path.join(BASE_DOWNLOAD_FOLDER, "tenant_data")
@@ -66,6 +75,8 @@ formatted_one_year_ago_first_day = one_year_ago_first_day.strftime("%m/%d/%Y")
 
 
 def get_trailing_month_end_dates(today):
+    from dateutil.relativedelta import relativedelta
+
     trailing_months = []
     for i in range(1, 13):  # 1 to 12 months ago
         first_day = (today.replace(day=1) - relativedelta(months=i))
@@ -78,54 +89,33 @@ API_TOKEN = os.getenv('SIMPLE_TEXTING_API_TOKEN')
 API_URL = os.getenv('SIMPLE_TEXTING_API_URL')
 ACCOUNT_PHONE = os.getenv('SIMPLE_TEXTING_ACCOUNT_PHONE')
 
+_sms_provider = None
 
-def get_latest_message():
-    """Fetch the latest message from SimpleTexting API with retry on 429 error."""
-    params = {"page": 0, "size": 1, "accountPhone": ACCOUNT_PHONE}
-    headers = {"Authorization": f"Bearer {API_TOKEN}", "Accept": "application/json"}
-    
-    for attempt in range(3):  # Retry up to 3 times
-        try:
-            response = requests.get(API_URL, headers=headers, params=params)
-            if response.status_code == 429:
-                print("Too many requests. Waiting 10 seconds before retrying...")
-                logging.info("Too many requests. Waiting 10 seconds before retrying...")
-                time.sleep(10)  # Wait before retrying
-                continue
-            response.raise_for_status()
-
-            messages = response.json().get("content", [])
-            return messages[0] if messages else None
 
-        except requests.RequestException as e:
-            print(f"API Error: {e}")
-            logging.info(f"API Error: {e}")
+def get_sms_provider():
+    """Return the process-wide verification code provider (one keep-alive session)."""
+    global _sms_provider
+    if _sms_provider is None:
+        from sms_verification import build_provider
+        _sms_provider = build_provider()
+    return _sms_provider
 
-    print("Failed to retrieve messages after multiple attempts.")
-    logging.info("Failed to retrieve messages after multiple attempts.")
-    return None
 
+def get_latest_message():
+    """Fetch the latest message from SimpleTexting API with rate limiting and backoff."""
+    return get_sms_provider().get_latest_message()
 
 
 def wait_for_new_code(previous_message_id):
     """Wait for a new verification code that is different from the previous one."""
-    max_wait_time = 30  # Maximum time to wait (in seconds)
-    wait_interval = 2  # Check every 2 seconds
-
-    for _ in range(max_wait_time // wait_interval):
-        latest_message = get_latest_message()
-        if latest_message and latest_message["id"] != previous_message_id:
-            match = re.search(r"\b\d{6}\b", latest_message["text"])  # Extract 6-digit code
-            if match:
-                return match.group(0)
-        time.sleep(wait_interval)
-
-    print(" Failed to retrieve a new verification code within the time limit.")
-    logging.info(" Failed to retrieve a new verification code within the time limit.")
-    return None
+    return get_sms_provider().wait_for_new_code(previous_message_id)
 
 def click_update_button(driver):
     """Click the Columns tab, check the checkboxes, and click the Update button."""
+    # Selenium is only loaded by the scraping path; cleaning doesn't need it
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     try:
         update_button = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.XPATH, "//button[text()='Update']"))
@@ -141,6 +131,9 @@ def click_update_button(driver):
 
 def open_dropdown_and_click_csv(driver):
     """Open dropdown and click the Export CSV button, and verify if it was successful."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     try:
         # Open the dropdown menu
         dropdown_button = WebDriverWait(driver, 10).until(
@@ -174,7 +167,8 @@ def get_latest_csv(downloads_folder, max_wait_time=30):
     
     for _ in range(max_wait_time // 2):  # Check every 2 seconds, up to 30 seconds
         files = os.listdir(downloads_folder)
-        csv_files = [f for f in files if f.endswith('.csv')]
+        # Skip our own cleaned outputs, which background cleaners may write at any time
+        csv_files = [f for f in files if f.endswith('.csv') and '_cleaned' not in f]
         if csv_files:
             latest_file = max([os.path.join(downloads_folder, f) for f in csv_files], key=os.path.getctime)
             print(f" Latest downloaded file: {latest_file}")
@@ -207,8 +201,54 @@ def is_summary_like(row):
         len([x for x in row if pd.notna(x)]) <= 3
     )
 
-def clean_csv(file_path,file_prefix, type):
-     
+def cleaned_output_path(file_prefix):
+    """Pick a unique '<prefix>_cleaned_<timestamp>.csv' path (parallel cleaners can share a prefix).
+
+    The path's '.part' sibling is created to reserve it; write there and publish_cleaned_csv()
+    renames it into place, so readers never see a half-written snapshot.
+    """
+    stamp = datetime.now()
+    while True:
+        output_path = os.path.join(BASE_DOWNLOAD_FOLDER, f"{file_prefix}_cleaned_{stamp.strftime('%Y%m%d_%H%M%S')}.csv")
+        if not os.path.exists(output_path):
+            try:
+                with open(output_path + ".part", "x"):
+                    return output_path
+            except FileExistsError:
+                pass
+        stamp += timedelta(seconds=1)
+
+def publish_cleaned_csv(output_path):
+    """Atomically move a finished '<output_path>.part' into place and record it in the catalog."""
+    os.replace(output_path + ".part", output_path)
+    catalog_snapshot(output_path)
+    return output_path
+
+def catalog_snapshot(path):
+    # A catalog failure must not lose a cleaned file; `catalog.py backfill` can pick it up later
+    try:
+        register_snapshot(path)
+    except Exception as e:
+        print(f"[WARNING] Could not catalog {path}: {e}")
+        logging.info(f"[WARNING] Could not catalog {path}: {e}")
+    # Unit events (move-ins/outs, status, rent, delinquency) are diffed from each new rent roll and tenant list
+    try:
+        record_snapshot_events(path)
+    except Exception as e:
+        print(f"[WARNING] Could not log unit events for {path}: {e}")
+        logging.info(f"[WARNING] Could not log unit events for {path}: {e}")
+    # Rent roll balances are stored numerically and aged once, as they arrive
+    try:
+        record_delinquency(path)
+    except Exception as e:
+        print(f"[WARNING] Could not record delinquency for {path}: {e}")
+        logging.info(f"[WARNING] Could not record delinquency for {path}: {e}")
+
+def clean_csv(file_path,file_prefix, type, chunksize=None):
+    # Large exports (multi-year ledgers, bills) go through the streaming cleaner
+    if chunksize or os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES:
+        return clean_csv_chunked(file_path, file_prefix, type, chunksize or CLEAN_CHUNK_ROWS)
+
     df = pd.read_csv(file_path)
     df = df.copy()
         # Add the new column for Property Name, initially empty
@@ -299,31 +339,211 @@ def clean_csv(file_path,file_prefix, type):
         # Reset index for a cleaner output
         df.reset_index(drop=True, inplace=True)
 
-        general_ledger3_cleaned = pd.read_csv("data/general_ledger3_cleaned.csv")
+        # Cleaning workers merge ledger exports in parallel; one read-modify-write at a time
+        with file_lock(GENERAL_LEDGER_HISTORY + ".lock"):
+            general_ledger3_cleaned = pd.read_csv(GENERAL_LEDGER_HISTORY)
 
-        # Assuming the existing general_ledger df is already cleaned as you described
-        general_ledger_combined = pd.concat([df, general_ledger3_cleaned], ignore_index=True)
+            # Assuming the existing general_ledger df is already cleaned as you described
+            general_ledger_combined = pd.concat([df, general_ledger3_cleaned], ignore_index=True)
 
-        # Reset the index for a cleaner dataframe
-        general_ledger_combined.reset_index(drop=True, inplace=True)
+            # Reset the index for a cleaner dataframe
+            general_ledger_combined.reset_index(drop=True, inplace=True)
 
-        general_ledger_combined.drop_duplicates(inplace=True)
+            general_ledger_combined.drop_duplicates(inplace=True)
 
-        general_ledger_combined.to_csv("data/general_ledger3_cleaned.csv", index=False)
+            general_ledger_combined.to_csv(GENERAL_LEDGER_HISTORY, index=False)
+            catalog_snapshot(GENERAL_LEDGER_HISTORY)
 
 
     else:         
         print(file_prefix)
         
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_path = f'C:\\Users\\SelengeTulga\\Documents\\GitHub\\infinity_bh_appfolio\\data\\{file_prefix}_cleaned_{timestamp}.csv'
+    output_path = cleaned_output_path(file_prefix)
     
-    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    df.to_csv(output_path + ".part", index=False, encoding='utf-8-sig')
+    publish_cleaned_csv(output_path)
     print(f"CSV saved to: {output_path}")
     # logging.info(f"CSV saved to: {output_path}")
+    return output_path
+
+def _uses_property_headers(file_prefix, type):
+    return file_prefix in ('rentroll', 'work_order', 'purchase_order') or type == 2
+
+def _footer_rows(file_prefix, type):
+    """Number of trailing rows clean_csv drops as footer for this report."""
+    if _uses_property_headers(file_prefix, type) or file_prefix == 'bill':
+        return 2
+    if file_prefix in ('tenant_data', 'prospect'):
+        return 1
+    return 0
+
+def _header_mask(df):
+    first_col = df.columns[0]
+    return df[first_col].astype(str).str.strip().str.startswith('->')
+
+def _resolve_property_headers(chunk, state, final=False):
+    """Fill 'Property Name' from '->' header rows and drop headers plus the summary row above each.
+
+    The last raw row of every chunk is held back in state['carry'] because whether it is a
+    summary row depends on the first row of the next chunk; state['property'] carries the
+    current '->' header across the boundary.
+    """
+    if state['carry'] is not None:
+        frame = state['carry'] if chunk is None else pd.concat([state['carry'], chunk], ignore_index=True)
+    elif chunk is None:
+        return None
+    else:
+        frame = chunk.reset_index(drop=True)
+
+    if final:
+        state['carry'] = None
+        body_len = len(frame)
+    else:
+        state['carry'] = frame.iloc[-1:]
+        body_len = len(frame) - 1
+
+    first_col = frame.columns[0]
+    header_mask = _header_mask(frame)
+    header_indices = header_mask[header_mask].index
+
+    rows_to_drop = set(header_indices)
+    for idx in header_indices:
+        if idx > 0 and is_summary_like(frame.iloc[idx - 1]):
+            rows_to_drop.add(idx - 1)
+
+    names = frame['Property Name'].astype(object)
+    names[header_mask] = frame.loc[header_mask, first_col].apply(parse_property_name_with_string)
+    names = names.ffill()
+    if pd.notna(state['property']):
+        names = names.fillna(state['property'])
+    frame['Property Name'] = names
+
+    body = frame.iloc[:body_len]
+    if body_len:
+        state['property'] = body['Property Name'].iloc[-1]
+    return body.drop(index=[i for i in rows_to_drop if i < body_len])
+
+def _finish_cleaned_chunk(df, file_prefix):
+    """Row-local cleaning steps that run after the footer has been held back."""
+    if file_prefix == 'bill':
+        df = df[df['Reference'].notna()]
+        df['Property Name'] = df['Property'].apply(parse_property_name)
+        df["GL Account Name"] = df["GL Account"].str.split(" - ", n=1).str[1]
+
+    elif file_prefix in ('guest', 'tenant_data'):
+        df['Property Name'] = df['Property'].apply(parse_property_name)
+
+    elif file_prefix == 'general_ledger':
+        df['Property Name'] = df['Property'].apply(parse_property_name)
+        keywords_to_remove = ["Starting Balance", "Net Change", "Total", ""]
+        df = df[~df["Property"].str.strip().isin(keywords_to_remove)]
+        df = df.dropna(how='all')
+        df = df[df["Property"].str.strip() != ""]
+        df = df[df["Date"].str.strip() != ""]
+        df = df[df["Property Name"].str.strip() != ""]
+
+    return df
+
+def _merge_into_general_ledger_history(cleaned_path, history_path=GENERAL_LEDGER_HISTORY, chunksize=CLEAN_CHUNK_ROWS):
+    """Append rows of a cleaned ledger export to the cumulative ledger without loading either file.
+
+    Duplicates are detected with 64-bit row hashes, so memory grows with the number of rows
+    (8 bytes each) instead of the size of the ledger. Merges are serialised with a lock file
+    next to the ledger, so parallel cleaning workers don't lose each other's rows.
+    """
+    with file_lock(history_path + ".lock"):
+        _merge_locked(cleaned_path, history_path, chunksize)
+
+def _merge_locked(cleaned_path, history_path, chunksize):
+    seen = set()
+    columns = None
+    tmp_path = f"{history_path}.{os.getpid()}.part"
+
+    with open(tmp_path, "w", encoding="utf-8", newline="") as out:
+        if os.path.exists(history_path):
+            for chunk in pd.read_csv(history_path, chunksize=chunksize, dtype=str):
+                columns = columns or list(chunk.columns)
+                hashes = pd.util.hash_pandas_object(chunk, index=False)
+                keep = ~hashes.duplicated() & ~hashes.isin(seen)
+                seen.update(hashes[keep])
+                chunk[keep].to_csv(out, index=False, header=out.tell() == 0)
+
+        for chunk in pd.read_csv(cleaned_path, chunksize=chunksize, dtype=str, encoding='utf-8-sig'):
+            if columns:
+                chunk = chunk.reindex(columns=columns)
+            hashes = pd.util.hash_pandas_object(chunk, index=False)
+            keep = ~hashes.duplicated() & ~hashes.isin(seen)
+            seen.update(hashes[keep])
+            chunk[keep].to_csv(out, index=False, header=out.tell() == 0)
+
+    os.replace(tmp_path, history_path)
+    catalog_snapshot(history_path)
+
+def clean_csv_chunked(file_path, file_prefix, type, chunksize=CLEAN_CHUNK_ROWS):
+    """Streaming variant of clean_csv: reads `chunksize` rows at a time and writes output incrementally.
+
+    Peak memory is bounded by the chunk size. Values are read as strings so every chunk is
+    parsed the same way regardless of what the rows in it look like.
+    """
+    property_headers = _uses_property_headers(file_prefix, type)
+    footer = _footer_rows(file_prefix, type)
+    state = {'property': pd.NA, 'carry': None}
+    held = None
+    rows_written = 0
+
+    output_path = cleaned_output_path(file_prefix)
+
+    def emit(frame, out, final=False):
+        nonlocal held, rows_written
+        if held is not None:
+            frame = held if frame is None else pd.concat([held, frame], ignore_index=True)
+            held = None
+        if frame is None:
+            return
+        # Hold back the last `footer` rows until we know whether they are the real footer
+        if footer:
+            if final:
+                frame = frame.iloc[:-footer]
+            else:
+                held = frame.iloc[-footer:]
+                frame = frame.iloc[:-footer]
+        frame = _finish_cleaned_chunk(frame.copy(), file_prefix)
+        if len(frame) or out.tell() == 0:
+            frame.to_csv(out, index=False, header=out.tell() == 0)
+            rows_written += len(frame)
+
+    with open(output_path + ".part", "w", encoding="utf-8-sig", newline="") as out:
+        for chunk in pd.read_csv(file_path, chunksize=chunksize, dtype=str):
+            chunk['Property Name'] = pd.NA
+            if property_headers:
+                chunk = _resolve_property_headers(chunk, state)
+            elif file_prefix in ('bill', 'guest', 'general_ledger'):
+                chunk = chunk[~_header_mask(chunk)]
+            emit(chunk, out)
+
+        if property_headers:
+            emit(_resolve_property_headers(None, state, final=True), out, final=True)
+        else:
+            emit(None, out, final=True)
 
-def download_csv(driver, page_url, type, file_prefix, target_date=None):
-    """Navigate to a page, download CSV for a specific date, and move it to the correct folder."""
+    publish_cleaned_csv(output_path)
+
+    if file_prefix == 'general_ledger':
+        _merge_into_general_ledger_history(output_path, chunksize=chunksize)
+
+    print(f"CSV saved to: {output_path} ({rows_written} rows, streamed in chunks of {chunksize})")
+    logging.info(f"CSV saved to: {output_path} ({rows_written} rows, streamed in chunks of {chunksize})")
+    return output_path
+
+def download_csv(driver, page_url, type, file_prefix, target_date=None, cleaner=None):
+    """Navigate to a page, download CSV for a specific date, and move it to the correct folder.
+
+    With a `cleaner` (a clean_pool.CleaningPool) the file is queued for cleaning in a worker
+    process and this returns as soon as the download is done, with the path it is cleaned from.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     logging.info(f"Navigating to {page_url} and downloading CSV...")
     driver.get(page_url)
     time.sleep(3)
@@ -665,6 +885,11 @@ def download_csv(driver, page_url, type, file_prefix, target_date=None):
 
     open_dropdown_and_click_csv(driver)
     time.sleep(30)
+
+    if WATCHER_MODE:
+        # download_watcher.py classifies and cleans the file as soon as it lands
+        logging.info(f"Export for {file_prefix} requested; leaving it to the download watcher.")
+        return True
     
     # Retrieve latest CSV and move it to the correct folder
     latest_csv = get_latest_csv(BASE_DOWNLOAD_FOLDER)
@@ -673,6 +898,9 @@ def download_csv(driver, page_url, type, file_prefix, target_date=None):
         print(f"[SUCCESS] CSV URL: file://{os.path.abspath(latest_csv)}")
         logging.info(f"[SUCCESS] CSV file ready: {latest_csv}")
         logging.info(f"[SUCCESS] CSV URL: file://{os.path.abspath(latest_csv)}")
+        if cleaner is not None:
+            return cleaner.submit(latest_csv, file_prefix, type)
+
         clean_csv(latest_csv, file_prefix, type)
 
         if os.path.exists(latest_csv):
@@ -689,23 +917,20 @@ def union_rentrolls():
     today = datetime.today()
     rentroll_dfs = []
 
-    for date_str in get_trailing_month_end_dates(today):
-        prefix = f"rentroll_{date_str}_cleaned"
-        
-        # Find matching file (you could also use glob)
-        matching_files = [f for f in os.listdir(BASE_DOWNLOAD_FOLDER) if f.startswith(prefix) and f.endswith(".csv")]
+    with SnapshotCatalog(BASE_DOWNLOAD_FOLDER) as catalog:
+        for date_str in get_trailing_month_end_dates(today):
+            # Most recent export of the rent roll as of that month end, if duplicates
+            file_path = catalog.as_of("rentroll", datetime.strptime(date_str, "%m-%d-%Y"), exact=True)
 
-        if not matching_files:
-            print(f"[SKIPPED] No file found for {prefix}")
-            continue
+            if not file_path:
+                print(f"[SKIPPED] No rentroll snapshot as of {date_str}")
+                continue
 
-        latest_file = max(matching_files)  # use most recent timestamped version if duplicates
-        file_path = os.path.join(BASE_DOWNLOAD_FOLDER, latest_file)
-        print(f"[INFO] Loading {file_path}")
-        df = pd.read_csv(file_path)
+            print(f"[INFO] Loading {file_path}")
+            df = pd.read_csv(file_path)
 
-        df['date_str'] = date_str
-        rentroll_dfs.append(df)
+            df['date_str'] = date_str
+            rentroll_dfs.append(df)
 
     if rentroll_dfs:
         combined_df = pd.concat(rentroll_dfs, ignore_index=True)
@@ -715,22 +940,21 @@ def union_rentrolls():
         print("[WARNING] No rentroll files found for trailing 12 months.")
         return pd.DataFrame()
 
-def get_data_from_appfolio():
-    logging.info("Started Appfolio data process")
-    """Check if ChromeDriver is set up correctly and perform login."""
-    success = False  # Initialize success flag
-    # Set up Chrome options
-    options = Options()
-    options.add_experimental_option("prefs", {"download.default_directory": BASE_DOWNLOAD_FOLDER})  # Set default download folder
-    service = Service(CHROMEDRIVER_PATH)
-    driver = webdriver.Chrome(service=service, options=options)
-
+def log_in(driver):
+    """Open the login page and sign in, with the texted 2-step verification code if asked for one."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     # Open login page
     print("[INFO] Opening login page...")
     logging.info("[INFO] Opening login page...")
     driver.get(LOGIN_URL)
 
-    try:
+    if not driver.find_elements(By.ID, "user_email"):
+        # The persistent browser profile still holds a signed-in session
+        print("[SUCCESS] Already signed in (saved browser session).")
+        logging.info("[SUCCESS] Already signed in (saved browser session).")
+    else:
         # Wait for username field and enter credentials
         WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "user_email"))).send_keys(USERNAME)
         print("[INFO] Entered username")
@@ -776,7 +1000,7 @@ def get_data_from_appfolio():
             verification_input.send_keys(verification_code)
             print(f"Entered verification code: {verification_code}")
             logging.info(f"Entered verification code: {verification_code}")
-            
+        
             # Click "Sign In" Button
             sign_in_button = WebDriverWait(driver, 10).until(
                 EC.element_to_be_clickable((By.ID, "sign_in_button"))
@@ -788,42 +1012,160 @@ def get_data_from_appfolio():
         else:
             print("[SUCCESS] Login successful (No 2FA required).")
             logging.info("[SUCCESS] Login successful (No 2FA required).")
-        
-        time.sleep(3)  # Allow page to load
-
-        # rentroll = download_csv(driver, LOGIN_URL, 1, 'rentroll', None)
-        # tenant = download_csv(driver, TENANT_URL, 1, 'tenant_data',None)
-        # work_order = download_csv(driver, WORK_ORDER_URL, 1, 'work_order',None)
-        # leasing = download_csv(driver, LEASING_FUNNEL_URL, 1, 'leasing',None) 
-        # prospect = download_csv(driver, PROSPECT_SOURCE_URL,1, 'prospect',None)
-        # bill = download_csv(driver, BILL_URL, 1,'bill',None)
-        guest = download_csv(driver, GUEST_CARD_URL, 1,'guest',None)
-        general_ledger = download_csv(driver, LEDGER_URL, 1,'general_ledger',None)
+    
+    time.sleep(3)  # Allow page to load
+
+# Reports pulled on each run: (file_prefix, page URL, type, target date)
+REPORTS = [
+    # ('rentroll', LOGIN_URL, 1, None),
+    # ('tenant_data', TENANT_URL, 1, None),
+    # ('work_order', WORK_ORDER_URL, 1, None),
+    # ('leasing', LEASING_FUNNEL_URL, 1, None),
+    # ('prospect', PROSPECT_SOURCE_URL, 1, None),
+    # ('bill', BILL_URL, 1, None),
+    ('guest', GUEST_CARD_URL, 1, None),
+    ('general_ledger', LEDGER_URL, 1, None),
+]
+
+def download_report(driver, report, ledger, run_id, cleaner):
+    """Download one report, retrying on a fresh tab with growing waits, and checkpoint the outcome."""
+    from browser_profile import fresh_page
+
+    file_prefix, page_url, type, target_date = report
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        ledger.attempt(run_id, file_prefix)
+        try:
+            downloaded = download_csv(driver, page_url, type, file_prefix, target_date, cleaner=cleaner)
+            error = None if downloaded else "No CSV file was found or generated"
+        except Exception as e:
+            downloaded, error = False, f"{e.__class__.__name__}: {e}"
+        if downloaded:
+            # Without a raw path (watcher mode) the export was handed to the download watcher
+            ledger.mark(run_id, file_prefix, DOWNLOADED, raw_path=downloaded if isinstance(downloaded, str) else None)
+            return True
+
+        ledger.mark(run_id, file_prefix, FAILED, error=error)
+        print(f"[WARNING] Downloading {file_prefix} failed (attempt {attempt}/{DOWNLOAD_ATTEMPTS}): {error}")
+        logging.info(f"[WARNING] Downloading {file_prefix} failed (attempt {attempt}/{DOWNLOAD_ATTEMPTS}): {error}")
+        if attempt < DOWNLOAD_ATTEMPTS:
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                fresh_page(driver)
+            except Exception as e:
+                logging.info(f"[WARNING] Could not open a fresh tab: {e}")
+    print(f"[ERROR] Gave up on {file_prefix} after {DOWNLOAD_ATTEMPTS} attempts")
+    logging.info(f"[ERROR] Gave up on {file_prefix} after {DOWNLOAD_ATTEMPTS} attempts")
+    return False
+
+def record_cleaning(ledger, run_id, results):
+    """Checkpoint cleaning results ({raw path: cleaned path or exception}) of the run's reports."""
+    with SnapshotCatalog(BASE_DOWNLOAD_FOLDER) as catalog:
+        for raw_path, result in results.items():
+            name = ledger.report_for(run_id, raw_path)
+            if name is None:
+                continue
+            if isinstance(result, Exception):
+                # The raw export stays in the staging folder and is cleaned again when the run resumes
+                ledger.mark(run_id, name, DOWNLOADED, error=f"Cleaning failed: {result}")
+            else:
+                ledger.mark(run_id, name, PUBLISHED if catalog.contains(result) else CLEANED, cleaned_path=result)
+
+def resume_reports(ledger, run_id, cleaner):
+    """Pick a run up from its checkpoints and return the reports that still need downloading.
+
+    Published reports are skipped, cleaned ones are published again, and downloaded exports
+    still in the staging folder go straight back to the cleaner.
+    """
+    states = ledger.reports(run_id)
+    to_download = []
+    for report in REPORTS:
+        file_prefix, _, type, _ = report
+        row = states[file_prefix]
+        if row["state"] == PUBLISHED:
+            print(f"[SKIPPED] {file_prefix} already published in run {run_id}")
+        elif row["state"] == CLEANED and os.path.exists(row["cleaned_path"]):
+            catalog_snapshot(row["cleaned_path"])
+            record_cleaning(ledger, run_id, {row["raw_path"]: row["cleaned_path"]})
+        elif row["state"] == DOWNLOADED and row["raw_path"] is None:
+            print(f"[SKIPPED] {file_prefix} was handed to the download watcher")
+        elif row["state"] == DOWNLOADED and os.path.exists(row["raw_path"]):
+            print(f"[INFO] Resuming {file_prefix} from the downloaded {row['raw_path']}")
+            cleaner.submit(row["raw_path"], file_prefix, type)
+        else:
+            to_download.append(report)
+    return to_download
+
+def get_data_from_appfolio():
+    logging.info("Started Appfolio data process")
+    """Check if ChromeDriver is set up correctly and perform login."""
+    from browser_profile import launch_browser
+    from kpi_history import record_kpis
+
+    success = False  # Initialize success flag
+    # Every report's progress is checkpointed, so a failed or interrupted run resumes where it stopped
+    ledger = RunLedger(BASE_DOWNLOAD_FOLDER)
+    run_id = ledger.start([report[0] for report in REPORTS])
+
+    # Headless Chrome on a persistent profile, with images, fonts and third-party scripts blocked
+    driver = launch_browser(BASE_DOWNLOAD_FOLDER)
+
+    # Downloaded reports are cleaned in worker processes while the next one downloads
+    cleaner = CleaningPool(staging_folder=os.path.join(BASE_DOWNLOAD_FOLDER, "processing"))
+    to_download = resume_reports(ledger, run_id, cleaner)
+
+    try:
+        log_in(driver)
+
+        # A report that keeps failing is left for the next run to resume; the others carry on
+        for report in to_download:
+            download_report(driver, report, ledger, run_id, cleaner)
+            record_cleaning(ledger, run_id, cleaner.reap())
         # month_end_dates = get_trailing_month_end_dates(today)
        
 
         # for date_str in month_end_dates:
-        #     prefix = f"rentroll_{date_str.replace('/', '-')}_cleaned_"
-        #     if any(fname.startswith(prefix) for fname in os.listdir(BASE_DOWNLOAD_FOLDER)):
+        #     with SnapshotCatalog(BASE_DOWNLOAD_FOLDER) as catalog:
+        #         already_downloaded = catalog.as_of("rentroll", datetime.strptime(date_str, "%m-%d-%Y"), exact=True)
+        #     if already_downloaded:
         #         print(f"[SKIPPED] Found existing file for {date_str}")
         #         continue
 
-        #     success = download_csv(driver, LOGIN_URL, 2,  f"rentroll_{date_str.replace('/', '-')}", target_date=date_str)
+        #     success = download_csv(driver, LOGIN_URL, 2,  f"rentroll_{date_str.replace('/', '-')}", target_date=date_str, cleaner=cleaner)
         #     if not success:
         #         logging.warning(f"Download failed for {date_str}")
 
+        # cleaner.wait()  # the monthly rent rolls must be cleaned before they are combined
         # df_all_rentrolls = union_rentrolls()
         # output_path = os.path.join(BASE_DOWNLOAD_FOLDER, f"rentroll_12_months_combined_{datetime.today().strftime('%Y%m%d')}.csv")
         # df_all_rentrolls.to_csv(output_path, index=False, encoding='utf-8-sig')
+        # catalog_snapshot(output_path)
         # print(f"[DONE] Saved combined file to: {output_path}")
         success = True  # Mark as successful
     except Exception as e:
-        print(f" An error occurred: {e}")
-        logging.info(f" An error occurred: {e}")
+        print(f"[ERROR] Run {run_id} stopped: {e.__class__.__name__}: {e}")
+        logging.exception(f"[ERROR] Run {run_id} stopped: {e.__class__.__name__}: {e}")
 
     finally:
         driver.quit()
+        results = cleaner.wait()
+        cleaner.shutdown()
+        record_cleaning(ledger, run_id, results)
+        unfinished = ledger.finish(run_id)
+        ledger.close()
+        if unfinished:
+            success = False
+            for row in unfinished:
+                print(f"[ERROR] {row['name']} not published ({row['state']}): {row['error'] or 'not attempted'}")
+                logging.info(f"[ERROR] {row['name']} not published ({row['state']}): {row['error'] or 'not attempted'}")
+            print(f"[INFO] Run the pipeline again to resume run {run_id} from its checkpoints.")
+            logging.info(f"[INFO] Run the pipeline again to resume run {run_id} from its checkpoints.")
         if success:
+            # One row of KPIs per property per day, for the long-horizon trend charts
+            try:
+                record_kpis(BASE_DOWNLOAD_FOLDER)
+            except Exception as e:
+                print(f"[WARNING] Could not record the KPI history: {e}")
+                logging.info(f"[WARNING] Could not record the KPI history: {e}")
             logging.info("[SUCCESS] The entire process completed successfully.")
             print("[SUCCESS] The entire process completed successfully.")
         else:
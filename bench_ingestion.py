@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from mock_appfolio import FIXTURE_FOLDERS, MockAppFolio
+
+DEFAULT_REPORTS = ["rentroll", "work_order"]
+# Files a clean needs to find in the data folder (the general ledger is merged into its history)
+SEED_FILES = ["general_ledger3_cleaned.csv"]
+
+
+def seed_data_folder(data_folder, fixture_folders):
+    """Start a run from an empty data folder holding only the SEED_FILES found in the fixtures."""
+    shutil.rmtree(data_folder, ignore_errors=True)
+    os.makedirs(data_folder)
+    for name in SEED_FILES:
+        for folder in fixture_folders:
+            if os.path.exists(os.path.join(folder, name)):
+                shutil.copy(os.path.join(folder, name), data_folder)
+                break
+
+
+def download_with_requests(session, mock, name, folder):
+    """Fetch a report's export over plain HTTP, as the browser would save it."""
+    response = session.get(mock.export_url(name), timeout=120)
+    response.raise_for_status()
+    filename = re.search(r'filename="([^"]+)"', response.headers["Content-Disposition"]).group(1)
+    path = os.path.join(folder, filename)
+    with open(path, "wb") as f:
+        f.write(response.content)
+    return path
+
+
+def run_once(appfolio_data, mock, reports, client):
+    """One login -> download -> clean pass over `reports`; seconds spent in each phase."""
+    from browser_profile import launch_browser
+    from clean_pool import CleaningPool
+
+    folder = appfolio_data.BASE_DOWNLOAD_FOLDER
+    timings = {}
+    started = time.perf_counter()
+    cleaner = CleaningPool(staging_folder=os.path.join(folder, "processing"))
+    try:
+        if client == "browser":
+            # A fresh profile per run: cold HTTP cache, signed out
+            profile = tempfile.mkdtemp(prefix="appfolio-bench-profile-")
+            phase = time.perf_counter()
+            driver = launch_browser(folder, profile_folder=profile)
+            timings["launch"] = time.perf_counter() - phase
+            try:
+                phase = time.perf_counter()
+                appfolio_data.log_in(driver)
+                timings["login"] = time.perf_counter() - phase
+                for name in reports:
+                    phase = time.perf_counter()
+                    if not appfolio_data.download_csv(driver, mock.report_url(name), 1, name, cleaner=cleaner):
+                        raise RuntimeError(f"No export downloaded for {name}")
+                    timings[f"download {name}"] = time.perf_counter() - phase
+            finally:
+                driver.quit()
+                shutil.rmtree(profile, ignore_errors=True)
+        else:
+            import requests
+
+            session = requests.Session()
+            phase = time.perf_counter()
+            session.post(f"{mock.url}/users/sign_in", timeout=30, data={
+                "user[email]": os.environ["APPFOLIO_USERNAME"], "user[password]": os.environ["APPFOLIO_PASSWORD"],
+            }).raise_for_status()
+            timings["login"] = time.perf_counter() - phase
+            for name in reports:
+                phase = time.perf_counter()
+                cleaner.submit(download_with_requests(session, mock, name, folder), name)
+                timings[f"download {name}"] = time.perf_counter() - phase
+
+        # Cleaning overlaps the downloads; this is only what is left after the last one
+        phase = time.perf_counter()
+        results = cleaner.wait()
+        timings["clean"] = time.perf_counter() - phase
+    finally:
+        cleaner.shutdown()
+    failed = [path for path, result in results.items() if isinstance(result, Exception)]
+    if failed:
+        raise RuntimeError(f"Cleaning failed for {', '.join(failed)}")
+    timings["total"] = time.perf_counter() - started
+    return timings
+
+
+def summarise(samples, client, reports, latency, export_latency):
+    return {
+        "client": client,
+        "reports": reports,
+        "runs": len(samples),
+        "latency": latency,
+        "export_latency": export_latency,
+        "phases": {phase: {"median": statistics.median(s[phase] for s in samples),
+                           "max": max(s[phase] for s in samples)}
+                   for phase in samples[0]},
+    }
+
+
+def benchmark(reports=DEFAULT_REPORTS, runs=3, client="browser", latency=0.0, export_latency=0.0,
+              fixture_folders=FIXTURE_FOLDERS):
+    """Time login -> download -> clean against a local mock AppFolio, `runs` times.
+
+    Everything is written to a scratch folder: appfolio_data.py is pointed at it (and at the
+    mock) through the environment before it is imported, and the working directory moves there
+    because the general ledger history is written relative to it.
+    """
+    fixture_folders = [os.path.abspath(folder) for folder in fixture_folders]
+    scratch = tempfile.mkdtemp(prefix="appfolio-bench-")
+    data_folder = os.path.join(scratch, "data")
+    cwd = os.getcwd()
+    with MockAppFolio(fixture_folders, latency, export_latency) as mock:
+        missing = [name for name in reports if name not in mock.exports]
+        if missing:
+            raise ValueError(f"No recorded export for {', '.join(missing)} in {', '.join(fixture_folders)}")
+        os.environ.update(mock.environment())
+        os.environ["APPFOLIO_DATA_FOLDER"] = data_folder
+        os.chdir(scratch)
+        try:
+            import appfolio_data
+
+            samples = []
+            for run in range(runs):
+                seed_data_folder(data_folder, fixture_folders)
+                samples.append(run_once(appfolio_data, mock, reports, client))
+                print(f"[INFO] Run {run + 1}/{runs}: {samples[-1]['total']:.1f}s")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(scratch, ignore_errors=True)
+    return summarise(samples, client, reports, latency, export_latency)
+
+
+def print_report(summary):
+    print(f"\n{summary['client']} client, {summary['runs']} runs, reports: {', '.join(summary['reports'])}, "
+          f"latency {summary['latency']}s + {summary['export_latency']}s per export")
+    print(f"{'phase':<26} {'median s':>9} {'max s':>9}")
+    for phase, stats in summary["phases"].items():
+        print(f"{phase:<26} {stats['median']:>9.2f} {stats['max']:>9.2f}")
+
+
+def compare_to_baseline(summary, baseline_path, max_regression):
+    """Return the phases whose median got more than `max_regression` slower than the baseline."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for phase, stats in summary["phases"].items():
+        before = baseline.get("phases", {}).get(phase, {}).get("median")
+        if before and stats["median"] > before * (1 + max_regression):
+            regressions.append(f"{phase} {before:.2f}s -> {stats['median']:.2f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark login -> download -> clean against a mock AppFolio.")
+    parser.add_argument("--reports", nargs="+", default=DEFAULT_REPORTS, help="Reports to download (file prefixes)")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions; phases report the median")
+    parser.add_argument("--client", choices=["browser", "requests"], default="browser",
+                        help="Drive headless Chrome through download_csv(), or fetch exports over plain HTTP")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the mock adds to every request")
+    parser.add_argument("--export-latency", type=float, default=0.0, help="Seconds the mock adds to every export")
+    parser.add_argument("--fixtures", action="append", help="Folder of recorded exports (repeatable)")
+    parser.add_argument("--output", help="Write the summary as JSON (use it as a later --baseline)")
+    parser.add_argument("--baseline", help="JSON summary of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed slowdown vs. the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    summary = benchmark(args.reports, args.runs, args.client, args.latency, args.export_latency,
+                        args.fixtures or FIXTURE_FOLDERS)
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(summary, args.baseline, args.max_regression)
+        if regressions:
+            print("[FAILED] Slower than baseline: " + ", ".join(regressions))
+            sys.exit(1)
+        print("[OK] Within baseline")
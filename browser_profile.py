@@ -0,0 +1,202 @@
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from dotenv import load_dotenv
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+load_dotenv()
+
+# Set APPFOLIO_HEADLESS=0 to watch the browser, e.g. while fixing a selector
+HEADLESS = os.getenv("APPFOLIO_HEADLESS", "1") != "0"
+# Pinned chromedriver; when unset, Selenium Manager fetches the driver matching CHROME_VERSION
+# (or the installed Chrome) and caches it
+CHROMEDRIVER_PATH = os.getenv("APPFOLIO_CHROMEDRIVER")
+CHROME_VERSION = os.getenv("APPFOLIO_CHROME_VERSION")
+# Reused between runs so the HTTP cache and the AppFolio session survive
+PROFILE_FOLDER = os.getenv("APPFOLIO_CHROME_PROFILE", os.path.join(os.getcwd(), "data", ".chrome_profile"))
+
+# Requests reports never need: images, fonts, and third-party analytics/chat/monitoring scripts
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*hotjar.com*", "*segment.com*", "*segment.io*", "*intercom.io*", "*intercomcdn.com*",
+    "*fullstory.com*", "*pendo.io*", "*newrelic.com*", "*nr-data.net*", "*sentry.io*",
+    "*facebook.net*", "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+]
+EXTRA_BLOCKED = [p.strip() for p in os.getenv("APPFOLIO_BLOCKED_URLS", "").split(",") if p.strip()]
+
+
+def _service(driver_path):
+    return Service(driver_path) if driver_path else Service()
+
+
+def legacy_options(download_folder):
+    """The original setup: a visible Chrome with a fresh profile and only the download folder set."""
+    options = Options()
+    options.add_experimental_option("prefs", {"download.default_directory": download_folder})
+    return options
+
+
+def lightweight_options(download_folder, headless=HEADLESS, profile_folder=PROFILE_FOLDER):
+    """Headless Chrome on a persistent profile that skips images and fonts."""
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+    if profile_folder:
+        os.makedirs(profile_folder, exist_ok=True)
+        options.add_argument(f"--user-data-dir={profile_folder}")
+    for argument in ("--disable-gpu", "--disable-extensions", "--disable-dev-shm-usage",
+                     "--no-first-run", "--disable-background-networking", "--disable-sync"):
+        options.add_argument(argument)
+    options.add_experimental_option("prefs", {
+        "download.default_directory": download_folder,
+        "download.prompt_for_download": False,
+        "profile.managed_default_content_settings.images": 2,
+    })
+    if CHROME_VERSION:
+        options.browser_version = CHROME_VERSION
+    return options
+
+
+def block_resources(driver, download_folder, patterns=None):
+    """Block unused requests through the DevTools protocol and keep headless downloads enabled."""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns or BLOCKED_URL_PATTERNS + EXTRA_BLOCKED})
+    driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+        "behavior": "allow", "downloadPath": os.path.abspath(download_folder), "eventsEnabled": True,
+    })
+
+
+def launch_browser(download_folder, lightweight=True, headless=HEADLESS, profile_folder=PROFILE_FOLDER,
+                   driver_path=CHROMEDRIVER_PATH):
+    """Start Chrome for ingestion: the lightweight profile by default, or the original setup."""
+    if not lightweight:
+        return webdriver.Chrome(service=_service(driver_path), options=legacy_options(download_folder))
+    driver = webdriver.Chrome(service=_service(driver_path),
+                              options=lightweight_options(download_folder, headless, profile_folder))
+    block_resources(driver, download_folder)
+    logging.info(f"[INFO] Chrome started {'headless' if headless else 'headful'} with profile {profile_folder}")
+    return driver
+
+
+def fresh_page(driver):
+    """Swap every open tab for one new blank tab, dropping whatever a failed page left behind
+    (open dialogs, half-finished scripts). Cookies, and so the AppFolio session, are kept."""
+    stale = driver.window_handles
+    driver.switch_to.new_window("tab")
+    fresh = driver.current_window_handle
+    for handle in stale:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(fresh)
+
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else float("nan")
+
+
+def browser_cpu_seconds(driver):
+    """CPU time used so far by chromedriver and every Chrome process under it (Linux only, else None)."""
+    try:
+        children = {}
+        for pid in filter(str.isdigit, os.listdir("/proc")):
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            children.setdefault(int(fields[1]), []).append((int(pid), int(fields[11]) + int(fields[12])))
+        ticks, stack = 0, [driver.service.process.pid]
+        while stack:
+            for pid, used in children.get(stack.pop(), []):
+                ticks += used
+                stack.append(pid)
+        return ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+def page_timings(driver, url):
+    """Load `url` and return wall time, navigation timings and what the page fetched."""
+    started = time.perf_counter()
+    driver.get(url)
+    wall = time.perf_counter() - started
+    navigation = driver.execute_script(
+        "const [n] = performance.getEntriesByType('navigation');"
+        "const r = performance.getEntriesByType('resource');"
+        "return {dom: n ? n.domContentLoadedEventEnd : null, load: n ? n.loadEventEnd : null,"
+        " resources: r.length, bytes: r.reduce((total, e) => total + (e.transferSize || 0), 0)};"
+    )
+    return {
+        "wall_ms": wall * 1000,
+        "dom_ms": navigation["dom"],
+        "load_ms": navigation["load"],
+        "resources": navigation["resources"],
+        "kb": navigation["bytes"] / 1024,
+    }
+
+
+def benchmark(urls, runs=3, use_profile=False):
+    """Median page-load figures of the original setup and the lightweight profile, per URL, with
+    the browser CPU time per load where the OS exposes it.
+
+    The lightweight runs use a throwaway profile unless `use_profile`, so both setups start
+    from a cold cache and the same (signed-out) session.
+    """
+    download_folder = tempfile.mkdtemp(prefix="appfolio-bench-")
+    profile_folder = PROFILE_FOLDER if use_profile else tempfile.mkdtemp(prefix="appfolio-profile-")
+    results = {}
+    try:
+        for setup, lightweight in (("original", False), ("lightweight", True)):
+            driver = launch_browser(download_folder, lightweight=lightweight, profile_folder=profile_folder)
+            try:
+                for url in urls:
+                    cpu_before = browser_cpu_seconds(driver)
+                    samples = [page_timings(driver, url) for _ in range(runs)]
+                    cpu_after = browser_cpu_seconds(driver)
+                    results[(setup, url)] = {key: _median(s[key] for s in samples) for key in samples[0]}
+                    results[(setup, url)]["cpu_s"] = (
+                        (cpu_after - cpu_before) / runs if None not in (cpu_before, cpu_after) else float("nan")
+                    )
+            finally:
+                driver.quit()
+    finally:
+        shutil.rmtree(download_folder, ignore_errors=True)
+        if not use_profile:
+            shutil.rmtree(profile_folder, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chrome setup for AppFolio ingestion.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench_parser = commands.add_parser("benchmark", help="Compare page loads of the original and lightweight setups")
+    bench_parser.add_argument("urls", nargs="*", help="Pages to load (default: APPFOLIO_LOGIN_URL)")
+    bench_parser.add_argument("--runs", type=int, default=3, help="Loads per page and setup")
+    bench_parser.add_argument("--use-profile", action="store_true",
+                              help="Use the persistent profile (warm cache, signed-in session) for the lightweight runs")
+    commands.add_parser("reset-profile", help="Delete the persistent profile (signs the scraper out)")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        urls = args.urls or [os.getenv("APPFOLIO_LOGIN_URL")]
+        if not all(urls):
+            parser.error("no URL given and APPFOLIO_LOGIN_URL is not set")
+        results = benchmark(urls, args.runs, args.use_profile)
+        print(f"{'setup':<12} {'wall ms':>9} {'DOM ms':>9} {'load ms':>9} {'requests':>9} {'KB':>9} {'CPU s':>7}  url")
+        for (setup, url), r in results.items():
+            print(f"{setup:<12} {r['wall_ms']:>9.0f} {r['dom_ms']:>9.0f} {r['load_ms']:>9.0f} "
+                  f"{r['resources']:>9.0f} {r['kb']:>9.0f} {r['cpu_s']:>7.2f}  {url}")
+    elif args.command == "reset-profile":
+        shutil.rmtree(PROFILE_FOLDER, ignore_errors=True)
+        print(f"[INFO] Removed {PROFILE_FOLDER}")
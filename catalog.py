@@ -0,0 +1,275 @@
+import argparse
+import csv
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+
+CATALOG_FILENAME = "catalog.db"
+
+# '<dataset>[_MM-DD-YYYY]_cleaned_<YYYYMMDD>_<HHMMSS>[ - Copy].csv', plus combined outputs such
+# as 'rentroll_12_months_combined_<YYYYMMDD>.csv' and undated files like 'general_ledger3_cleaned.csv'
+SNAPSHOT_PATTERN = re.compile(
+    r"^(?P<name>.+?)(?:_(?P<stamp>\d{8}(?:_\d{6})?))?(?P<suffix>\s*-\s*Copy.*)?\.csv$"
+)
+AS_OF_PATTERN = re.compile(r"^(?P<dataset>.+)_(?P<as_of>\d{2}-\d{2}-\d{4})$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    row_count INTEGER,
+    schema_hash TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS snapshots_lookup ON snapshots (dataset, as_of, created_at);
+"""
+
+
+def is_snapshot_file(filename):
+    """Cleaned and combined outputs are snapshots; raw AppFolio exports are not."""
+    return filename.endswith(".csv") and ("_cleaned" in filename or "_combined" in filename)
+
+
+def parse_snapshot_name(filename):
+    """Split a snapshot filename into (dataset, as_of date or None, created_at datetime or None).
+
+    'rentroll_04-30-2025_cleaned_20250509_145736.csv' -> ('rentroll', date(2025, 4, 30), 2025-05-09 14:57:36)
+    """
+    match = SNAPSHOT_PATTERN.match(os.path.basename(filename))
+    if not match:
+        return None, None, None
+
+    name = match.group("name")
+    if name.endswith("_cleaned"):
+        name = name[: -len("_cleaned")]
+
+    created_at = None
+    stamp = match.group("stamp")
+    if stamp:
+        created_at = datetime.strptime(stamp, "%Y%m%d_%H%M%S" if "_" in stamp else "%Y%m%d")
+
+    as_of = None
+    dated = AS_OF_PATTERN.match(name)
+    if dated:
+        name = dated.group("dataset")
+        as_of = datetime.strptime(dated.group("as_of"), "%m-%d-%Y").date()
+
+    return name, as_of, created_at
+
+
+def describe_csv(path):
+    """Return (row_count, schema_hash, content_hash) for a CSV in a single pass."""
+    content = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            content.update(block)
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        row_count = sum(1 for _ in reader)
+
+    schema_hash = hashlib.sha1("\x1f".join(header).encode("utf-8")).hexdigest()
+    return row_count, schema_hash, content.hexdigest()
+
+
+class SnapshotCatalog:
+    """SQLite manifest of every cleaned snapshot in a data folder.
+
+    Lookups ('latest tenant_data', 'rentroll as of 2025-04-30') are index seeks instead of
+    directory scans and filename parsing.
+    """
+
+    def __init__(self, folder, db_path=None):
+        self.folder = folder
+        self.db_path = db_path or os.path.join(folder, CATALOG_FILENAME)
+        is_new = not os.path.exists(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")  # cleaner processes register while the dashboard reads
+        self.conn.executescript(SCHEMA)
+        if is_new:
+            self.backfill()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def register(self, path, dataset=None, as_of=None, created_at=None):
+        """Record (or refresh) a snapshot. Anything not given is taken from the filename and file."""
+        path = os.path.abspath(path)
+        parsed_dataset, parsed_as_of, parsed_created_at = parse_snapshot_name(path)
+        stat = os.stat(path)
+
+        dataset = dataset or parsed_dataset
+        created_at = created_at or parsed_created_at or datetime.fromtimestamp(stat.st_mtime)
+        # Undated exports describe the day they were pulled
+        as_of = as_of or parsed_as_of or created_at.date()
+        row_count, schema_hash, content_hash = describe_csv(path)
+
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO snapshots (dataset, as_of, created_at, path, row_count, schema_hash, content_hash, size, mtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    dataset = excluded.dataset, as_of = excluded.as_of, created_at = excluded.created_at,
+                    row_count = excluded.row_count, schema_hash = excluded.schema_hash,
+                    content_hash = excluded.content_hash, size = excluded.size, mtime = excluded.mtime
+                """,
+                (dataset, as_of.isoformat(), created_at.isoformat(timespec="seconds"), path,
+                 row_count, schema_hash, content_hash, stat.st_size, stat.st_mtime),
+            )
+        logging.info(f"Catalogued {dataset} snapshot as of {as_of}: {path} ({row_count} rows)")
+        return path
+
+    def backfill(self):
+        """Register snapshots already in the folder that the catalog doesn't know about (or that changed)."""
+        known = {row["path"]: (row["size"], row["mtime"])
+                 for row in self.conn.execute("SELECT path, size, mtime FROM snapshots")}
+        added = 0
+        for filename in os.listdir(self.folder):
+            path = os.path.abspath(os.path.join(self.folder, filename))
+            if not is_snapshot_file(filename) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                continue
+            self.register(path)
+            added += 1
+        return added
+
+    def _first_existing(self, query, params):
+        for row in self.conn.execute(query, params):
+            if os.path.exists(row["path"]):
+                return row["path"]
+            self.forget(row["path"])
+        return None
+
+    def latest(self, dataset):
+        """Path of the newest snapshot of `dataset` (latest as-of date, then latest export), or None."""
+        return self._first_existing(
+            "SELECT path FROM snapshots WHERE dataset = ? ORDER BY as_of DESC, created_at DESC, id DESC",
+            (dataset,),
+        )
+
+    def as_of(self, dataset, as_of_date, exact=False):
+        """Path of the newest snapshot of `dataset` as of `as_of_date` (on that exact date if `exact`)."""
+        if isinstance(as_of_date, datetime):
+            as_of_date = as_of_date.date()
+        operator = "=" if exact else "<="
+        return self._first_existing(
+            f"SELECT path FROM snapshots WHERE dataset = ? AND as_of {operator} ? "
+            "ORDER BY as_of DESC, created_at DESC, id DESC",
+            (dataset, as_of_date.isoformat()),
+        )
+
+    def snapshots(self, dataset=None):
+        """All catalogued snapshots (optionally of one dataset), newest first."""
+        if dataset is None:
+            return self.conn.execute(
+                "SELECT * FROM snapshots ORDER BY dataset, as_of DESC, created_at DESC").fetchall()
+        return self.conn.execute(
+            "SELECT * FROM snapshots WHERE dataset = ? ORDER BY as_of DESC, created_at DESC", (dataset,)).fetchall()
+
+    def contains(self, path):
+        return self.conn.execute("SELECT 1 FROM snapshots WHERE path = ?", (os.path.abspath(path),)).fetchone() is not None
+
+    def forget(self, path):
+        with self.conn:
+            self.conn.execute("DELETE FROM snapshots WHERE path = ?", (path,))
+
+    def gc(self, keep=3, delete_files=False, dry_run=False):
+        """Apply the retention policy and return the paths it dropped.
+
+        Keeps the newest `keep` snapshots of each dataset, plus the newest snapshot of every
+        month (by as-of date) so month-end history survives. Byte-identical copies of a kept
+        snapshot with the same as-of date are dropped, and entries whose file is gone are
+        forgotten. Files are only removed from disk when `delete_files` is set.
+        """
+        dropped = []
+        kept_hashes = {}
+        kept_counts = {}
+        kept_months = set()
+        # Newest first within each dataset, so the first snapshot seen of a month is its month-end
+        for row in self.snapshots():
+            path = row["path"]
+            if not os.path.exists(path):
+                dropped.append(path)
+                continue
+            dataset = row["dataset"]
+            hashes = kept_hashes.setdefault((dataset, row["as_of"]), set())
+            month = (dataset, row["as_of"][:7])
+            if row["content_hash"] in hashes or (kept_counts.get(dataset, 0) >= keep and month in kept_months):
+                dropped.append(path)
+                continue
+            hashes.add(row["content_hash"])
+            kept_counts[dataset] = kept_counts.get(dataset, 0) + 1
+            kept_months.add(month)
+
+        if dry_run:
+            return dropped
+
+        for path in dropped:
+            if delete_files and os.path.exists(path):
+                os.remove(path)
+                logging.info(f"Deleted expired snapshot: {path}")
+            self.forget(path)
+        return dropped
+
+
+def register_snapshot(path):
+    """Record a freshly published snapshot in the catalog of the folder it was written to."""
+    with SnapshotCatalog(os.path.dirname(os.path.abspath(path))) as catalog:
+        return catalog.register(path)
+
+
+def latest_snapshots(folder, datasets):
+    """Map each {category: dataset} entry to the path of that dataset's newest snapshot."""
+    with SnapshotCatalog(folder) as catalog:
+        return {category: catalog.latest(dataset) for category, dataset in datasets.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the catalog of cleaned AppFolio snapshots.")
+    parser.add_argument("--folder", default=os.path.join(os.getcwd(), "data"), help="Data folder holding the snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("backfill", help="Register snapshots that are on disk but not in the catalog")
+    commands.add_parser("list", help="List catalogued snapshots")
+    latest_parser = commands.add_parser("latest", help="Print the newest snapshot of a dataset")
+    latest_parser.add_argument("dataset")
+    latest_parser.add_argument("--as-of", type=date.fromisoformat, help="Newest snapshot on or before YYYY-MM-DD")
+    gc_parser = commands.add_parser("gc", help="Apply the retention policy")
+    gc_parser.add_argument("--keep", type=int, default=3, help="Newest snapshots to keep per dataset, besides each month's newest")
+    gc_parser.add_argument("--delete-files", action="store_true", help="Also delete expired files from disk")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Only print what would be dropped")
+    args = parser.parse_args()
+
+    with SnapshotCatalog(args.folder) as catalog:
+        if args.command == "backfill":
+            print(f"[INFO] Registered {catalog.backfill()} snapshots")
+        elif args.command == "list":
+            for row in catalog.snapshots():
+                print(f"{row['dataset']:<30} {row['as_of']}  {row['created_at']}  {row['row_count']:>8}  {row['path']}")
+        elif args.command == "latest":
+            path = catalog.as_of(args.dataset, args.as_of) if args.as_of else catalog.latest(args.dataset)
+            print(path or f"[WARNING] No snapshot of {args.dataset}")
+        elif args.command == "gc":
+            dropped = catalog.gc(keep=args.keep, delete_files=args.delete_files, dry_run=args.dry_run)
+            for path in dropped:
+                print(f"[{'WOULD DROP' if args.dry_run else 'DROPPED'}] {path}")
+            print(f"[DONE] {len(dropped)} snapshots {'would be ' if args.dry_run else ''}dropped")
@@ -0,0 +1,141 @@
+import argparse
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Raw AppFolio export filenames (e.g. 'rent_roll-20250418.csv') -> clean_csv file_prefix
+RAW_EXPORT_PREFIXES = [
+    ("rent_roll", "rentroll"),
+    ("tenant_directory", "tenant_data"),
+    ("tenant_data", "tenant_data"),
+    ("work_order", "work_order"),
+    ("purchase_order", "purchase_order"),
+    ("bill_detail", "bill"),
+    ("bill", "bill"),
+    ("general_ledger", "general_ledger"),
+    ("guest_card_inquiries", "guest"),
+    ("leasing_funnel", "leasing"),
+    ("prospect_source", "prospect"),
+]
+
+
+def prefix_for_raw_file(filename):
+    """Map a raw export filename to the clean_csv prefix, or None if it isn't recognised."""
+    name = os.path.basename(filename).lower()
+    if "_cleaned" in name:
+        return None
+    for raw_prefix, file_prefix in RAW_EXPORT_PREFIXES:
+        if name.startswith(raw_prefix):
+            return file_prefix
+    return None
+
+
+def _clean_file(raw_path, file_prefix, type, remove_raw):
+    """Worker entry point: clean one export in a child process and return the cleaned path."""
+    from appfolio_data import clean_csv
+
+    output_path = clean_csv(raw_path, file_prefix, type)
+    if remove_raw and os.path.exists(raw_path):
+        os.remove(raw_path)
+        logging.info(f"Deleted original file: {raw_path}")
+    return output_path
+
+
+class CleaningPool:
+    """Cleans downloaded reports in worker processes while the browser keeps downloading."""
+
+    def __init__(self, max_workers=None, staging_folder=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.staging_folder = staging_folder
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.futures = {}
+
+    def submit(self, raw_path, file_prefix, type=1, remove_raw=True, stage=True):
+        """Queue a raw export for cleaning and return immediately, with the path it is cleaned from.
+
+        When a staging folder is set (and `stage`) the file is moved there first, so the next
+        get_latest_csv() call in the download folder can't pick it up again.
+        """
+        # A resumed run resubmits exports that are already staged
+        if stage and self.staging_folder and os.path.dirname(os.path.abspath(raw_path)) != os.path.abspath(self.staging_folder):
+            os.makedirs(self.staging_folder, exist_ok=True)
+            staged_path = os.path.join(self.staging_folder, os.path.basename(raw_path))
+            shutil.move(raw_path, staged_path)
+            raw_path = staged_path
+
+        future = self.executor.submit(_clean_file, raw_path, file_prefix, type, remove_raw)
+        self.futures[future] = (raw_path, file_prefix)
+        print(f"[INFO] Queued {raw_path} for cleaning as '{file_prefix}'")
+        logging.info(f"Queued {raw_path} for cleaning as '{file_prefix}'")
+        return raw_path
+
+    def _collect(self, future, results):
+        raw_path, file_prefix = self.futures.pop(future)
+        try:
+            results[raw_path] = future.result()
+            print(f"[SUCCESS] Cleaned {file_prefix}: {results[raw_path]}")
+            logging.info(f"[SUCCESS] Cleaned {file_prefix}: {results[raw_path]}")
+        except Exception as e:
+            results[raw_path] = e
+            print(f"[ERROR] Cleaning {raw_path} failed: {e}")
+            logging.info(f"[ERROR] Cleaning {raw_path} failed: {e}")
+
+    def wait(self):
+        """Block until every queued file is cleaned; return {raw_path: cleaned path or exception}."""
+        results = {}
+        for future in as_completed(list(self.futures)):
+            self._collect(future, results)
+        return results
+
+    def reap(self):
+        """Collect results of files that have finished cleaning without blocking."""
+        results = {}
+        for future in [f for f in self.futures if f.done()]:
+            self._collect(future, results)
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wait()
+        self.shutdown()
+
+
+def reprocess_directory(raw_dir, max_workers=None, remove_raw=False):
+    """Re-clean every recognised raw export in `raw_dir` across all cores."""
+    from download_watcher import classify_export
+
+    jobs = []
+    for filename in sorted(os.listdir(raw_dir)):
+        if not filename.endswith(".csv"):
+            continue
+        # The header is the reliable signal; fall back to the export's filename
+        file_prefix = classify_export(os.path.join(raw_dir, filename)) or prefix_for_raw_file(filename)
+        if file_prefix is None:
+            print(f"[SKIPPED] Unrecognised export: {filename}")
+            continue
+        jobs.append((os.path.join(raw_dir, filename), file_prefix))
+
+    with CleaningPool(max_workers=max_workers) as pool:
+        for raw_path, file_prefix in jobs:
+            pool.submit(raw_path, file_prefix, 1, remove_raw=remove_raw)
+        results = pool.wait()
+
+    failed = [path for path, result in results.items() if isinstance(result, Exception)]
+    print(f"[DONE] Reprocessed {len(results) - len(failed)} of {len(jobs)} files, {len(failed)} failed")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean raw AppFolio exports in parallel.")
+    parser.add_argument("raw_dir", help="Directory containing raw AppFolio CSV exports")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--remove-raw", action="store_true", help="Delete each raw export once it is cleaned")
+    args = parser.parse_args()
+
+    reprocess_directory(args.raw_dir, max_workers=args.workers, remove_raw=args.remove_raw)
@@ -2,70 +2,75 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
-import plotly.io as pio
 import plotly.graph_objects as go
 import json
 import os
+from catalog import latest_snapshots
+from query_engine import QueryEngine
+from shared_arrow import SharedDatasetStore
+import tab_cache
+from profiler import profiler_for
+from time_index import time_index
+from unit_history import UnitHistory
+from snapshot_events import EventLog
+from kpi_history import KPIHistory, portfolio as kpi_portfolio
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud, STOPWORDS
+from work_order_terms import word_cloud_png
+from metric_registry import evaluate_metrics
+from delinquency import DelinquencyLedger, aging_summary, summary_by
+from unit_history import DELINQUENT_PAST_DUE
 
 # st.set_page_config(page_title="Infinity BH Dashboards", layout="wide")
 
+# General ledgers are queried through the engine rather than loaded into every session
+LEDGER_DATASETS = ["general_ledger1", "general_ledger2", "general_ledger3"]
+
+@st.cache_resource
+def get_query_engine(base_dir):
+    # One DuckDB engine per server process, shared by all sessions
+    return QueryEngine(base_dir)
+
+@st.cache_resource
+def get_shared_store():
+    # Snapshots are mapped from /dev/shm once per process and shared by all sessions
+    return SharedDatasetStore()
+
+@st.cache_resource(max_entries=8)
+def get_time_index(name, path):
+    # Event dates are parsed and sorted once per snapshot, not on every rerun
+    return time_index(name, get_shared_store().frame(path, key=name))
+
 def show_dashboard():
-    
+    # Admin-only per-section timings, shown with ?profile=1 (or ?profile=cprofile)
+    prof = profiler_for(st.session_state.get("user")).start()
+    try:
+        render_dashboard(prof)
+    finally:
+        # Also when the rerun is cut short (st.stop(), a new rerun, an error), so tracing never leaks
+        total_seconds = prof.stop()
+    prof.render(total_seconds)
+
+def render_dashboard(prof):
     BASE_DIR = os.path.join(os.getcwd(), "data")  # Use relative path
     IMG_DIR = "plotly_pdf_images"
     st.title("📊 Infinity BH Dashboards")
-    # Define file prefixes
-    file_prefixes = {
-        "Tenant Data": "tenant_data_cleaned",
-        "Work Orders": "work_order_cleaned",
-        "Prospect": "prospect_cleaned",
-        "Rent Roll": "rentroll_cleaned",
-        "Leasing": "leasing_cleaned",
-        "Bill": "bill_cleaned",
-        "Guest": "guest_cleaned",
-        "General Ledger1": "general_ledger1_cleaned",
-        "General Ledger2": "general_ledger2_cleaned",
-        "General Ledger3": "general_ledger3_cleaned",
+    # Catalog dataset behind each category
+    datasets = {
+        "Tenant Data": "tenant_data",
+        "Work Orders": "work_order",
+        "Prospect": "prospect",
+        "Rent Roll": "rentroll",
+        "Leasing": "leasing",
+        "Bill": "bill",
+        "Guest": "guest",
+        "General Ledger1": "general_ledger1",
+        "General Ledger2": "general_ledger2",
+        "General Ledger3": "general_ledger3",
         "Rent Roll 12 Months": "rentroll_12_months_combined",
     }
     today = datetime.today()
-    # Initialize a dictionary to store the latest file for each category
-    latest_files = {}
-
-    # List all files in the BASE_DIR
-    files_in_directory = os.listdir(BASE_DIR)
-
-    # Function to extract date from the filename
-    def extract_timestamp_from_filename(filename):
-        """
-        Extracts datetime object from filenames like 'tenant_data_cleaned_20250321_115751.csv'
-        """
-        try:
-            # Extract the last two underscore-separated parts before .csv
-            parts = filename.rsplit("_", 2)  # ['tenant_data_cleaned', '20250321', '115751.csv']
-            if len(parts) < 3:
-                raise ValueError("Invalid filename format")
-            
-            date_str, time_str = parts[-2], parts[-1].split(".")[0]  # Get YYYYMMDD and HHMMSS
-
-            # Convert to datetime object
-            return datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
-        except ValueError as e:
-            print(f"Error parsing date from {filename}: {e}")
-            return datetime.min  # Return a minimal datetime to avoid crashing
-
-    # Iterate through each category and find the latest file
-    for category, prefix in file_prefixes.items():
-        # Filter files based on the prefix
-        relevant_files = [f for f in files_in_directory if f.startswith(prefix) and f.endswith(".csv")]
-        
-        if relevant_files:
-            # Sort the files by timestamp extracted from their filenames in descending order (latest first)
-            latest_file = max(relevant_files, key=extract_timestamp_from_filename)
-            latest_files[category] = os.path.join(BASE_DIR, latest_file)
+    # Look up the newest snapshot of each dataset in the catalog (data/catalog.db)
+    latest_files = {category: path for category, path in latest_snapshots(BASE_DIR, datasets).items() if path}
 
     # Print the latest files for each category
     for category, file_path in latest_files.items():
@@ -80,23 +85,23 @@ def show_dashboard():
         "Rent Roll": latest_files.get("Rent Roll"),
         "Bill": latest_files.get("Bill"),
         "Guest": latest_files.get("Guest"),
-        "General Ledger1": latest_files.get("General Ledger1"),
-        "General Ledger2": latest_files.get("General Ledger2"),
-        "General Ledger3": latest_files.get("General Ledger3"),
         "Rent Roll 12 Months": latest_files.get("Rent Roll 12 Months")
     }
-    # 🔹 2. Load DataFrames
+    # 🔹 2. Load DataFrames (read-only shared views; tabs .copy() before changing them)
+    store = get_shared_store()
     dfs = {}
-    for name, path in FILES.items():
-        if os.path.exists(path):  # Check if file exists
-            dfs[name] = pd.read_csv(path)
-        else:
-            st.warning(f"⚠️ File not found: {path}")
+    with prof.section("Load snapshots"):
+        for name, path in FILES.items():
+            if os.path.exists(path):  # Check if file exists
+                dfs[name] = store.frame(path, key=name)
+            else:
+                st.warning(f"⚠️ File not found: {path}")
     # Create folder for images
     IMG_DIR = "plotly_images"
     os.makedirs(IMG_DIR, exist_ok=True)
 
     region_df = pd.read_csv("region_list.csv")
+    engine = get_query_engine(BASE_DIR)
 
     # 🔹 Generate and Save Plotly Charts as Images
     image_paths = []
@@ -111,7 +116,7 @@ def show_dashboard():
             "📄 Billings"
         ])
 
-    with tab1:
+    with tab1, prof.section("Property Performance"):
 
        # Filter data
         rent_roll = dfs["Rent Roll"].copy()
@@ -124,8 +129,8 @@ def show_dashboard():
         trailing_12months = trailing_12months.merge(region_df, on="Property Name", how="left")
         tenant_data = tenant_data.merge(region_df, on="Property Name", how="left")
 
-        properties =  sorted(rent_roll["Property Name"].dropna().unique().tolist() , key=str.lower)
-        regions=  sorted(rent_roll["Region"].dropna().unique().tolist(), key=str.lower)
+        properties = engine.distinct(["rentroll"], "Property Name")
+        regions = engine.distinct(["rentroll"], "Region")
 
 
         col_prop,col_region, col_s= st.columns(3)
@@ -161,57 +166,21 @@ def show_dashboard():
 
         # Metric calculations using filtered data
         col1,col01,col02,col002, col2,col3, col4 = st.columns(7)
-        tenant_data['Lease To'] = pd.to_datetime(tenant_data['Lease To'], errors='coerce')
-        all_units = rent_roll.shape[0]
-        current_resident = rent_roll[rent_roll["Status"] == "Current"].shape[0]
-        notice = rent_roll[rent_roll["Status"] == "Notice-Unrented"].shape[0]
-        notice_re = rent_roll[rent_roll["Status"] == "Notice-Rented"].shape[0]
-        evict = rent_roll[rent_roll["Status"] == "Evict"].shape[0]
-        vacant_rented = rent_roll[rent_roll["Status"] == "Vacant-Rented"].shape[0]
-        vacant_unrented = rent_roll[rent_roll["Status"] == "Vacant-Unrented"].shape[0]
-        future = tenant_data[tenant_data["Status"] == "Future"].shape[0]
-        current_nonrenew = tenant_data[
-            (tenant_data["Status"] == "Current") &
-            (tenant_data["Lease To"] >= today) &
-            (tenant_data["Tenant Tags"].str.contains(r'non[\s-]?renew|not[\s-]?renew', case=False, na=False))
-        ].shape[0]
-        
-        total_vacant = vacant_rented+vacant_unrented
-        occupied = current_resident + evict + notice + notice_re
-        future_rate = ((current_resident + evict + notice + notice_re + future- current_nonrenew)/ all_units) * 100 if all_units > 0 else 0
-        occupied_rate = ((current_resident + evict + notice + notice_re) / all_units) * 100 if all_units > 0 else 0
-
-        # Convert rent columns
-        rent_roll["Rent"] = rent_roll["Rent"].replace("[\$,]", "", regex=True)
-        rent_roll["Rent"] = pd.to_numeric(rent_roll["Rent"], errors="coerce")
-
-        total_residents = rent_roll[rent_roll['Status'] == 'Current'].shape[0]
-        
-        
-        tenant_data['Move-out'] = pd.to_datetime(tenant_data['Move-out'], errors='coerce')
-        ninety_days_before = today - timedelta(days=90)
-        ninety_days_after = today + timedelta(days=90)
-        # Filter rows where Move-out is after ninety_days_before
-        filtered_move_outs = tenant_data[
-            (tenant_data['Lease To'] >= today) & 
-            (tenant_data['Lease To'] <= ninety_days_after)
-        ]
-
-        distinct_units = filtered_move_outs[['Property Name', 'Unit']].drop_duplicates()
-
-        # Count unique apartments moving out
-        total_move_out = len(distinct_units)
-    
-        tenant_data['Move-in'] = pd.to_datetime(tenant_data['Move-in'], errors='coerce')
-        ninety_days_before = today - timedelta(days=90)
-
-        # Filter rows where Move-out is after ninety_days_before
-        filtered_move_ins = tenant_data[tenant_data['Move-in'] >= today]
-        
-        distinct_units_move_in = filtered_move_ins[['Property Name', 'Unit']].drop_duplicates()
-
-        # Count how many tenants moved out
-        total_move_ins = len(distinct_units_move_in)
+        # Headline metrics come from the metric registry; shared intermediates are computed once
+        headline = evaluate_metrics(
+            {"units": rent_roll, "tenant_data": tenant_data},
+            ["total_units", "occupied_units", "vacant_units", "occupancy_rate", "future_occupancy_rate",
+             "upcoming_move_ins", "upcoming_move_outs"],
+            tab_cache.dataset_version(FILES["Rent Roll"], FILES["Tenant Data"]),
+            {"property": selected_property, "region": selected_region},
+        )
+        all_units = headline["total_units"]
+        occupied = headline["occupied_units"]
+        total_vacant = headline["vacant_units"]
+        occupied_rate = headline["occupancy_rate"]
+        future_rate = headline["future_occupancy_rate"]
+        total_move_ins = headline["upcoming_move_ins"]
+        total_move_out = headline["upcoming_move_outs"]
 
         # Display metrics
         col1.metric(label="🏘️ Total Units", value=f"{all_units:,.0f}")
@@ -223,28 +192,35 @@ def show_dashboard():
         col4.metric(label="📤 Move-outs (Next 90 days)", value=f"{total_move_out}")
 
         col5, col6 = st.columns(2)
+
+        # Monthly summaries are shared between workers through the on-disk tab cache
+        trailing_version = tab_cache.dataset_version(FILES["Rent Roll 12 Months"])
+        tab1_filters = {"property": selected_property, "region": selected_region}
         
-        with col5:
+        with col5, prof.section("Monthly Occupancy Trend"):
             
             trailing_12months['date_str'] = pd.to_datetime(trailing_12months['date_str'], format='%m-%d-%Y')
             trailing_12months = trailing_12months.sort_values(by='date_str')
-            summary = []
-            for date, group in trailing_12months.groupby('date_str'):
-                total = len(group)
-                current = group[group['Status'] == 'Current'].shape[0]
-                notice = group[group['Status'] == 'Notice-Rented'].shape[0]
-                evict = group[group['Status'] == 'Evict'].shape[0]
-                notice_un = group[group['Status'] == 'Notice-Unrented'].shape[0]
-                occupied = current +evict+ notice_un+notice
-                occupancy_rate = round((occupied / total) * 100, 2) if total > 0 else 0
-
-                summary.append({
-                    "Month": date.strftime("%b %Y"),
-                    "Occupancy %": occupancy_rate,
-                    "Total Units": total
-                })
 
-            df_occ = pd.DataFrame(summary)
+            def occupancy_by_month():
+                summary = []
+                for date, group in trailing_12months.groupby('date_str'):
+                    total = len(group)
+                    current = group[group['Status'] == 'Current'].shape[0]
+                    notice = group[group['Status'] == 'Notice-Rented'].shape[0]
+                    evict = group[group['Status'] == 'Evict'].shape[0]
+                    notice_un = group[group['Status'] == 'Notice-Unrented'].shape[0]
+                    occupied = current +evict+ notice_un+notice
+                    occupancy_rate = round((occupied / total) * 100, 2) if total > 0 else 0
+
+                    summary.append({
+                        "Month": date.strftime("%b %Y"),
+                        "Occupancy %": occupancy_rate,
+                        "Total Units": total
+                    })
+                return pd.DataFrame(summary)
+
+            df_occ = tab_cache.cached("occupancy_by_month", trailing_version, tab1_filters, occupancy_by_month)
 
             fig = go.Figure()
             # Line chart for Occupancy %
@@ -283,24 +259,27 @@ def show_dashboard():
 
             st.plotly_chart(fig, use_container_width=True)
         
-        with col6:
+        with col6, prof.section("Monthly Breakdown: Vacant-Rented vs Vacant-Unrented"):
             
             trailing_12months['date_str'] = pd.to_datetime(trailing_12months['date_str'], format='%m-%d-%Y')
             trailing_12months = trailing_12months.sort_values(by='date_str')
-            summary = []
-            for date, group in trailing_12months.groupby('date_str'):
-                total = len(group)
-                vacant_rented = group[group['Status'] == 'Vacant-Rented'].shape[0]
-                vacant_unrented = group[group['Status'] == 'Vacant-Unrented'].shape[0]
-
-                summary.append({
-                    "Month": date.strftime("%b %Y"),
-                    "Vacant-Rented": vacant_rented,
-                    "Vacant-Unrented": vacant_unrented,
-                    "Total Units": total
-                })
 
-            df_occ = pd.DataFrame(summary)
+            def vacancy_by_month():
+                summary = []
+                for date, group in trailing_12months.groupby('date_str'):
+                    total = len(group)
+                    vacant_rented = group[group['Status'] == 'Vacant-Rented'].shape[0]
+                    vacant_unrented = group[group['Status'] == 'Vacant-Unrented'].shape[0]
+
+                    summary.append({
+                        "Month": date.strftime("%b %Y"),
+                        "Vacant-Rented": vacant_rented,
+                        "Vacant-Unrented": vacant_unrented,
+                        "Total Units": total
+                    })
+                return pd.DataFrame(summary)
+
+            df_occ = tab_cache.cached("vacancy_by_month", trailing_version, tab1_filters, vacancy_by_month)
             df_occ["Total Vacant"] = df_occ["Vacant-Rented"] + df_occ["Vacant-Unrented"]
 
             fig = go.Figure()
@@ -359,7 +338,7 @@ def show_dashboard():
             
         col7, col8 = st.columns(2)
 
-        with col7:
+        with col7, prof.section("Unit Type Breakdown by Status"):
 
             statuses = [
                 "Current",
@@ -434,7 +413,7 @@ def show_dashboard():
 
           
 
-        with col8:
+        with col8, prof.section("Tenant Status Distribution"):
             # Ensure "Status" column exists
             if "Status" in rent_roll.columns:
                 status_counts = rent_roll["Status"].value_counts().reset_index()
@@ -480,7 +459,7 @@ def show_dashboard():
 
         col9, col10 = st.columns(2)
 
-        with col9:
+        with col9, prof.section("Monthly Move-in"):
 
             tenant_data1 = tenant_data.copy()
             tenant_data1['Move-in'] = pd.to_datetime(tenant_data1['Move-in'], errors='coerce')
@@ -523,7 +502,7 @@ def show_dashboard():
 
             st.plotly_chart(fig1, use_container_width=True)
 
-        with col10:
+        with col10, prof.section("Monthly Lease To"):
             # Prepare move-out data
             tenant_data2 = tenant_data.copy()
             tenant_data2['Lease To'] = pd.to_datetime(tenant_data2['Lease To'], errors='coerce')
@@ -562,25 +541,86 @@ def show_dashboard():
 
             st.plotly_chart(fig2, use_container_width=True)
 
+        # Per-unit timelines over the trailing 12 months, built once per snapshot and shared by workers
+        unit_history = tab_cache.cached(
+            "unit_history", trailing_version, {},
+            lambda: UnitHistory.from_rentrolls(dfs["Rent Roll 12 Months"])
+        )
+        history_properties = trailing_12months["Property Name"].dropna().unique() if (selected_property or selected_region) else None
+
+        col11, col12 = st.columns(2)
+
+        with col11, prof.section("Vacancy Duration"):
+            st.subheader("⏳ Vacancy Duration (Currently Vacant Units)")
+            vacancies = unit_history.vacancy_durations(history_properties)
+            vacancies["Vacant Since"] = vacancies["Vacant Since"].dt.strftime("%b %Y")
+            st.dataframe(vacancies, use_container_width=True, hide_index=True)
+
+        with col12, prof.section("Unit Drilldown"):
+            st.subheader("🔎 Unit Drilldown")
+            unit_keys = unit_history.units(history_properties)
+            selected_unit = st.selectbox(
+                "Select Unit",
+                options=unit_keys,
+                format_func=lambda key: f"{key[0]} – {key[1]}",
+                index=None,
+                key="unit_tab",
+            )
+            if selected_unit:
+                timeline = unit_history.timeline(*selected_unit)
+                timeline["Date"] = timeline["Date"].dt.strftime("%b %Y")
+                st.dataframe(timeline, use_container_width=True, hide_index=True)
+            else:
+                st.dataframe(unit_history.event_counts(history_properties).rename(columns={
+                    "vacated": "Vacated", "leased": "Leased", "went_delinquent": "Went Delinquent"
+                }), use_container_width=True)
+
+        col13 = st.columns(1)[0]
+        with col13, prof.section("KPI Trends"):
+            st.subheader("📈 KPI Trends")
+            # Daily KPI rows recorded by each pipeline run (kpi_history.py), not recomputed from snapshots
+            kpi_metrics = {
+                "Occupancy %": "occupancy",
+                "Economic Occupancy %": "economic_occupancy",
+                "NOI (Month to Date)": "noi",
+                "Past Due": "past_due",
+                "Delinquent Units": "delinquent_units",
+                "Avg Days Vacant": "vacancy_days",
+                "Open Work Orders": "open_work_orders",
+            }
+            selected_kpi = st.selectbox("Select KPI", options=list(kpi_metrics), key="kpi_tab")
+            kpi_properties = rent_roll["Property Name"].dropna().unique() if (selected_property or selected_region) else None
+            kpi_history = KPIHistory(BASE_DIR).load(kpi_properties)
 
-    with tab2:
+            if kpi_history.empty:
+                st.info("No KPI history recorded yet. Run `python kpi_history.py record` to add today's KPIs.")
+            else:
+                kpi_trend = kpi_portfolio(kpi_history)
+                fig = px.line(
+                    kpi_trend,
+                    x="date",
+                    y=kpi_metrics[selected_kpi],
+                    markers=True,
+                    title=f"📈 {selected_kpi} Over Time",
+                    labels={"date": "Date", kpi_metrics[selected_kpi]: selected_kpi},
+                )
+                fig.update_layout(width=1000, height=500)
+                st.plotly_chart(fig, use_container_width=True)
+
+
+    with tab2, prof.section("Financials"):
          # Filter data
         rent_roll = dfs["Rent Roll"].copy()
         rent_roll2 = dfs["Rent Roll"].copy()
-        general_ledger1 = dfs["General Ledger1"].copy()
-        general_ledger2 = dfs["General Ledger2"].copy()
-        general_ledger3 = dfs["General Ledger3"].copy()
         trailing_12months = dfs["Rent Roll 12 Months"].copy()  
-        general_ledger = pd.concat([general_ledger1, general_ledger2, general_ledger3], ignore_index=True)
         
         rent_roll = rent_roll.merge(region_df, on="Property Name", how="left")
         rent_roll2 = rent_roll2.merge(region_df, on="Property Name", how="left")
-        general_ledger = general_ledger.merge(region_df, on="Property Name", how="left")
         trailing_12months = trailing_12months.merge(region_df, on="Property Name", how="left")
 
-        properties1 =  sorted(rent_roll["Property Name"].dropna().unique().tolist() , key=str.lower)
-        regions1=  sorted(rent_roll["Region"].dropna().unique().tolist(), key=str.lower)
-        gl_accounts1 =  sorted(general_ledger1["GL Account"].dropna().unique().tolist(), key=str.lower)
+        properties1 = engine.distinct(["rentroll"], "Property Name")
+        regions1 = engine.distinct(["rentroll"], "Region")
+        gl_accounts1 = engine.distinct(["general_ledger1"], "GL Account")
 
         col_prop1, col_region1,col_gl1 = st.columns(3)
 
@@ -606,13 +646,11 @@ def show_dashboard():
             rent_roll = rent_roll[rent_roll["Property Name"].isin(selected_property1)]
             rent_roll2 = rent_roll2[rent_roll2["Property Name"].isin(selected_property1)]
             trailing_12months = trailing_12months[trailing_12months["Property Name"].isin(selected_property1)]
-            general_ledger = general_ledger[general_ledger["Property Name"].isin(selected_property1)]
 
         if selected_region1:
             rent_roll = rent_roll[rent_roll["Region"].isin(selected_region1)]
             rent_roll2 = rent_roll2[rent_roll2["Region"].isin(selected_region1)]
             trailing_12months = trailing_12months[trailing_12months["Region"].isin(selected_region1)]
-            general_ledger = general_ledger[general_ledger["Region"].isin(selected_region1)]
 
 
          # Metric calculations using filtered data
@@ -624,71 +662,22 @@ def show_dashboard():
         rent_roll["Rent"] = pd.to_numeric(rent_roll["Rent"], errors="coerce")
         total_rent = rent_roll["Rent"].sum()
         total_rent_count = rent_roll.shape[0]
-        general_ledger['GL Account Code'] = general_ledger['GL Account'].str.extract(r'(\d{4})')
-        general_ledger['GL Account Code'] = pd.to_numeric(general_ledger['GL Account Code'], errors='coerce')
-
-        total_rent_df = general_ledger[(general_ledger['GL Account Code'] >= 4100) & (general_ledger['GL Account Code'] <= 4104)]
-        total_operating_income_df = general_ledger[(general_ledger['GL Account Code'] >= 4100) & (general_ledger['GL Account Code'] <= 5721)]
-        total_operating_expense_df = general_ledger[
-                ((general_ledger['GL Account Code'] >= 6210) & (general_ledger['GL Account Code'] < 6521)) |
-                (general_ledger['GL Account Code'].isin([6561, 6565, 6567, 6564])) |
-                ((general_ledger['GL Account Code'] >= 6730) & (general_ledger['GL Account Code'] < 7611)) |
-                (general_ledger['GL Account Code'].isin([7626,7627, 6563]))
-        ]
-
-            # Include 'Liability to Landlord Insurance' even without a GL Account Code
-        insurance_df = general_ledger[general_ledger['GL Account'] == 'Liability to Landlord Insurance']
-
-            # Combine operating income and insurance
-        total_operating_income_df = pd.concat([total_operating_income_df, insurance_df], ignore_index=True)
-
-            # Convert the 'Date' column to datetime to extract the month
-        total_rent_df['Date'] = pd.to_datetime(total_rent_df['Date'])
-        total_rent_df['Month'] = total_rent_df['Date'].dt.strftime('%Y-%m')
-        total_operating_income_df['Date'] = pd.to_datetime(total_operating_income_df['Date'])
-        total_operating_income_df['Month'] = total_operating_income_df['Date'].dt.strftime('%Y-%m')
-        total_operating_expense_df['Date'] = pd.to_datetime(total_operating_expense_df['Date'])
-        total_operating_expense_df['Month'] = total_operating_expense_df['Date'].dt.strftime('%Y-%m')
-            
-
-            # Clean Credit and Debit columns
-        def clean_amount(df, column):
-            df[column] = df[column].replace("[\,]", "", regex=True).replace("", "0").astype(float).round(2)
-            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).round(2)
-
-        clean_amount(total_rent_df, "Credit")
-        clean_amount(total_rent_df, "Debit")
-        clean_amount(total_operating_income_df, "Credit")
-        clean_amount(total_operating_income_df, "Debit")
-        clean_amount(total_operating_expense_df, "Credit")
-        clean_amount(total_operating_expense_df, "Debit")
-
-            # Calculate Net Income before grouping
-        total_rent_df["Net Income"] = total_rent_df["Credit"] - total_rent_df["Debit"]
-        total_operating_income_df["Net Income"] = total_operating_income_df["Credit"] - total_operating_income_df["Debit"]
-        total_operating_expense_df["Expense"] = total_operating_expense_df["Debit"]  -  total_operating_expense_df["Credit"]
+        # Monthly rent income, operating income and expenses are aggregated in DuckDB;
+        # only one row per month comes back
+        monthly_summary = tab_cache.cached(
+            "ledger_monthly_summary",
+            engine.snapshot_version(LEDGER_DATASETS),
+            {"property": selected_property1, "region": selected_region1},
+            lambda: engine.ledger_monthly_summary(
+                LEDGER_DATASETS, properties=selected_property1, regions=selected_region1
+            ),
+        )
 
         col025 = st.columns(1)[0]
 
-        with col025:    
+        with col025, prof.section("Monthly Total Rent Income and Net Income Table"):
 
             total_units = rent_roll['Property Name'].count()
-            # Group by month
-            monthly_rent_income = total_rent_df.groupby('Month')["Net Income"].sum().reset_index()
-            monthly_rent_income.columns = ['Month', 'Total Rent Income']
-
-            monthly_operating_income = total_operating_income_df.groupby('Month')["Net Income"].sum().reset_index()
-            monthly_operating_income.columns = ['Month', 'Total Operating Income']
-
-            monthly_operating_expense = total_operating_expense_df.groupby('Month')["Expense"].sum().reset_index()
-            monthly_operating_expense.columns = ['Month', 'Total Operating Expense']
-
-            # Merge the two dataframes
-            # Merge rent income and operating income
-            monthly_summary = pd.merge(monthly_rent_income, monthly_operating_income, on="Month", how="outer").fillna(0)
-
-            # Merge with operating expenses
-            monthly_summary = pd.merge(monthly_summary, monthly_operating_expense, on="Month", how="outer").fillna(0)
 
             monthly_summary['NOI'] = monthly_summary['Total Operating Income'] - monthly_summary['Total Operating Expense']
             monthly_summary['Expense Ratio'] = (monthly_summary['Total Operating Expense'] / monthly_summary['Total Operating Income']) * 100
@@ -759,7 +748,7 @@ def show_dashboard():
 
         col251 = st.columns(1)[0]
 
-        with col251:
+        with col251, prof.section("Monthly Economic Occupancy & Vacant Breakdown"):
             # Convert to datetime and extract months
             trailing_12months['date_str'] = pd.to_datetime(trailing_12months['date_str'], errors='coerce')
             trailing_12months['Month'] = trailing_12months['date_str'].dt.to_period("M").dt.to_timestamp()
@@ -836,7 +825,7 @@ def show_dashboard():
 
         col26, col27= st.columns(2)
 
-        with col26:
+        with col26, prof.section("Average In Place rent vs Current Asking Rent"):
             # Clean Rent and Market Rent columns
             rent_roll["Rent"] = pd.to_numeric(rent_roll["Rent"].replace("[\$,]", "", regex=True), errors="coerce")
             rent_roll["Market Rent"] = pd.to_numeric(rent_roll["Market Rent"].replace("[\$,]", "", regex=True), errors="coerce")
@@ -907,7 +896,7 @@ def show_dashboard():
             st.plotly_chart(fig3, use_container_width=True)
 
 
-        with col27:
+        with col27, prof.section("Property Leasing Summary: Average Rent, Market Rent & Variances"):
 
             rent_roll["Rent"] = pd.to_numeric(rent_roll["Rent"].replace(r"[\$,]", "", regex=True), errors="coerce")
             rent_roll["Market Rent"] = pd.to_numeric(rent_roll["Market Rent"].replace(r"[\$,]", "", regex=True), errors="coerce")
@@ -958,15 +947,11 @@ def show_dashboard():
             st.dataframe(styled_summary)
 
 
-    with tab3:
-        df_guest= dfs["Guest"].copy()
-        df_guest1 = dfs["Guest"].copy()
-        
-        df_guest = df_guest.merge(region_df, left_on="Property Name", right_on="Property Name", how="left")
-        df_guest1 = df_guest1.merge(region_df, left_on="Property Name", right_on="Property Name", how="left")
+    with tab3, prof.section("Leasing"):
+        guest_index = get_time_index("Guest", FILES["Guest"])
 
-        properties3 =  sorted(df_guest["Property Name"].dropna().unique().tolist() , key=str.lower)
-        regions3=  sorted(df_guest["Region"].dropna().unique().tolist(), key=str.lower)
+        properties3 =  sorted(dfs["Guest"]["Property Name"].dropna().unique().tolist() , key=str.lower)
+        regions3=  sorted(region_df.loc[region_df["Property Name"].isin(properties3), "Region"].dropna().unique().tolist(), key=str.lower)
 
         col_prop3,col_region3,col_date1, col_date2 = st.columns(4)
 
@@ -992,7 +977,11 @@ def show_dashboard():
 
         with col_date2:
             end_date = st.date_input("End Date", value=datetime.now(), key="end_date3")
-            
+
+        # Only the rows inside the date range are taken from the sorted time index
+        df_guest = guest_index.between(start_date, end_date)
+        df_guest = df_guest.merge(region_df, left_on="Property Name", right_on="Property Name", how="left")
+        df_guest1 = df_guest.copy()
 
         if selected_region3:
             df_guest = df_guest[df_guest["Region"].isin(selected_region3)]
@@ -1002,15 +991,9 @@ def show_dashboard():
             df_guest = df_guest[df_guest["Property Name"].isin(selected_property3)]
             df_guest1 = df_guest1[df_guest1["Property Name"].isin(selected_property3)]
 
-        if "Inquiry Received" in df_guest.columns:
-            df_guest["Inquiry Received"] = pd.to_datetime(df_guest["Inquiry Received"], errors="coerce")
-            df_guest = df_guest[(df_guest["Inquiry Received"] >= pd.to_datetime(start_date)) & (df_guest["Inquiry Received"] <= pd.to_datetime(end_date))]
-            df_guest1["Inquiry Received"] = pd.to_datetime(df_guest1["Inquiry Received"], errors="coerce")
-            df_guest1 = df_guest1[(df_guest1["Inquiry Received"] >= pd.to_datetime(start_date)) & (df_guest1["Inquiry Received"] <= pd.to_datetime(end_date))]
-        
         col36, col37 = st.columns(2)
 
-        with col36:
+        with col36, prof.section("Leasing Funnel Overview"):
 
             # Sum values across all properties
             funnel_counts = {
@@ -1053,7 +1036,7 @@ def show_dashboard():
             # Show in Streamlit
             st.plotly_chart(fig, use_container_width=True)
 
-        with col37:
+        with col37, prof.section("Guest Card Inquiries vs Converted Tenants by Source"):
         
             df_guest = dfs["Guest"].copy()
 
@@ -1111,9 +1094,9 @@ def show_dashboard():
             st.plotly_chart(fig, use_container_width=True)
 
 
-    with tab4:
+    with tab4, prof.section("Maintenance"):
         
-        df_work = dfs["Work Orders"].copy()
+        df_work = get_time_index("Work Orders", FILES["Work Orders"]).all()  # "Created At" already parsed
         df_work1 = dfs["Work Orders"].copy()
 
         df_work = df_work.merge(region_df, on="Property Name", how="left")
@@ -1150,47 +1133,30 @@ def show_dashboard():
 
         col45, col46 = st.columns(2)
 
-        with col45:
+        with col45, prof.section("Most Common Terms in Work Order Descriptions"):
             
             st.subheader("🛠️ Most Common Terms in Work Order Descriptions")
 
             if "Job Description" in df_work.columns:
-                # Combine all job descriptions into one big string
-                text = " ".join(str(desc) for desc in df_work['Job Description'].dropna())
-
-                if text.strip():  # ✅ Only proceed if there's non-empty text
-                    custom_stopwords = set(STOPWORDS)
-                    custom_stopwords.update([
-                        "unit", "please", "de", "la", "y", "need", "working", "lo", "needs", "por", "come", "fix", "que", "se", "en", "el",
-                        "agua", "funciona", "cocina"
-                    ])
-
-                    # Generate the Word Cloud
-                    wordcloud = WordCloud(
-                        width=800,
-                        height=400,
-                        background_color='white',
-                        colormap='tab10',
-                        max_words=100,
-                        contour_width=0.5,
-                        contour_color='steelblue',
-                        stopwords=custom_stopwords,
-                    ).generate(text)
-
-                    # Display it with Matplotlib in Streamlit
-                    fig, ax = plt.subplots(figsize=(12, 6))
-                    ax.imshow(wordcloud, interpolation='bilinear')
-                    ax.axis('off')
-                    st.pyplot(fig)
+                # Built from the per-property term index of this snapshot, cached per filter state
+                work_version = tab_cache.dataset_version(FILES["Work Orders"], "region_list.csv")
+                cloud_png = word_cloud_png(
+                    dfs["Work Orders"],
+                    work_version,
+                    df_work["Property Name"].unique(),
+                    {"property": selected_property4, "region": selected_region4},
+                )
+
+                if cloud_png is not None:  # ✅ Only show if there are terms to draw
+                    st.image(cloud_png, use_container_width=True)
 
                 else:
                     st.warning("⚠️ No job descriptions available to generate a word cloud.")
             else:
                 st.warning("⚠️ 'Job Description' column not found in the data.")
 
-        with col46:
+        with col46, prof.section("Monthly Work Orders by Status"):
 
-            df_work["Created At"] = pd.to_datetime(df_work["Created At"], errors="coerce")
             df_work = df_work.dropna(subset=["Created At", "Status"])
 
             # Create proper Month column
@@ -1273,17 +1239,15 @@ def show_dashboard():
 
             st.plotly_chart(fig, use_container_width=True)
 
-    with tab5:
+    with tab5, prof.section("Tenants"):
 
         rent_roll = dfs["Rent Roll"].copy()
         tenant_data = dfs["Tenant Data"].copy()
         tenant_data1 = dfs["Tenant Data"].copy()
-        trailing_12months = dfs["Rent Roll 12 Months"].copy()  
 
         rent_roll = rent_roll.merge(region_df, on="Property Name", how="left")
         tenant_data = tenant_data.merge(region_df, on="Property Name", how="left")
         tenant_data1 = tenant_data1.merge(region_df, on="Property Name", how="left")
-        trailing_12months = trailing_12months.merge(region_df, on="Property Name", how="left")
     
         properties5 =  sorted(rent_roll["Property Name"].dropna().unique().tolist() , key=str.lower)
         region5 =  sorted(rent_roll["Region"].dropna().unique().tolist(), key=str.lower)
@@ -1306,18 +1270,25 @@ def show_dashboard():
                 key="region_tab5"
             )   
 
+        with col_s5:
+            delinquency_threshold = st.number_input(
+                "Delinquent when Past Due is over ($)",
+                min_value=0,
+                value=DELINQUENT_PAST_DUE,
+                step=100,
+                key="delinquency_threshold_tab5"
+            )
+
 
         if selected_property5:
             rent_roll = rent_roll[rent_roll["Property Name"].isin(selected_property5)]
             tenant_data = tenant_data[tenant_data["Property Name"].isin(selected_property5)]
             tenant_data1 = tenant_data1[tenant_data1["Property Name"].isin(selected_property5)]
-            trailing_12months = trailing_12months[trailing_12months["Property Name"].isin(selected_property5)]
 
         if selected_region5:
             rent_roll = rent_roll[rent_roll["Region"].isin(selected_region5)]
             tenant_data = tenant_data[tenant_data["Region"].isin(selected_region5)]
             tenant_data1 = tenant_data1[tenant_data1["Region"].isin(selected_region5)]
-            trailing_12months = trailing_12months[trailing_12months["Region"].isin(selected_region5)]
 
         col51, col52, col53, col54, col054 = st.columns(5)
 
@@ -1325,13 +1296,13 @@ def show_dashboard():
         eviction_filings = rent_roll[rent_roll['Status'] == 'Evict'].shape[0]
         notice = tenant_data[tenant_data['Status'] == 'Notice'].shape[0]
         future = tenant_data[tenant_data['Status'] == 'Future'].shape[0]
-        rent_roll['Past Due'] = (
-                rent_roll['Past Due']
-                .astype(str)  # ensure it is string first
-                .str.replace(r'[\$,]', '', regex=True)  # remove $ and commas
-            )
-        rent_roll['Past Due'] = pd.to_numeric(rent_roll['Past Due'], errors='coerce').fillna(0)
-        total_del = rent_roll.loc[rent_roll['Past Due'] > 500, 'Past Due'].sum()
+
+        # Past due balances come from the delinquency ledger (delinquency.py), parsed once per snapshot
+        delinquency_properties = rent_roll["Property Name"].dropna().unique() if (selected_property5 or selected_region5) else None
+        with DelinquencyLedger(BASE_DIR) as delinquency_ledger:
+            delinquent = delinquency_ledger.balances(delinquency_threshold, delinquency_properties)
+            delinquency_by_month = delinquency_ledger.monthly_totals(delinquency_threshold, delinquency_properties)
+        total_del = delinquent["Past Due"].sum()
         
         # Display the metric card
         col51.metric(label="🏠Current Occupied Units", value=f"{total_residents:,.0f}")
@@ -1342,19 +1313,9 @@ def show_dashboard():
 
         col55= st.columns(1)[0]
 
-        with col55:
+        with col55, prof.section("Late Tenants: Past Due vs Late Count"):
 
-            # Clean columns
-            rent_roll['Past Due'] = (
-                rent_roll['Past Due']
-                .astype(str)  # ensure it is string first
-                .str.replace(r'[\$,]', '', regex=True)  # remove $ and commas
-            )
-            rent_roll['Past Due'] = pd.to_numeric(rent_roll['Past Due'], errors='coerce').fillna(0)
-            rent_roll['Late Count'] = pd.to_numeric(rent_roll['Late Count'], errors='coerce').fillna(0)
-            
-            df_late = rent_roll[rent_roll['Past Due'] >500]
-            df_late = df_late.sort_values(by="Past Due", ascending=False).head(30)  # top 30 tenants
+            df_late = delinquent.head(30)  # top 30 tenants, largest balance first
  
             # Plotly dual-axis chart
             fig = go.Figure()
@@ -1409,7 +1370,7 @@ def show_dashboard():
             st.plotly_chart(fig, use_container_width=True)
 
         col56,col57= st.columns(2)
-        with col56:
+        with col56, prof.section("Eviction_Filings by Property"):
                         # Group by Property
             summary = (
                 rent_roll.groupby("Property Name")
@@ -1444,30 +1405,13 @@ def show_dashboard():
 
             st.plotly_chart(fig, use_container_width=True)
 
-        with col57:
+        with col57, prof.section("Total Delinquency by Month (Trailing 12 Months)"):
             
-                    # Convert date string to datetime
-            trailing_12months['date_str'] = pd.to_datetime(trailing_12months['date_str'], format='%m-%d-%Y')
-
-            # Clean 'Past Due' column: remove symbols, convert to float
-            trailing_12months['Past Due'] = (
-                trailing_12months['Past Due']
-                .astype(str)
-                .str.replace(r'[\$,]', '', regex=True)
-            )
-            trailing_12months['Past Due'] = pd.to_numeric(trailing_12months['Past Due'], errors='coerce').fillna(0)
-
-            # Extract Year-Month from date
-            trailing_12months['Month'] = trailing_12months['date_str'].dt.to_period('M').dt.to_timestamp()
-            df_late = trailing_12months[trailing_12months['Past Due'] >500]
-
-            # Group by month and sum delinquency
-            df_delinquency = (
-                df_late.groupby('Month')['Past Due']
-                .sum()
-                .reset_index()
-                .sort_values('Month')
-            )
+            # Latest snapshot of each month in the ledger
+            df_delinquency = delinquency_by_month.copy()
+            if df_delinquency.empty:
+                st.info("No rent rolls in the delinquency ledger yet. The next ingestion run fills it "
+                        "from the catalog, or run `python delinquency.py replay`.")
 
             # Format month for display
             df_delinquency['Month Label'] = df_delinquency['Month'].dt.strftime('%b %Y')
@@ -1496,26 +1440,9 @@ def show_dashboard():
             st.plotly_chart(fig, use_container_width=True)
 
         col58 = st.columns(1)[0]
-        with col58:
-
-            # Clean the 'Past Due' column: remove $ and commas, convert to float
-            rent_roll['Past Due'] = (
-                rent_roll['Past Due']
-                .astype(str)  # Convert to string in case of mixed types
-                .str.replace(r'[$,]', '', regex=True)  # Remove $ and commas
-            )
-
-            # Convert to numeric, coercing any invalid entries to NaN, then fill NaN with 0
-            rent_roll['Past Due'] = pd.to_numeric(rent_roll['Past Due'], errors='coerce').fillna(0)
-
-            # Filter for tenants who have any amount past due
-            df_delinquent = rent_roll[rent_roll['Past Due'] > 500]
-
-            summary = df_delinquent.groupby('BD/BA').agg(
-                Delinquent_Units=('Unit', 'count'),
-                Delinquent_Amount=('Past Due', 'sum')
-            ).reset_index()
+        with col58, prof.section("Delinquency by Unit Type (BD/BA)"):
 
+            summary = summary_by(delinquent, "BD/BA")
             summary = summary.sort_values(by='Delinquent_Units', ascending=False)
 
             fig = go.Figure()
@@ -1569,22 +1496,97 @@ def show_dashboard():
 
             st.plotly_chart(fig, use_container_width=True)
 
-    with tab6:
+        col058 = st.columns(1)[0]
+        with col058, prof.section("Delinquency Aging"):
+
+            # Age of each balance: days since it was first seen past due without a break
+            aging = aging_summary(delinquent)
+
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=aging["Aging"],
+                y=aging["Amount"],
+                name="Past Due $",
+                marker_color="indianred",
+                text=aging["Amount"].map('${:,.0f}'.format),
+                textposition="auto"
+            ))
+            fig.add_trace(go.Scatter(
+                x=aging["Aging"],
+                y=aging["Tenants"],
+                name="Tenants",
+                yaxis="y2",
+                mode="lines+markers+text",
+                text=aging["Tenants"],
+                textposition="top center",
+                line=dict(color="green"),
+                marker=dict(size=10)
+            ))
+
+            fig.update_layout(
+                title="⏳ Delinquency Aging (Days Past Due)",
+                xaxis=dict(title="Days Past Due"),
+                yaxis=dict(title=dict(text="Past Due ($)"), tickformat="$.2s"),
+                yaxis2=dict(title=dict(text="Tenants"), overlaying="y", side="right", showgrid=False),
+                legend=dict(title="Metric"),
+                width=1000,
+                height=600
+            )
+
+            st.plotly_chart(fig, use_container_width=True)
+
+        col59 = st.columns(1)[0]
+        with col59, prof.section("Unit Events by Month"):
+
+            # Read from the event log diffed at ingestion (snapshot_events.py), not from the snapshots
+            event_properties = rent_roll["Property Name"].dropna().unique() if (selected_property5 or selected_region5) else None
+            with EventLog(BASE_DIR) as event_log:
+                event_counts = event_log.monthly_counts(
+                    "rentroll", ("move_in", "move_out", "new_delinquency"), properties=event_properties
+                ).reset_index()
+
+            if event_counts.empty:
+                st.info("No unit events logged yet. Run `python snapshot_events.py replay` to build the log.")
+            else:
+                fig = go.Figure()
+                for event, label, color in [
+                    ("move_in", "Move-ins", "seagreen"),
+                    ("move_out", "Move-outs", "indianred"),
+                    ("new_delinquency", "New Delinquencies", "orange"),
+                ]:
+                    fig.add_trace(go.Bar(
+                        x=event_counts["Month"],
+                        y=event_counts[event],
+                        name=label,
+                        marker_color=color,
+                        text=event_counts[event],
+                        textposition="auto"
+                    ))
+
+                fig.update_layout(
+                    title="🔄 Move-ins, Move-outs & New Delinquencies by Month",
+                    xaxis_title="Month",
+                    yaxis_title="Units",
+                    barmode="group",
+                    legend=dict(title="Event"),
+                    width=1000,
+                    height=600
+                )
+
+                st.plotly_chart(fig, use_container_width=True)
+
+    with tab6, prof.section("Billings"):
         
-        bill = dfs["Bill"].copy()
+        bill = get_time_index("Bill", FILES["Bill"]).all()  # "Bill Date" already parsed
         bill1 = dfs["Bill"].copy()
-        general_ledger1 = dfs["General Ledger1"].copy()
-        general_ledger2 = dfs["General Ledger2"].copy()
         trailing_12months = dfs["Rent Roll 12 Months"].copy()  
         
-        general_ledger = pd.concat([general_ledger1, general_ledger2], ignore_index=True)
         trailing_12months = trailing_12months.merge(region_df, on="Property Name", how="left")
 
         bill = bill.merge(region_df, on="Property Name", how="left")
         bill['GL Account Code'] = bill['GL Account'].str.extract(r'(\d{4})')
         bill1 = bill1.merge(region_df, on="Property Name", how="left")
         bill1['GL Account Code'] = bill1['GL Account'].str.extract(r'(\d{4})')
-        general_ledger = general_ledger.merge(region_df, on="Property Name", how="left")
 
         properties6 =  sorted(dfs["Bill"]["Property Name"].dropna().unique().tolist() , key=str.lower)
         properties06 = sorted(dfs["Bill"]["Payee Name"].dropna().unique().tolist(), key=str.lower)
@@ -1636,7 +1638,6 @@ def show_dashboard():
         if selected_property6:
             bill = bill[bill["Property Name"].isin(selected_property6)]
             bill1 = bill1[bill1["Property Name"].isin(selected_property6)]
-            general_ledger = general_ledger[general_ledger["Property Name"].isin(selected_property6)]
 
         if selected_property06:
             bill = bill[bill["Payee Name"].isin(selected_property06)]
@@ -1646,19 +1647,20 @@ def show_dashboard():
         if selected_region6:
             bill = bill[bill["Region"].isin(selected_region6)]
             bill1 = bill1[bill1["Region"].isin(selected_region6)]
-            general_ledger = general_ledger[general_ledger["Region"].isin(selected_region6)]
 
         if selected_gl6:
             bill = bill[bill["GL Account Name"].isin(selected_gl6)]
             bill1 = bill1[bill1["GL Account Name"].isin(selected_gl6)]
 
+        general_ledger = engine.rows(
+            ["general_ledger1", "general_ledger2"], properties=selected_property6, regions=selected_region6
+        )
 
 
         col65 = st.columns(1)[0]
 
-        with col65:
+        with col65, prof.section("Paid vs Unpaid Amounts by Month (Split by Approval)"):
 
-            bill['Bill Date'] = pd.to_datetime(bill['Bill Date'], errors='coerce')
             bill['Month'] = bill['Bill Date'].dt.to_period("M").astype(str)
 
             bill['Paid'] = bill['Paid'].astype(str).str.replace(r'[$,]', '', regex=True)
@@ -1679,8 +1681,9 @@ def show_dashboard():
             bill['Is_Approved'] = bill['Approval Status'].str.contains("approved", case=False, na=False)
 
             # Split unpaid amounts
-            bill['Unpaid_Approved'] = bill.apply(lambda row: row['Unpaid'] if row['Is_Approved'] else 0, axis=1)
-            bill['Unpaid_Unapproved'] = bill.apply(lambda row: row['Unpaid'] if not row['Is_Approved'] else 0, axis=1)
+            with prof.section("bill.apply approval split"):
+                bill['Unpaid_Approved'] = bill.apply(lambda row: row['Unpaid'] if row['Is_Approved'] else 0, axis=1)
+                bill['Unpaid_Unapproved'] = bill.apply(lambda row: row['Unpaid'] if not row['Is_Approved'] else 0, axis=1)
 
             # Group by month
             monthly_summary = bill.groupby('Month').agg({
@@ -1770,10 +1773,9 @@ def show_dashboard():
         
         col66 = st.columns(1)[0]
         col67 = st.columns(1)[0]
-        with col66:
+        with col66, prof.section("Monthly Spend by Top 10 Vendor"):
 
             # Ensure columns are in correct type
-            bill['Bill Date'] = pd.to_datetime(bill['Bill Date'], errors='coerce')
             bill['Paid'] = pd.to_numeric(bill['Paid'], errors='coerce')
 
             # Drop nulls in critical fields
@@ -1820,7 +1822,7 @@ def show_dashboard():
 
             st.plotly_chart(fig, use_container_width=True)
 
-        with col67:
+        with col67, prof.section("Paid vs Unpaid by Vendor (Stacked) + Reference Count"):
             # Clean and prepare columns
             bill['Paid'] = pd.to_numeric(bill['Paid'], errors='coerce').fillna(0)
             bill['Unpaid'] = pd.to_numeric(bill['Unpaid'], errors='coerce').fillna(0)
@@ -1831,8 +1833,9 @@ def show_dashboard():
             bill['Is_Approved'] = bill['Approval Status'].str.contains("approved", case=False, na=False)
 
             # Split unpaid
-            bill['Unpaid_Approved'] = bill.apply(lambda row: row['Unpaid'] if row['Is_Approved'] else 0, axis=1)
-            bill['Unpaid_Unapproved'] = bill.apply(lambda row: row['Unpaid'] if not row['Is_Approved'] else 0, axis=1)
+            with prof.section("bill.apply approval split"):
+                bill['Unpaid_Approved'] = bill.apply(lambda row: row['Unpaid'] if row['Is_Approved'] else 0, axis=1)
+                bill['Unpaid_Unapproved'] = bill.apply(lambda row: row['Unpaid'] if not row['Is_Approved'] else 0, axis=1)
 
             # Group by vendor
             summary = (
@@ -0,0 +1,255 @@
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import bcrypt
+
+from user_store import _DUMMY_HASH, LoginThrottle, get_user_store, normalize_email, verify_password
+
+POSTGRES_SETTINGS = {
+    "host": os.getenv("APPFOLIO_DB_HOST", "localhost"),
+    "port": int(os.getenv("APPFOLIO_DB_PORT", "5432")),
+    "database": os.getenv("APPFOLIO_DB_NAME", "appfolio_db"),
+    "user": os.getenv("APPFOLIO_DB_USER", "postgres"),
+    "password": os.getenv("APPFOLIO_DB_PASSWORD", "123"),
+}
+
+USER_FIELDS = ("name", "email", "password", "role")
+# Every lookup filters on lower(email), so that expression is what gets indexed
+EMAIL_INDEX = "CREATE INDEX IF NOT EXISTS users_lower_email ON users (lower(email))"
+
+
+def user_lookup(conn, placeholder):
+    """The user lookup for this database. Tables without a `role` column make everyone a 'user',
+    as users.yaml entries without a role are."""
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM users LIMIT 0")
+    columns = {column[0].lower() for column in cur.description}
+    cur.close()
+    role = "role" if "role" in columns else "'user'"
+    return f"SELECT name, email, password, {role} FROM users WHERE lower(email) = {placeholder}"
+
+
+def create_email_index(conn):
+    """Index lower(email) so lookups don't scan the table; logged and skipped without DDL rights."""
+    try:
+        cur = conn.cursor()
+        cur.execute(EMAIL_INDEX)
+        cur.close()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logging.info(f"Could not create the users lower(email) index: {e}")
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def password_matches(password, stored):
+    """Check against a bcrypt hash, or the legacy unsalted SHA-256 hex the users table holds."""
+    if stored.startswith("$2"):
+        return bcrypt.checkpw(password.encode(), stored.encode())
+    return hmac.compare_digest(hash_password(password), stored)
+
+
+class PoolTimeout(Exception):
+    """Raised when no database connection frees up in time."""
+
+
+class ConnectionPool:
+    """At most `size` open connections, handed out one caller at a time.
+
+    Connections are opened lazily, so a burst of logins opens no more than `size` of them
+    and the rest wait up to `timeout` seconds. A connection idle for longer than
+    `health_check_after` seconds is pinged before use and replaced if it went away.
+    """
+
+    def __init__(self, connect, size=5, timeout=10, health_check_after=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.idle = queue.LifoQueue()  # (connection, returned at); LIFO keeps the warmest in use
+        self.slots = threading.BoundedSemaphore(size)
+
+    def _healthy(self, conn):
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            return True
+        except Exception as e:
+            logging.info(f"Dropping dead database connection: {e}")
+            return False
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, returned_at = self.idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            if time.monotonic() - returned_at < self.health_check_after or self._healthy(conn):
+                return conn
+            close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection free after {self.timeout}s")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.rollback()  # leave no transaction open on an idle connection
+            self.idle.put((conn, time.monotonic()))
+        except BaseException:
+            if conn is not None:
+                close_quietly(conn)
+            raise
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            close_quietly(conn)
+
+
+def close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class DatabaseUserStore:
+    """Login backend over a SQLite `users` table, with the same interface as user_store.UserStore."""
+
+    def __init__(self, pool, throttle=None, verify_timeout=10):
+        self.pool = pool
+        self.throttle = throttle or LoginThrottle()
+        self.verify_timeout = verify_timeout
+        self.lookup = None
+
+    def _fetch_user(self, conn, email):
+        if self.lookup is None:
+            self.lookup = user_lookup(conn, "?")
+        cur = conn.cursor()
+        # Constant statement text, so sqlite3's statement cache prepares it once per connection
+        cur.execute(self.lookup, (email,))
+        row = cur.fetchone()
+        cur.close()
+        return row
+
+    def get(self, email):
+        """{"name", "email", "password", "role"} for `email`, or None."""
+        with self.pool.connection() as conn:
+            row = self._fetch_user(conn, normalize_email(email))
+        return dict(zip(USER_FIELDS, row)) if row else None
+
+    def authenticate(self, email, password, client_ip=None):
+        """Return {"name", "email", "role"} for valid credentials, else None.
+
+        Raises LoginThrottled when the email or client IP has too many recent failures, and
+        LoginBusy when the password check doesn't get a turn on the bcrypt pool in time.
+        """
+        email = normalize_email(email)
+        keys = [f"email:{email}"] + ([f"ip:{client_ip}"] if client_ip else [])
+        self.throttle.check(*keys)
+
+        user = self.get(email)
+        # An unknown email is checked against a dummy hash, so it takes as long as a wrong password
+        hashed = user["password"] if user else _DUMMY_HASH
+        try:
+            match = verify_password(password_matches, password, hashed, timeout=self.verify_timeout)
+        except ValueError as e:  # malformed hash in the users table
+            logging.info(f"bcrypt error for {email}: {e}")
+            match = False
+
+        if user and match:
+            self.throttle.reset(f"email:{email}")
+            return {"name": user["name"], "email": user["email"], "role": user["role"] or "user"}
+
+        self.throttle.record_failure(*keys)
+        return None
+
+
+class PostgresUserStore(DatabaseUserStore):
+    """Postgres users table, queried through the statement each pooled connection prepared."""
+
+    def _fetch_user(self, conn, email):
+        cur = conn.cursor()
+        cur.execute("EXECUTE find_user (%s)", (email,))
+        row = cur.fetchone()
+        cur.close()
+        return row
+
+
+def indexed_pool(connect, size):
+    """A ConnectionPool over `connect`, after making sure the email index exists."""
+    pool = ConnectionPool(connect, size=size)
+    with pool.connection() as conn:
+        create_email_index(conn)
+    return pool
+
+
+def postgres_pool(size=5, **settings):
+    import psycopg2
+
+    def connect():
+        conn = psycopg2.connect(**{**POSTGRES_SETTINGS, **settings})
+        # Lookups are single reads; autocommit keeps idle pooled connections out of open transactions
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute(f"PREPARE find_user (text) AS {user_lookup(conn, '$1')}")
+        cur.close()
+        return conn
+
+    return indexed_pool(connect, size)
+
+
+def sqlite_pool(path, size=5):
+    """Pool over a local SQLite file with the same `users` table, for tests and offline use."""
+    def connect():
+        return sqlite3.connect(path, check_same_thread=False, timeout=10)
+
+    return indexed_pool(connect, size)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_db_backend():
+    """The process-wide database login backend.
+
+    APPFOLIO_AUTH_SQLITE=<path> swaps Postgres for a local SQLite file.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            sqlite_path = os.getenv("APPFOLIO_AUTH_SQLITE")
+            if sqlite_path:
+                _backend = DatabaseUserStore(sqlite_pool(sqlite_path))
+            else:
+                _backend = PostgresUserStore(postgres_pool())
+        return _backend
+
+
+def get_auth_backend():
+    """Login backend chosen by APPFOLIO_AUTH_BACKEND: 'yaml' (users.yaml, the default) or 'db'."""
+    if os.getenv("APPFOLIO_AUTH_BACKEND", "yaml") == "db":
+        return get_db_backend()
+    return get_user_store()
+
@@ -0,0 +1,269 @@
+import argparse
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from catalog import SnapshotCatalog, parse_snapshot_name
+from period_comparison import clean_money
+from unit_history import DELINQUENT_PAST_DUE
+
+DELINQUENCY_FILENAME = "delinquency.db"
+DATASET = "rentroll"
+BALANCE_COLUMNS = ["Property Name", "Unit", "Tenant", "BD/BA", "Past Due", "Late Count"]
+
+# (label, first day, last day) of each aging bucket, by days since the balance went past due
+AGING_BUCKETS = [("0-30", 0, 30), ("31-60", 31, 60), ("61-90", 61, 90), ("90+", 91, None)]
+
+# Bumped when stored rows change meaning; older ledgers are emptied and re-seeded from the catalog
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    path TEXT PRIMARY KEY,
+    as_of TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_as_of ON snapshots (as_of, created_at);
+
+-- Numeric past due of every tenant owing anything, per snapshot
+CREATE TABLE IF NOT EXISTS balances (
+    snapshot TEXT NOT NULL,
+    property TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    tenant TEXT NOT NULL,
+    bd_ba TEXT,
+    past_due REAL NOT NULL,
+    late_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS balances_snapshot ON balances (snapshot, past_due);
+
+-- Each tenant currently owing, and since which snapshot date the balance has been owed without a break
+CREATE TABLE IF NOT EXISTS aging (
+    property TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    tenant TEXT NOT NULL,
+    delinquent_since TEXT NOT NULL,
+    PRIMARY KEY (property, unit, tenant)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS aging_as_of (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    as_of TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+
+def aging_bucket(days):
+    """Label of the AGING_BUCKETS entry `days` falls in."""
+    for label, first, last in AGING_BUCKETS:
+        if last is None or days <= last:
+            return label
+    return AGING_BUCKETS[-1][0]
+
+
+def read_balances(path):
+    """Tenants of a rent roll who owe something (Past Due > 0), Past Due and Late Count made numeric.
+
+    Credits (negative past due) are left out: a tenant in credit isn't owing, so a debt that
+    follows a credit is aged from the snapshot it first appears in.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    df = pd.read_csv(path, usecols=[column for column in BALANCE_COLUMNS if column in header], dtype=str,
+                     keep_default_na=False)
+    df = df.reindex(columns=BALANCE_COLUMNS, fill_value="")
+    df["Past Due"] = clean_money(df["Past Due"]).fillna(0)
+    df["Late Count"] = pd.to_numeric(df["Late Count"], errors="coerce").fillna(0).astype(int)
+    df = df[(df["Property Name"] != "") & (df["Past Due"] > 0)]
+    return df.drop_duplicates(subset=["Property Name", "Unit", "Tenant"], keep="last")
+
+
+class DelinquencyLedger:
+    """Per-tenant past-due balances of every rent roll snapshot, with incrementally aged debts.
+
+    Each snapshot is parsed once when it is recorded: its non-zero balances are stored as
+    numbers, and the aging table is moved forward by comparing only the tenants owing in the
+    new snapshot with those owing before it. Reads are indexed queries with the past-due
+    threshold as a parameter; nothing is re-cleaned on a dashboard rerun.
+
+    A balance's age counts from the first snapshot it appeared in without a break, so it is
+    only as precise as the snapshots taken; balances already owed when the ledger was seeded
+    are aged from the seeding snapshot.
+    """
+
+    def __init__(self, folder, db_path=None):
+        self.folder = folder
+        self.db_path = db_path or os.path.join(folder, DELINQUENCY_FILENAME)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+
+    def _migrate(self):
+        # Version 0 stored credits as balances and aged tenants from them
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        existing = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'balances'").fetchone()
+        with self.conn:
+            for table in ("snapshots", "balances", "aging", "aging_as_of"):
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if existing:
+            print(f"[INFO] Emptied delinquency ledger v{version}; the next rent roll re-seeds it from the catalog")
+            logging.info(f"Emptied delinquency ledger v{version}; the next rent roll re-seeds it from the catalog")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def record(self, path, as_of, created_at):
+        """Store a rent roll's balances and age them. Returns the tenants stored, or None if the
+        snapshot was recorded before."""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.conn.execute("SELECT 1 FROM snapshots WHERE path = ?", (path,)).fetchone():
+                return None
+            balances = read_balances(path)
+            self.conn.execute("INSERT INTO snapshots (path, as_of, created_at) VALUES (?, ?, ?)",
+                              (path, as_of, created_at))
+            self.conn.executemany(
+                "INSERT INTO balances (snapshot, property, unit, tenant, bd_ba, past_due, late_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, *row) for row in balances[BALANCE_COLUMNS].itertuples(index=False)])
+
+            aged = self.conn.execute("SELECT as_of, created_at FROM aging_as_of").fetchone()
+            if aged is None or (as_of, created_at) > (aged["as_of"], aged["created_at"]):
+                self._age(balances, as_of, created_at)
+            else:
+                # A back-filled older snapshot adds history but doesn't move the aging back
+                logging.info(f"Not aging {path}: aging already as of {aged['as_of']}")
+        logging.info(f"Recorded {len(balances)} past-due balances as of {as_of} from {path}")
+        return len(balances)
+
+    def _age(self, balances, as_of, created_at):
+        owing = set(zip(balances["Property Name"], balances["Unit"], balances["Tenant"]))
+        aged = {(row["property"], row["unit"], row["tenant"])
+                for row in self.conn.execute("SELECT property, unit, tenant FROM aging")}
+        # Paid up or gone: the debt ends. Newly owing: it starts at this snapshot.
+        self.conn.executemany("DELETE FROM aging WHERE property = ? AND unit = ? AND tenant = ?", aged - owing)
+        self.conn.executemany(
+            "INSERT INTO aging (property, unit, tenant, delinquent_since) VALUES (?, ?, ?, ?)",
+            [(*key, as_of) for key in owing - aged])
+        self.conn.execute(
+            "INSERT INTO aging_as_of (id, as_of, created_at) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET as_of = excluded.as_of, created_at = excluded.created_at",
+            (as_of, created_at))
+
+    def replay(self, catalog):
+        """Record every catalogued rent roll not in the ledger yet, oldest first."""
+        recorded = 0
+        for row in reversed(catalog.snapshots(DATASET)):
+            if os.path.exists(row["path"]):
+                recorded += self.record(row["path"], row["as_of"], row["created_at"]) is not None
+        return recorded
+
+    def latest_snapshot(self):
+        row = self.conn.execute("SELECT path, as_of FROM snapshots ORDER BY as_of DESC, created_at DESC LIMIT 1").fetchone()
+        return (row["path"], row["as_of"]) if row else (None, None)
+
+    def _filter(self, df, properties):
+        if properties is not None:
+            df = df[df["Property Name"].isin(properties)]
+        return df.reset_index(drop=True)
+
+    def balances(self, threshold=DELINQUENT_PAST_DUE, properties=None):
+        """Tenants owing more than `threshold` in the latest snapshot, with their age and bucket."""
+        path, as_of = self.latest_snapshot()
+        df = pd.read_sql_query(
+            'SELECT b.property AS "Property Name", b.unit AS "Unit", b.tenant AS "Tenant", b.bd_ba AS "BD/BA", '
+            'b.past_due AS "Past Due", b.late_count AS "Late Count", a.delinquent_since AS "Delinquent Since" '
+            "FROM balances b LEFT JOIN aging a USING (property, unit, tenant) "
+            "WHERE b.snapshot = ? AND b.past_due > ? ORDER BY b.past_due DESC",
+            self.conn, params=[path, threshold])
+        df = self._filter(df, properties)
+        since = pd.to_datetime(df["Delinquent Since"])
+        df["Days Past Due"] = (pd.Timestamp(as_of) - since).dt.days if as_of else pd.Series(dtype=int)
+        df["Aging"] = df["Days Past Due"].map(aging_bucket)
+        return df
+
+    def aging_summary(self, threshold=DELINQUENT_PAST_DUE, properties=None):
+        return aging_summary(self.balances(threshold, properties))
+
+    def monthly_totals(self, threshold=DELINQUENT_PAST_DUE, properties=None, months=12):
+        """Past due over `threshold` per month, from the latest snapshot of each of the last `months`
+        months (the current month shows its latest snapshot so far)."""
+        snapshots = pd.read_sql_query("SELECT path, as_of, created_at FROM snapshots", self.conn)
+        if snapshots.empty:
+            return pd.DataFrame({"Month": pd.Series(dtype="datetime64[ns]"), "Past Due": pd.Series(dtype=float),
+                                 "Delinquent Units": pd.Series(dtype=int)})
+        snapshots["Month"] = pd.to_datetime(snapshots["as_of"]).dt.to_period("M").dt.to_timestamp()
+        chosen = snapshots.sort_values(["as_of", "created_at"]).groupby("Month").tail(1).nlargest(months, "Month")
+
+        df = pd.read_sql_query(
+            'SELECT snapshot, property AS "Property Name", past_due AS "Past Due" FROM balances '
+            f"WHERE past_due > ? AND snapshot IN ({', '.join('?' * len(chosen))})",
+            self.conn, params=[threshold, *chosen["path"]])
+        df = self._filter(df, properties).merge(chosen[["path", "Month"]], left_on="snapshot", right_on="path")
+        totals = df.groupby("Month").agg(**{"Past Due": ("Past Due", "sum"), "Delinquent Units": ("Past Due", "size")})
+        return totals.reindex(sorted(chosen["Month"]), fill_value=0).rename_axis("Month").reset_index()
+
+
+def aging_summary(balances):
+    """Tenants and dollars owed per aging bucket, from `DelinquencyLedger.balances()`."""
+    labels = [label for label, _, _ in AGING_BUCKETS]
+    summary = balances.groupby("Aging").agg(Tenants=("Tenant", "size"), Amount=("Past Due", "sum"))
+    return summary.reindex(labels, fill_value=0).rename_axis("Aging").reset_index()
+
+
+def summary_by(balances, column="BD/BA"):
+    """Delinquent units and dollars per `column` value, from `DelinquencyLedger.balances()`."""
+    return balances.groupby(column).agg(
+        Delinquent_Units=("Unit", "count"),
+        Delinquent_Amount=("Past Due", "sum"),
+    ).reset_index()
+
+
+def record_delinquency(path):
+    """Add a freshly published rent roll to the delinquency ledger in its folder."""
+    dataset, as_of, created_at = parse_snapshot_name(path)
+    if dataset != DATASET:
+        return None
+    folder = os.path.dirname(os.path.abspath(path))
+    created_at = created_at or datetime.fromtimestamp(os.stat(path).st_mtime)
+    as_of = as_of or created_at.date()
+    with DelinquencyLedger(folder) as ledger:
+        if ledger.latest_snapshot()[0] is None:
+            # First rent roll since the ledger was added: seed the history from the catalogued ones
+            with SnapshotCatalog(folder) as catalog:
+                print(f"[INFO] Seeded the delinquency ledger with {ledger.replay(catalog)} catalogued rent rolls")
+        return ledger.record(os.path.abspath(path), as_of.isoformat(), created_at.isoformat(timespec="seconds"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and inspect the delinquency ledger of rent roll balances.")
+    parser.add_argument("--folder", default=os.path.join(os.getcwd(), "data"), help="Data folder holding the snapshots")
+    parser.add_argument("--threshold", type=float, default=DELINQUENT_PAST_DUE, help="Past due over this is delinquent")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("replay", help="Record catalogued rent rolls not yet in the ledger, oldest first")
+    commands.add_parser("aging", help="Print tenants and dollars per aging bucket")
+    commands.add_parser("monthly", help="Print delinquency per month")
+    args = parser.parse_args()
+
+    with DelinquencyLedger(args.folder) as ledger:
+        if args.command == "replay":
+            with SnapshotCatalog(args.folder) as catalog:
+                print(f"[INFO] Recorded {ledger.replay(catalog)} rent rolls")
+        elif args.command == "aging":
+            print(ledger.aging_summary(args.threshold).to_string(index=False))
+        elif args.command == "monthly":
+            print(ledger.monthly_totals(args.threshold).to_string(index=False))
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import logging
+import os
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from clean_pool import CleaningPool
+
+# Written to the watched folder while the watcher runs; the startup sweep only picks up
+# exports that arrived after it, never files that were already there
+LAST_RUN_FILENAME = ".watcher_last_run"
+
+# Header signatures of AppFolio exports, checked in order. A report matches when every
+# `required` column is present and none of the `forbidden` ones are.
+REPORT_SIGNATURES = [
+    ("tenant_data", {"Property", "Unit", "Tenant", "Status", "Tenant Tags"}, set()),
+    ("rentroll", {"Unit", "BD/BA", "Tenant", "Status", "Market Rent", "Past Due"}, {"Property"}),
+    ("work_order", {"Work Order Number", "Job Description", "Status", "Created At"}, set()),
+    ("bill", {"Reference", "Payee Name", "Bill Date", "Paid", "Unpaid"}, set()),
+    ("general_ledger", {"Date", "Payee / Payer", "Debit", "Credit", "Balance"}, set()),
+    ("guest", {"Inquiry Received", "Last Activity Type", "Move In Preference"}, set()),
+    ("leasing", {"Assigned Inquiry Owner", "Inquiries", "Completed Showings", "Signed Leases"}, set()),
+    ("prospect", {"Source", "Guest Card Inquiries", "Converted Tenants"}, set()),
+]
+
+
+def read_header(path):
+    """Return the column names on the first line of a CSV export."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [column.strip() for column in next(csv.reader(f), [])]
+
+
+def classify_export(path):
+    """Identify which AppFolio report a CSV is from by its header, or None if unknown."""
+    columns = set(read_header(path))
+    for file_prefix, required, forbidden in REPORT_SIGNATURES:
+        if required <= columns and not (forbidden & columns):
+            return file_prefix
+    return None
+
+
+def is_raw_export(path):
+    name = os.path.basename(path)
+    return name.endswith(".csv") and "_cleaned" not in name
+
+
+def wait_until_stable(path, settle_seconds=1.0, timeout=120):
+    """Wait until a file's size stops changing (for platforms without close-write events)."""
+    deadline = time.monotonic() + timeout
+    last_size = -1
+    while time.monotonic() < deadline:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        if size == last_size and size > 0:
+            return True
+        last_size = size
+        time.sleep(settle_seconds)
+    return False
+
+
+class DownloadHandler(FileSystemEventHandler):
+    """Routes every finished export in the download folder to the cleaning pool."""
+
+    def __init__(self, pool, settle_seconds=1.0):
+        self.pool = pool
+        self.settle_seconds = settle_seconds
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    # Chrome downloads to '<name>.crdownload' and renames to '<name>.csv' when done
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.handle(event.dest_path)
+
+    # inotify IN_CLOSE_WRITE, for files written directly under their final name
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.handle(event.src_path)
+
+    # Backends without close events (Windows, macOS): wait for the size to settle
+    def on_created(self, event):
+        if not event.is_directory and is_raw_export(event.src_path):
+            threading.Thread(target=self._handle_when_stable, args=(event.src_path,), daemon=True).start()
+
+    def _handle_when_stable(self, path):
+        if wait_until_stable(path, self.settle_seconds):
+            self.handle(path)
+
+    def handle(self, path, swept=False):
+        """Queue an export for cleaning. A `swept` file was found on disk rather than seen
+        arriving, so it is cleaned where it is and kept."""
+        if not is_raw_export(path) or not os.path.exists(path):
+            return
+        with self.lock:
+            if path in self.in_flight:
+                return
+            self.in_flight.add(path)
+        try:
+            file_prefix = classify_export(path)
+            if file_prefix is None:
+                print(f"[SKIPPED] Unrecognised export: {path}")
+                logging.info(f"[SKIPPED] Unrecognised export: {path}")
+                return
+            print(f"[INFO] {os.path.basename(path)} looks like a '{file_prefix}' export")
+            logging.info(f"{path} classified as '{file_prefix}'")
+            if swept:
+                self.pool.submit(path, file_prefix, 1, remove_raw=False, stage=False)
+            else:
+                self.pool.submit(path, file_prefix, 1)
+        except Exception as e:
+            print(f"[ERROR] Could not queue {path}: {e}")
+            logging.info(f"[ERROR] Could not queue {path}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(path)
+
+
+def last_run_time(download_folder):
+    """When the watcher last ran on `download_folder` (epoch seconds), or None if it never has."""
+    try:
+        return os.path.getmtime(os.path.join(download_folder, LAST_RUN_FILENAME))
+    except OSError:
+        return None
+
+
+def mark_run(download_folder):
+    with open(os.path.join(download_folder, LAST_RUN_FILENAME), "w") as f:
+        f.write(time.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def run_watcher(download_folder, max_workers=None, settle_seconds=1.0):
+    """Watch `download_folder` until interrupted, cleaning each export as it lands."""
+    pool = CleaningPool(max_workers=max_workers, staging_folder=os.path.join(download_folder, "processing"))
+    handler = DownloadHandler(pool, settle_seconds=settle_seconds)
+
+    # Pick up anything that finished downloading while the watcher was down. The first run
+    # has nothing to compare against and leaves the folder's existing files alone.
+    since = last_run_time(download_folder)
+    mark_run(download_folder)
+    if since is not None:
+        for filename in sorted(os.listdir(download_folder)):
+            path = os.path.join(download_folder, filename)
+            if os.path.isfile(path) and os.path.getmtime(path) > since:
+                handler.handle(path, swept=True)
+
+    observer = Observer()
+    observer.schedule(handler, download_folder, recursive=False)
+    observer.start()
+    print(f"[INFO] Watching {download_folder} for AppFolio exports (Ctrl+C to stop)")
+    logging.info(f"Watching {download_folder} for AppFolio exports")
+
+    try:
+        while observer.is_alive():
+            observer.join(timeout=1)
+            pool.reap()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+        pool.wait()
+        pool.shutdown()
+        mark_run(download_folder)
+
+
+if __name__ == "__main__":
+    from appfolio_data import BASE_DOWNLOAD_FOLDER
+
+    parser = argparse.ArgumentParser(description="Clean AppFolio exports as soon as they are downloaded.")
+    parser.add_argument("folder", nargs="?", default=BASE_DOWNLOAD_FOLDER, help="Download folder to watch")
+    parser.add_argument("--workers", type=int, default=None, help="Cleaning worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    run_watcher(args.folder, max_workers=args.workers)
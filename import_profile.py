@@ -0,0 +1,120 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_FOLDER = os.path.dirname(os.path.abspath(__file__))
+MARKER = "--- import_profile: timing starts ---"
+
+# Streamlit itself is imported before the clock starts: a server has it loaded before any
+# session arrives. The repo's streamlit.py would shadow it, hence import_streamlit_module().
+CHILD_SETUP = f"""
+import sys, time
+sys.path.insert(0, {REPO_FOLDER!r})
+from load_scaling import import_streamlit_module
+try:
+    streamlit = import_streamlit_module("streamlit")
+except ImportError:
+    streamlit = None
+"""
+
+# A Streamlit script: the first run of the page in a fresh process, as AppTest renders it
+APP_CHILD = CHILD_SETUP + """
+AppTest = import_streamlit_module("streamlit.testing.v1").AppTest
+sys.stderr.write({marker!r} + "\\n")
+started = time.perf_counter()
+at = AppTest.from_file({target!r}, default_timeout={timeout}).run()
+elapsed = time.perf_counter() - started
+if at.exception:
+    raise SystemExit("{target} raised: " + at.exception[0].message)
+print(elapsed)
+"""
+
+# A module: how long importing it takes
+MODULE_CHILD = CHILD_SETUP + """
+sys.stderr.write({marker!r} + "\\n")
+started = time.perf_counter()
+import {target}
+print(time.perf_counter() - started)
+"""
+
+
+def parse_importtime(stderr):
+    """(module, depth, self seconds, cumulative seconds) of every import after the marker."""
+    rows, started = [], False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            started = True
+            continue
+        if not started or not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return rows
+
+
+def cold_start(target, timeout=120):
+    """Time `target` (a Streamlit script like 'login.py', or a module name) in a fresh interpreter.
+
+    Returns (seconds, imports made while timing). The dashboard preload in login.py is turned
+    off so only what the page itself needs is counted.
+    """
+    if target.endswith(".py"):
+        code = APP_CHILD.format(marker=MARKER, target=target, timeout=timeout)
+    else:
+        code = MODULE_CHILD.format(marker=MARKER, target=target)
+    env = {**os.environ, "APPFOLIO_PRELOAD_DASHBOARD": "0"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_FOLDER, env=env,
+                            capture_output=True, text=True, timeout=timeout + 60)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Profiling {target} failed:\n" + "\n".join(errors[-15:]))
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def by_package(rows):
+    """Import time per top-level package, most expensive first."""
+    totals = {}
+    for name, _, self_seconds, _ in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_seconds
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def print_report(target, samples, rows, top):
+    print(f"Cold start of {target}: {statistics.median(samples):.2f}s "
+          f"(median of {len(samples)} fresh processes: {', '.join(f'{s:.2f}' for s in samples)})")
+    print(f"\n{'package':<32} {'import s':>9}")
+    for package, seconds in by_package(rows)[:top]:
+        print(f"{package:<32} {seconds:>9.3f}")
+    # What the page imports itself, or for a module what it imports at its top level
+    depth = 0 if target.endswith(".py") else 1
+    print(f"\n{'imported directly':<32} {'incl. deps s':>12}")
+    for name, _, _, cumulative in sorted((row for row in rows if row[1] == depth), key=lambda row: row[3], reverse=True)[:top]:
+        print(f"{name:<32} {cumulative:>12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the cold start of a Streamlit page or a module.")
+    parser.add_argument("target", nargs="?", default="login.py",
+                        help="Streamlit script (e.g. login.py) or module name (e.g. appfolio_data)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes to time; the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="Rows to show per table")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds one run may take")
+    parser.add_argument("--budget", type=float, help="Fail (exit 1) when the median cold start exceeds this many seconds")
+    args = parser.parse_args()
+
+    samples, rows = [], []
+    for _ in range(args.runs):
+        seconds, rows = cold_start(args.target, args.timeout)
+        samples.append(seconds)
+    print_report(args.target, samples, rows, args.top)
+
+    if args.budget is not None:
+        median = statistics.median(samples)
+        if median > args.budget:
+            print(f"\n[FAILED] Cold start of {args.target} took {median:.2f}s, over the {args.budget:.2f}s budget")
+            sys.exit(1)
+        print(f"\n[OK] Cold start of {args.target} within the {args.budget:.2f}s budget")
@@ -0,0 +1,235 @@
+import argparse
+import glob
+import logging
+import os
+from datetime import date
+
+import pandas as pd
+
+from catalog import latest_snapshots
+from period_comparison import clean_money
+from query_engine import QueryEngine
+from unit_history import OCCUPIED_STATUSES, DELINQUENT_PAST_DUE
+
+HISTORY_FOLDER = "kpi_history"
+LEDGER_DATASETS = ["general_ledger1", "general_ledger2", "general_ledger3"]
+KPI_SOURCES = {
+    "Rent Roll": "rentroll",
+    "Vacancies": "vacancy",
+    "Work Orders": "work_order",
+}
+CLOSED_WORK_ORDER_STATUSES = ["Completed", "Completed No Need To Bill", "Canceled"]
+
+# One row per (date, property). Counts and amounts are stored next to the rates so that any
+# group of properties can be re-aggregated exactly (see portfolio()).
+COLUMNS = {
+    "date": "datetime64[ns]",
+    "property": "string",
+    "units": "int64",
+    "occupied_units": "int64",
+    "occupancy": "float64",
+    "rent": "float64",
+    "market_rent": "float64",
+    "economic_occupancy": "float64",
+    "noi": "float64",
+    "past_due": "float64",
+    "delinquent_units": "int64",
+    "vacant_units": "int64",
+    "vacancy_days": "float64",
+    "work_orders": "int64",
+    "open_work_orders": "int64",
+}
+
+
+def _rate(numerator, denominator):
+    return (numerator / denominator.where(denominator > 0)) * 100
+
+
+def rentroll_kpis(rentroll):
+    """Occupancy, economic occupancy and delinquency per property from one rent roll."""
+    df = rentroll.dropna(subset=["Property Name"])
+    occupied = df["Status"].isin(OCCUPIED_STATUSES)
+    rent = clean_money(df["Rent"])
+    past_due = clean_money(df["Past Due"]).fillna(0)
+    kpis = pd.DataFrame({
+        "property": df["Property Name"],
+        "units": 1,
+        "occupied_units": occupied.astype(int),
+        "rent": rent.where(occupied, 0).fillna(0),
+        "market_rent": clean_money(df["Market Rent"]).fillna(0),
+        "past_due": past_due,
+        "delinquent_units": (past_due > DELINQUENT_PAST_DUE).astype(int),
+        "vacant_units": (~occupied).astype(int),
+    }).groupby("property").sum()
+    kpis["occupancy"] = _rate(kpis["occupied_units"], kpis["units"])
+    kpis["economic_occupancy"] = _rate(kpis["rent"], kpis["market_rent"])
+    return kpis
+
+
+def vacancy_kpis(vacancies):
+    """Average Days Vacant per property from the vacancy report."""
+    if "Property Name" not in vacancies.columns or "Days Vacant" not in vacancies.columns:
+        return pd.DataFrame(columns=["vacancy_days"])
+    days = clean_money(vacancies["Days Vacant"])
+    return days.groupby(vacancies["Property Name"]).mean().rename("vacancy_days").to_frame().rename_axis("property")
+
+
+def work_order_kpis(work_orders):
+    """Work orders in the export, and those still open, per property."""
+    open_ = ~work_orders["Status"].isin(CLOSED_WORK_ORDER_STATUSES)
+    return pd.DataFrame({
+        "work_orders": work_orders.groupby("Property Name").size(),
+        "open_work_orders": open_.groupby(work_orders["Property Name"]).sum(),
+    }).rename_axis("property")
+
+
+def noi_kpis(folder, as_of):
+    """Net operating income per property for the month of `as_of`, from the general ledgers."""
+    engine = QueryEngine(folder)
+    summary = engine.ledger_monthly_summary(LEDGER_DATASETS, by_property=True)
+    month = summary[summary["Month"] == as_of.strftime("%Y-%m")]
+    noi = month["Total Operating Income"] - month["Total Operating Expense"]
+    return pd.DataFrame({"noi": noi.to_numpy()}, index=pd.Index(month["Property Name"], name="property"))
+
+
+def compute_kpis(folder, as_of=None):
+    """One row of KPIs per property from the newest snapshots in `folder`.
+
+    A KPI whose source snapshot is missing is left empty rather than failing the whole row.
+    """
+    as_of = as_of or date.today()
+    paths = {name: path for name, path in latest_snapshots(folder, KPI_SOURCES).items() if path}
+    parts = []
+    if "Rent Roll" in paths:
+        parts.append(rentroll_kpis(pd.read_csv(paths["Rent Roll"])))
+    if "Vacancies" in paths:
+        parts.append(vacancy_kpis(pd.read_csv(paths["Vacancies"])))
+    if "Work Orders" in paths:
+        parts.append(work_order_kpis(pd.read_csv(paths["Work Orders"], usecols=["Property Name", "Status"])))
+    try:
+        parts.append(noi_kpis(folder, as_of))
+    except Exception as e:
+        logging.info(f"[WARNING] No NOI for the KPI history: {e}")
+    if not parts:
+        return pd.DataFrame(columns=list(COLUMNS)).astype(COLUMNS)
+
+    kpis = pd.concat(parts, axis=1).reset_index()
+    kpis.insert(0, "date", pd.Timestamp(as_of))
+    kpis = kpis.reindex(columns=list(COLUMNS))
+    counts = [column for column, dtype in COLUMNS.items() if dtype == "int64"]
+    kpis[counts] = kpis[counts].fillna(0)
+    return kpis.astype(COLUMNS).sort_values("property", ignore_index=True)
+
+
+class KPIHistory:
+    """Columnar history of the daily KPIs, one Parquet file per day under data/kpi_history/.
+
+    Recording a day replaces that day's file, so rerunning the pipeline never duplicates rows.
+    `compact()` folds the daily files of past years into one file per year; reads see both.
+    """
+
+    def __init__(self, folder):
+        self.folder = os.path.join(folder, HISTORY_FOLDER)
+
+    def _day_path(self, day):
+        return os.path.join(self.folder, f"day-{day.isoformat()}.parquet")
+
+    def _write(self, df, path):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.part"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def append(self, kpis):
+        """Store the KPIs of one day, replacing any earlier run of the same day."""
+        day = kpis["date"].iloc[0].date()
+        path = self._day_path(day)
+        self._write(kpis, path)
+        logging.info(f"[INFO] KPI history: {len(kpis)} properties as of {day} -> {path}")
+        return path
+
+    def files(self):
+        # Yearly files first, so a day that is in both keeps its daily (newer) rows
+        return sorted(glob.glob(os.path.join(self.folder, "year-*.parquet"))) + \
+            sorted(glob.glob(os.path.join(self.folder, "day-*.parquet")))
+
+    def load(self, properties=None, since=None):
+        """The stored history, optionally for some properties and from a date on."""
+        filters = []
+        if properties is not None:
+            filters.append(("property", "in", list(properties)))
+        if since is not None:
+            filters.append(("date", ">=", pd.Timestamp(since)))
+        frames = [pd.read_parquet(path, filters=filters or None) for path in self.files()]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=list(COLUMNS)).astype(COLUMNS)
+        history = pd.concat(frames, ignore_index=True)
+        history = history.drop_duplicates(subset=["date", "property"], keep="last")
+        return history.sort_values(["date", "property"], ignore_index=True)
+
+    def compact(self, before=None):
+        """Merge the daily files of years before `before` (default: this year) into yearly files."""
+        before = before or date.today().year
+        merged = 0
+        daily = glob.glob(os.path.join(self.folder, "day-*.parquet"))
+        years = sorted({int(os.path.basename(path)[4:8]) for path in daily})
+        for year in (y for y in years if y < before):
+            year_path = os.path.join(self.folder, f"year-{year}.parquet")
+            days = sorted(path for path in daily if os.path.basename(path).startswith(f"day-{year}-"))
+            frames = ([pd.read_parquet(year_path)] if os.path.exists(year_path) else []) + \
+                [pd.read_parquet(path) for path in days]
+            history = pd.concat(frames, ignore_index=True).drop_duplicates(subset=["date", "property"], keep="last")
+            self._write(history.sort_values(["date", "property"], ignore_index=True), year_path)
+            for path in days:
+                os.remove(path)
+            merged += len(days)
+            logging.info(f"[INFO] KPI history: compacted {len(days)} days of {year} into {year_path}")
+        return merged
+
+
+def portfolio(history):
+    """Daily totals over the properties in `history`, with the rates recomputed from the counts."""
+    sums = history.groupby("date")[[
+        "units", "occupied_units", "rent", "market_rent", "noi", "past_due",
+        "delinquent_units", "vacant_units", "work_orders", "open_work_orders",
+    ]].sum(min_count=1)
+    sums["occupancy"] = _rate(sums["occupied_units"], sums["units"])
+    sums["economic_occupancy"] = _rate(sums["rent"], sums["market_rent"])
+    # Average days vacant weighted by each property's vacant units
+    weighted = (history["vacancy_days"] * history["vacant_units"]).groupby(history["date"]).sum(min_count=1)
+    sums["vacancy_days"] = weighted / sums["vacant_units"].where(sums["vacant_units"] > 0)
+    return sums.reset_index()
+
+
+def record_kpis(folder, as_of=None):
+    """Compute today's KPIs from the newest snapshots and add them to the history."""
+    kpis = compute_kpis(folder, as_of)
+    if kpis.empty:
+        logging.info("[WARNING] KPI history: no snapshots to compute KPIs from")
+        return None
+    return KPIHistory(folder).append(kpis)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and inspect the daily KPI history.")
+    parser.add_argument("--folder", default=os.path.join(os.getcwd(), "data"), help="Data folder holding the snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Compute KPIs from the newest snapshots and store them")
+    record_parser.add_argument("--as-of", type=date.fromisoformat, help="Date to store them under (default: today)")
+    show_parser = commands.add_parser("show", help="Print the stored history")
+    show_parser.add_argument("--property", action="append", help="Only this property (repeatable)")
+    show_parser.add_argument("--since", type=date.fromisoformat, help="From YYYY-MM-DD on")
+    show_parser.add_argument("--portfolio", action="store_true", help="Print daily portfolio totals")
+    compact_parser = commands.add_parser("compact", help="Merge daily files of past years into yearly files")
+    compact_parser.add_argument("--before", type=int, help="Compact years before this one (default: this year)")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        path = record_kpis(args.folder, args.as_of)
+        print(f"[SUCCESS] Recorded KPIs to {path}" if path else "[WARNING] No snapshots to compute KPIs from")
+    elif args.command == "show":
+        history = KPIHistory(args.folder).load(args.property, args.since)
+        print((portfolio(history) if args.portfolio else history).to_string(index=False))
+    elif args.command == "compact":
+        print(f"[INFO] Compacted {KPIHistory(args.folder).compact(args.before)} daily files")
@@ -0,0 +1,206 @@
+import argparse
+import http.cookies
+import importlib
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+import websocket
+
+import serve_workers
+
+
+def import_streamlit_module(name):
+    """Import `name` from the installed streamlit package; this repo's streamlit.py shadows it."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    saved = sys.path[:]
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != here]
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path[:] = saved
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class StreamlitSession:
+    """A scripted browser tab: speaks Streamlit's websocket protocol and drives widgets by label."""
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.back_msg = import_streamlit_module("streamlit.proto.BackMsg_pb2")
+        self.forward_msg = import_streamlit_module("streamlit.proto.ForwardMsg_pb2")
+        self.widget_protos = import_streamlit_module("streamlit.proto.WidgetStates_pb2")
+        self.early_for_rerun = self.forward_msg.ForwardMsg.ScriptFinishedStatus.Value("FINISHED_EARLY_FOR_RERUN")
+        self.widgets = {}  # label -> (kind, element proto) from the last run
+        self.states = {}  # widget id -> WidgetState sent on every rerun
+        self.ws = None
+
+    def connect(self):
+        # Fetch the page first so the proxy's sticky-session cookie is set, like a browser would
+        cookie_header = None
+        with urllib.request.urlopen(self.base_url + "/", timeout=self.timeout) as response:
+            cookies = http.cookies.SimpleCookie()
+            for header in response.headers.get_all("Set-Cookie") or []:
+                cookies.load(header)
+            if cookies:
+                cookie_header = "; ".join(f"{key}={morsel.value}" for key, morsel in cookies.items())
+
+        ws_url = self.base_url.replace("http://", "ws://", 1).replace("https://", "wss://", 1) + "/_stcore/stream"
+        self.ws = websocket.create_connection(
+            ws_url, timeout=self.timeout, subprotocols=["streamlit"], cookie=cookie_header
+        )
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    def _collect_widget(self, element):
+        kind = element.WhichOneof("type")
+        widget = getattr(element, kind, None) if kind else None
+        if widget is not None and hasattr(widget, "id") and hasattr(widget, "label") and widget.label:
+            self.widgets.setdefault(widget.label, (kind, widget))
+
+    def rerun(self, triggers=()):
+        """Rerun the script with the current widget states; return the wall time until it finished."""
+        back = self.back_msg.BackMsg()
+        client_state = back.rerun_script
+        for state in self.states.values():
+            client_state.widget_states.widgets.append(state)
+        for widget_id in triggers:
+            trigger = client_state.widget_states.widgets.add()
+            trigger.id = widget_id
+            trigger.trigger_value = True
+
+        self.widgets = {}
+        started = time.perf_counter()
+        self.ws.send_binary(back.SerializeToString())
+        while True:
+            message = self.forward_msg.ForwardMsg()
+            message.ParseFromString(self.ws.recv())
+            kind = message.WhichOneof("type")
+            if kind == "delta" and message.delta.WhichOneof("type") == "new_element":
+                self._collect_widget(message.delta.new_element)
+            elif kind == "script_finished" and message.script_finished != self.early_for_rerun:
+                return time.perf_counter() - started
+
+    def set_text(self, label, value):
+        _, widget = self.widgets[label]
+        state = self.widget_protos.WidgetState(id=widget.id, string_value=value)
+        self.states[widget.id] = state
+
+    def set_multiselect(self, label, values):
+        _, widget = self.widgets[label]
+        state = self.widget_protos.WidgetState(id=widget.id)
+        if "raw_values" in widget.DESCRIPTOR.fields_by_name:
+            state.string_array_value.data.extend(values)
+        else:
+            state.int_array_value.data.extend(list(widget.options).index(value) for value in values)
+        self.states[widget.id] = state
+
+    def click(self, label):
+        _, widget = self.widgets[label]
+        return self.rerun(triggers=[widget.id])
+
+    def options(self, label):
+        _, widget = self.widgets[label]
+        return list(widget.options)
+
+
+def run_session(base_url, email, password, duration, results, lock, seed=None):
+    """Log in, then keep changing the property filter until `duration` runs out."""
+    rng = random.Random(seed)
+    latencies = []
+    session = StreamlitSession(base_url)
+    try:
+        session.connect()
+        session.rerun()
+        session.set_text("Email Address", email)
+        session.set_text("Password", password)
+        latencies.append(session.click("Login"))
+
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            properties = session.options("Filter by Property")
+            session.set_multiselect("Filter by Property", rng.sample(properties, k=min(len(properties), rng.randint(0, 2))))
+            latencies.append(session.rerun())
+    except Exception as e:
+        print(f"[ERROR] Session failed: {e}")
+    finally:
+        session.close()
+    with lock:
+        results.extend(latencies)
+
+
+def measure(base_url, sessions, duration, email, password):
+    results, lock = [], threading.Lock()
+    threads = [
+        threading.Thread(target=run_session, args=(base_url, email, password, duration, results, lock, i))
+        for i in range(sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "runs": len(results),
+        "throughput": len(results) / elapsed if elapsed else 0.0,
+        "p50": percentile(results, 50),
+        "p95": percentile(results, 95),
+    }
+
+
+def scaling_run(app, worker_counts, sessions, duration, email, password, base_port=8601, proxy_port=8501):
+    """Serve `app` with each worker count in turn and measure reruns/second under the same load."""
+    rows = []
+    for workers in worker_counts:
+        processes = serve_workers.serve(app, workers, base_port, proxy_port)
+        try:
+            time.sleep(2)
+            base_url = f"http://127.0.0.1:{proxy_port}"
+            if len(processes) == workers:  # no proxy; talk to the first worker directly
+                print("[WARNING] Measuring a single worker because the proxy isn't running")
+                base_url = f"http://127.0.0.1:{base_port}"
+            stats = measure(base_url, sessions, duration, email, password)
+        finally:
+            serve_workers.stop(processes)
+        stats["workers"] = workers
+        rows.append(stats)
+        print(f"[INFO] {workers} workers: {stats['throughput']:.2f} reruns/s")
+
+    baseline = rows[0]["throughput"] or 1.0
+    print(f"\n{'workers':>8} {'runs':>6} {'reruns/s':>9} {'speedup':>8} {'p50 s':>7} {'p95 s':>7}")
+    for row in rows:
+        print(f"{row['workers']:>8} {row['runs']:>6} {row['throughput']:>9.2f} {row['throughput'] / baseline:>7.2f}x "
+              f"{row['p50']:>7.2f} {row['p95']:>7.2f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show how dashboard throughput scales with Streamlit workers.")
+    parser.add_argument("--app", default="login.py", help="Streamlit script to serve")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--sessions", type=int, default=12, help="Concurrent scripted sessions")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds each session keeps clicking")
+    args = parser.parse_args()
+
+    email = os.getenv("LOADTEST_EMAIL")
+    password = os.getenv("LOADTEST_PASSWORD")
+    if not email or not password:
+        sys.exit("Set LOADTEST_EMAIL and LOADTEST_PASSWORD to a dashboard login")
+
+    scaling_run(args.app, args.workers, args.sessions, args.duration, email, password)
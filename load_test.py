@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from load_scaling import import_streamlit_module, percentile
+
+# A realistic visit: look around each tab, narrowing it by property or region, then reset.
+# (tab, multiselect key, how many options to pick); 0 clears the filter.
+INTERACTION_SCRIPT = [
+    ("Property Performance", "property_tab", 1),
+    ("Property Performance", "region_tab", 1),
+    ("Financials", "property_tab2", 2),
+    ("Financials", "region_tab2", 1),
+    ("Leasing", "region_tab3", 1),
+    ("Maintenance", "property_tab4", 1),
+    ("Tenants", "region_tab5", 1),
+    ("Billings", "property_tab6", 1),
+    ("Property Performance", "property_tab", 0),
+    ("Property Performance", "region_tab", 0),
+]
+
+
+def current_rss_mb():
+    """Resident set size of this process right now, in MB."""
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def log_in(at, email, password):
+    at.text_input(key="login_email").input(email)
+    at.text_input(key="login_password").input(password)
+    next(button for button in at.button if button.label == "Login").click()
+    at.run()
+    if not at.session_state["logged_in"]:
+        raise RuntimeError(f"Login failed for {email}")
+
+
+def run_session(session_id, app, email, password, iterations, seed, timeout):
+    """One simulated user in its own process; returns its rerun latencies and resource usage."""
+    app_test = import_streamlit_module("streamlit.testing.v1")
+    rng = random.Random(seed + session_id)
+    steps = []
+
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    at = app_test.AppTest.from_file(app, default_timeout=timeout)
+
+    started = time.perf_counter()
+    at.run()
+    steps.append(("Login page", "first load", time.perf_counter() - started))
+
+    started = time.perf_counter()
+    log_in(at, email, password)
+    steps.append(("Login page", "login", time.perf_counter() - started))
+
+    for _ in range(iterations):
+        for tab, key, picks in INTERACTION_SCRIPT:
+            widget = at.multiselect(key=key)
+            values = rng.sample(list(widget.options), k=min(picks, len(widget.options)))
+            started = time.perf_counter()
+            widget.set_value(values).run()
+            steps.append((tab, key, time.perf_counter() - started))
+            if at.exception:
+                raise RuntimeError(f"{tab} / {key} raised: {at.exception[0].value}")
+
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    return {
+        "session": session_id,
+        "steps": steps,
+        "cpu_seconds": cpu,
+        "cpu_percent": 100 * cpu / wall if wall else 0.0,
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def summarise(sessions):
+    latencies = [seconds for session in sessions for _, _, seconds in session["steps"]]
+    by_tab = {}
+    for session in sessions:
+        for tab, _, seconds in session["steps"]:
+            by_tab.setdefault(tab, []).append(seconds)
+    return {
+        "sessions": len(sessions),
+        "reruns": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "by_tab": {tab: {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+                   for tab, values in by_tab.items()},
+        "per_session": [
+            {key: session[key] for key in ("session", "cpu_seconds", "cpu_percent", "rss_mb", "peak_rss_mb")}
+            for session in sessions
+        ],
+    }
+
+
+def print_report(summary):
+    print(f"\n{summary['sessions']} concurrent sessions, {summary['reruns']} reruns")
+    print(f"Rerun latency  p50 {summary['p50']:.2f}s  p95 {summary['p95']:.2f}s  p99 {summary['p99']:.2f}s\n")
+    print(f"{'tab':<22} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}")
+    for tab, stats in summary["by_tab"].items():
+        print(f"{tab:<22} {stats['p50']:>7.2f} {stats['p95']:>7.2f} {stats['p99']:>7.2f}")
+    print(f"\n{'session':>7} {'CPU s':>8} {'CPU %':>6} {'RSS MB':>8} {'peak MB':>8}")
+    for row in summary["per_session"]:
+        print(f"{row['session']:>7} {row['cpu_seconds']:>8.1f} {row['cpu_percent']:>6.0f} "
+              f"{row['rss_mb']:>8.0f} {row['peak_rss_mb']:>8.0f}")
+
+
+def run_load_test(app="login.py", sessions=4, iterations=3, email=None, password=None, seed=0, timeout=120):
+    """Run `sessions` simulated users at once, each in its own process, and summarise them."""
+    with ProcessPoolExecutor(max_workers=sessions) as pool:
+        futures = [
+            pool.submit(run_session, i, app, email, password, iterations, seed, timeout)
+            for i in range(sessions)
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"[ERROR] Session failed: {e}")
+    return summarise(results)
+
+
+def compare_to_baseline(summary, baseline_path, max_regression):
+    """Return the list of percentiles that got more than `max_regression` slower than the baseline."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for key in ("p50", "p95", "p99"):
+        if baseline.get(key) and summary[key] > baseline[key] * (1 + max_regression):
+            regressions.append(f"{key} {baseline[key]:.2f}s -> {summary[key]:.2f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure dashboard rerun latency with concurrent headless sessions.")
+    parser.add_argument("--app", default="login.py", help="Streamlit script to test")
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=3, help="Times each user repeats the interaction script")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the filter choices, for repeatable runs")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds one rerun may take")
+    parser.add_argument("--output", help="Write the summary as JSON (use it as a later --baseline)")
+    parser.add_argument("--baseline", help="JSON summary of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed slowdown vs. the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    email = os.getenv("LOADTEST_EMAIL")
+    password = os.getenv("LOADTEST_PASSWORD")
+    if not email or not password:
+        sys.exit("Set LOADTEST_EMAIL and LOADTEST_PASSWORD to a dashboard login")
+
+    summary = run_load_test(args.app, args.sessions, args.iterations, email, password, args.seed, args.timeout)
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(summary, args.baseline, args.max_regression)
+        if regressions:
+            print("[FAILED] Slower than baseline: " + ", ".join(regressions))
+            sys.exit(1)
+        print("[OK] Within baseline")
@@ -1,35 +1,42 @@
 from reset_password import save_token, verify_token, update_password, send_reset_email
 import uuid
 import datetime
+import importlib
+import os
+import threading
 import streamlit as st
-import dashboard  # Import the dashboard module
-import yaml
-import bcrypt
+from user_store import get_user_store, LoginBusy, LoginThrottled
+from db_auth import get_auth_backend
 # Set page layout
 st.set_page_config(page_title="Appfolio Dashboards", layout="wide", page_icon="logo.png")
 
-def load_users():
-    with open("users.yaml", "r") as f:
-        return yaml.safe_load(f)["users"]
+# The dashboard (plotly, DuckDB, Arrow, ...) is imported after the login form is served.
+# APPFOLIO_PRELOAD_DASHBOARD=0 defers it to the first login, e.g. to profile the login page alone.
+PRELOAD_DASHBOARD = os.getenv("APPFOLIO_PRELOAD_DASHBOARD", "1") != "0"
+
+@st.cache_resource
+def preload_dashboard():
+    # Once per server process, in the background, so the first login doesn't wait for the import
+    thread = threading.Thread(target=importlib.import_module, args=("dashboard",), name="preload-dashboard", daemon=True)
+    thread.start()
+    return thread
+
+def client_ip():
+    """The browser's address as seen through the proxy, for login throttling.
+
+    Only what nginx itself sets is trusted: X-Real-IP, else the last X-Forwarded-For hop
+    (the one nginx appended). Earlier hops come from the client and can be anything.
+    """
+    real_ip = st.context.headers.get("X-Real-IP", "").strip()
+    if real_ip:
+        return real_ip
+    forwarded = st.context.headers.get("X-Forwarded-For", "")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
+    return getattr(st.context, "ip_address", None)
 
 def check_login(email, password):
-    users = load_users()
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-    print("Paste this into users.yaml:", hashed)
-
-    for user in users:
-
-        try:
-            match = bcrypt.checkpw(password.encode(), user["password"].encode())
-            print("Password match:", match)
-        except Exception as e:
-            print("❌ bcrypt error:", e)
-            continue
-
-        if user["email"] == email and match:
-            return {"name": user["name"], "email": user["email"]}
-
-    return None
+    return get_auth_backend().authenticate(email, password, client_ip=client_ip())
 
 def main():
     # Initialize session state
@@ -63,7 +70,15 @@ def main():
                     password = st.text_input("Password", type="password", placeholder="Enter your password", key="login_password")
 
                     if st.button("Login"):
-                        user = check_login(email, password)
+                        try:
+                            user = check_login(email, password)
+                        except LoginThrottled as e:
+                            st.error(f"Too many failed attempts. Try again in {max(1, round(e.retry_after / 60))} minutes.")
+                            return
+                        except LoginBusy:
+                            # Not counted as a failed attempt
+                            st.warning("The server is busy. Please try again in a moment.")
+                            return
                         if user:
                             # Handle tuple or dict formats safely
                             if isinstance(user, dict):
@@ -90,8 +105,9 @@ def main():
             elif view == "Forgot Password":
                 email = st.text_input("Enter your email to get a reset token")
                 if st.button("Generate Reset Token"):
-                    users = load_users()
-                    if any(u["email"] == email for u in users):
+                    user = get_user_store().get(email)
+                    if user:
+                        email = user["email"]
                         token = str(uuid.uuid4())
                         save_token(email, token)
 
@@ -103,8 +119,8 @@ def main():
                             # st.code(token)
                         except Exception as e:
                             st.error(f"❌ Failed to send email: {e}")
-                else:
-                    st.error("Email not found.")
+                    else:
+                        st.error("Email not found.")
             elif view == "Reset Password":
                     token = st.text_input("Enter your reset token")
                     new_pw = st.text_input("New Password", type="password")
@@ -122,6 +138,10 @@ def main():
                                 st.error("Invalid or expired token.")
        
 
+    # The login form is on screen; load the dashboard while the user types
+    if PRELOAD_DASHBOARD and not st.session_state['logged_in']:
+        preload_dashboard()
+
     #  Show dashboard if logged in
     if st.session_state['logged_in']:
         st.sidebar.success(f"Logged in as {st.session_state.user['email']}")
@@ -131,6 +151,7 @@ def main():
             st.session_state.user = None
             st.rerun()
 
+        import dashboard  # already loaded by preload_dashboard() unless the login was very quick
         dashboard.show_dashboard()  # Call the dashboard function
 
 if __name__ == "__main__":
@@ -4,57 +4,26 @@ import plotly.express as px
 import plotly.io as pio
 import plotly.graph_objects as go
 import os
+from catalog import latest_snapshots
+from metric_registry import MetricEvaluator
 import json
-from datetime import datetime
 import kaleido
 
 BASE_DIR = os.path.join(os.getcwd(), "data")  # Use relative path
 IMG_DIR = "plotly_pdf_images"
 os.makedirs(IMG_DIR, exist_ok=True)
 
-file_prefixes = {
-    "Tenant Data": "tenant_data_cleaned",
-    "Work Orders": "work_order_cleaned",
-    "Vacancies": "vacancy_cleaned",
-    "T_rent": "t_rent_cleaned",
-    "Beg Year": "beg_year_cleaned",
-    "Sameday": "same_day_cleaned",
+datasets = {
+    "Tenant Data": "tenant_data",
+    "Work Orders": "work_order",
+    "Vacancies": "vacancy",
+    "T_rent": "t_rent",
+    "Beg Year": "beg_year",
+    "Sameday": "same_day",
 }
 
-# Initialize a dictionary to store the latest file for each category
-latest_files = {}
-
-# List all files in the BASE_DIR
-files_in_directory = os.listdir(BASE_DIR)
-
-# Function to extract date from the filename
-def extract_timestamp_from_filename(filename):
-    """
-    Extracts datetime object from filenames like 'tenant_data_cleaned_20250321_115751.csv'
-    """
-    try:
-        # Extract the last two underscore-separated parts before .csv
-        parts = filename.rsplit("_", 2)  # ['tenant_data_cleaned', '20250321', '115751.csv']
-        if len(parts) < 3:
-            raise ValueError("Invalid filename format")
-        
-        date_str, time_str = parts[-2], parts[-1].split(".")[0]  # Get YYYYMMDD and HHMMSS
-
-        # Convert to datetime object
-        return datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
-    except ValueError as e:
-        print(f"Error parsing date from {filename}: {e}")
-        return datetime.min  # Return a minimal datetime to avoid crashing
-
-# Iterate through each category and find the latest file
-for category, prefix in file_prefixes.items():
-    # Filter files based on the prefix
-    relevant_files = [f for f in files_in_directory if f.startswith(prefix) and f.endswith(".csv")]
-    
-    if relevant_files:
-        # Sort the files by timestamp extracted from their filenames in descending order (latest first)
-        latest_file = max(relevant_files, key=extract_timestamp_from_filename)
-        latest_files[category] = os.path.join(BASE_DIR, latest_file)
+# Look up the newest snapshot of each dataset in the catalog (data/catalog.db)
+latest_files = {category: path for category, path in latest_snapshots(BASE_DIR, datasets).items() if path}
 
 # Print the latest files for each category
 for category, file_path in latest_files.items():
@@ -84,25 +53,27 @@ image_paths = []
 
 # Process the tenant data
 tenant_data = dfs.get("Tenant Data")
-if tenant_data is not None:
-    # Extract unit status
-    current_units = tenant_data[tenant_data["Status"] == "Current"].shape[0]
-    vacant_units = tenant_data[tenant_data["Status"] == "Vacant-Rented"].shape[0]
-    all_units = tenant_data.shape[0]
 
-    # Occupancy percentage
-    occupied = (current_units / all_units) * 100
+# Headline metrics for metrics.json, each shared intermediate computed once (metric_registry.py)
+metrics = MetricEvaluator({
+    "units": tenant_data,
+    "tenant_data": tenant_data,
+    "work_orders": dfs.get("Work Orders"),
+    "vacancies": dfs.get("Vacancies"),
+})
+
+if tenant_data is not None:
+    headline = metrics.evaluate(["total_units", "occupancy_rate", "rent_collected_pct", "recorded_move_outs"])
+    all_units = headline["total_units"]
+    occupied = headline["occupancy_rate"]
 
     # Clean rent columns
     tenant_data["Rent"] = tenant_data["Rent"].replace("[\$,]", "", regex=True)
     tenant_data["Rent"] = pd.to_numeric(tenant_data["Rent"], errors="coerce")
     tenant_data["Market Rent"] = tenant_data["Market Rent"].replace("[\$,]", "", regex=True)
     tenant_data["Market Rent"] = pd.to_numeric(tenant_data["Market Rent"], errors="coerce")
-
-    # Calculate total rents
-    total_rent = tenant_data["Rent"].sum()
-    market_total_rent = tenant_data["Market Rent"].sum()
-    total_move_out = tenant_data["Move-out"].notnull().sum()
+    rent_collected = headline["rent_collected_pct"]
+    total_move_out = headline["recorded_move_outs"]
 
     # Filter for late payments
     df_filtered = tenant_data.dropna(subset=["Tenant", "Late Count"]).copy()
@@ -452,33 +423,24 @@ if tenant_data is not None:
     fig9.write_image(img_path9)
     image_paths.append(img_path9)
 
-    rent_ready = dfs["Vacancies"][dfs["Vacancies"]["Rent Ready"] == "Yes"].shape[0]
-    urgent_work_orders = dfs["Work Orders"][dfs["Work Orders"]["Priority"] == "Urgent"].shape[0]
-    next_move_in = dfs["Vacancies"]["Next Move In"].notnull().sum()
-    
-    total_vacancy = dfs["Vacancies"].shape[0]
+    headline = metrics.evaluate([
+        "total_vacancy", "rent_ready_units", "vacancy_move_ins", "avg_days_vacant",
+        "total_work_orders", "new_work_orders", "urgent_work_orders", "work_order_amount",
+    ])
+    rent_ready = headline["rent_ready_units"]
+    next_move_in = headline["vacancy_move_ins"]
+    total_vacancy = headline["total_vacancy"]
 
         # **Convert "Days Vacant" to Numeric**
     dfs["Vacancies"]["Days Vacant"] = pd.to_numeric(
         dfs["Vacancies"]["Days Vacant"].replace("[\$,]", "", regex=True), 
         errors="coerce"
     )
-
-        # **Calculate Average Days Vacant**
-    avg_days_vacant = dfs["Vacancies"]["Days Vacant"].mean()
-    new_work_orders = dfs["Work Orders"][dfs["Work Orders"]["Status"] == "New"].shape[0]
-    urgent_work_orders = dfs["Work Orders"][dfs["Work Orders"]["Priority"] == "Urgent"].shape[0]
-    # Count total rows (all units)
-    all_work_order= dfs["Work Orders"].shape[0]
-
-    
-    dfs["Work Orders"]["Amount"] = dfs["Work Orders"]["Amount"].replace("[\$,]", "", regex=True)  # Remove $ and ,
-    dfs["Work Orders"]["Amount"] = pd.to_numeric(dfs["Work Orders"]["Amount"], errors="coerce")  # Convert to number
-
-    # Calculate total rent
-    total_amount = dfs["Work Orders"]["Amount"].sum()
-    market_total_rent = dfs["Tenant Data"]["Market Rent"].sum()
-    total_move_out = dfs["Tenant Data"]["Move-out"].notnull().sum()
+    avg_days_vacant = headline["avg_days_vacant"]
+    new_work_orders = headline["new_work_orders"]
+    urgent_work_orders = headline["urgent_work_orders"]
+    all_work_order = headline["total_work_orders"]
+    total_amount = headline["work_order_amount"]
     def convert_values(data):
         return {key: [{"label": item["label"], "value": str(item["value"])} for item in value] for key, value in data.items()}
 
@@ -487,7 +449,7 @@ if tenant_data is not None:
         "metrics1": [
             {"label": "Total Unit", "value": int(all_units)},
             {"label": "Occupancy Rate", "value": f"{occupied:.2f}%"},
-            {"label": "Total Rent Collected %", "value": f"{(total_rent)/(market_total_rent)*100:,.2f}%"},
+            {"label": "Total Rent Collected %", "value": f"{rent_collected:,.2f}%"},
             {"label": "Total Move-outs", "value": int(total_move_out)}
         ],
         "metrics2": [
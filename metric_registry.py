@@ -0,0 +1,337 @@
+import argparse
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+
+import tab_cache
+from period_comparison import clean_money
+from unit_history import OCCUPIED_STATUSES, DELINQUENT_PAST_DUE
+
+METRICS_LIST = "Metrics List.xlsx"
+
+# Frames an evaluation can be given. "units" has one row per unit with Status, Rent, Market Rent
+# and Past Due: the rent roll where a page has one, otherwise Tenant Data.
+DATASETS = ("units", "tenant_data", "work_orders", "vacancies")
+VACANT_STATUSES = ["Vacant-Rented", "Vacant-Unrented"]
+NON_RENEW_PATTERN = r"non[\s-]?renew|not[\s-]?renew"
+LOOKAHEAD_DAYS = 90
+
+
+class Node:
+    """A named value computed from its inputs: a dataset, `today`, or another node."""
+
+    def __init__(self, name, inputs, compute, label=None, section=None, sheet=None):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+        self.label = label
+        self.section = section
+        self.sheet = sheet  # the "Metrics List.xlsx" row this metric answers, if any
+
+    @property
+    def is_metric(self):
+        return self.label is not None
+
+
+REGISTRY = {}
+
+
+def intermediate(name, *inputs):
+    """Register a shared intermediate (cleaned column, status counts, ...) used by metrics."""
+    def register(compute):
+        REGISTRY[name] = Node(name, inputs, compute)
+        return compute
+    return register
+
+
+def metric(name, *inputs, label, section, sheet=None):
+    """Register a headline metric with its display label and dashboard section."""
+    def register(compute):
+        REGISTRY[name] = Node(name, inputs, compute, label=label, section=section, sheet=sheet)
+        return compute
+    return register
+
+
+# --- Intermediates -----------------------------------------------------------
+
+@intermediate("unit_status_counts", "units")
+def _unit_status_counts(units):
+    return units["Status"].value_counts()
+
+
+@intermediate("unit_rent", "units")
+def _unit_rent(units):
+    return clean_money(units["Rent"])
+
+
+@intermediate("unit_market_rent", "units")
+def _unit_market_rent(units):
+    return clean_money(units["Market Rent"])
+
+
+@intermediate("unit_past_due", "units")
+def _unit_past_due(units):
+    return clean_money(units["Past Due"]).fillna(0)
+
+
+@intermediate("tenant_status_counts", "tenant_data")
+def _tenant_status_counts(tenant_data):
+    return tenant_data["Status"].value_counts()
+
+
+@intermediate("tenant_lease_to", "tenant_data")
+def _tenant_lease_to(tenant_data):
+    return pd.to_datetime(tenant_data["Lease To"], errors="coerce")
+
+
+@intermediate("tenant_move_in", "tenant_data")
+def _tenant_move_in(tenant_data):
+    return pd.to_datetime(tenant_data["Move-in"], errors="coerce")
+
+
+@intermediate("work_order_status_counts", "work_orders")
+def _work_order_status_counts(work_orders):
+    return work_orders["Status"].value_counts()
+
+
+@intermediate("work_order_amount", "work_orders")
+def _work_order_amount(work_orders):
+    return clean_money(work_orders["Amount"])
+
+
+@intermediate("vacancy_days", "vacancies")
+def _vacancy_days(vacancies):
+    return clean_money(vacancies["Days Vacant"])
+
+
+# --- Property Performance ----------------------------------------------------
+
+@metric("total_units", "units", label="Total Units", section="Property Performance")
+def total_units(units):
+    return len(units)
+
+
+@metric("occupied_units", "unit_status_counts", label="Total Occupied", section="Property Performance")
+def occupied_units(status_counts):
+    return int(status_counts.reindex(OCCUPIED_STATUSES, fill_value=0).sum())
+
+
+@metric("vacant_units", "unit_status_counts", label="Total Vacant", section="Property Performance",
+        sheet="Vacant Unit Count")
+def vacant_units(status_counts):
+    return int(status_counts.reindex(VACANT_STATUSES, fill_value=0).sum())
+
+
+@metric("occupancy_rate", "occupied_units", "total_units", label="Current Occupancy Rate",
+        section="Property Performance", sheet="Occupancy")
+def occupancy_rate(occupied, total):
+    return occupied / total * 100 if total > 0 else 0
+
+
+@metric("future_occupancy_rate", "occupied_units", "total_units", "tenant_data", "tenant_status_counts",
+        "tenant_lease_to", "today", label="Future Occupancy Rate (Next 90 days)", section="Property Performance")
+def future_occupancy_rate(occupied, total, tenant_data, tenant_status_counts, lease_to, today):
+    # Future residents move in; current residents tagged non-renewing move out
+    future = int(tenant_status_counts.get("Future", 0))
+    non_renewing = int((
+        (tenant_data["Status"] == "Current")
+        & (lease_to >= pd.Timestamp(today))
+        & tenant_data["Tenant Tags"].str.contains(NON_RENEW_PATTERN, case=False, na=False)
+    ).sum())
+    return (occupied + future - non_renewing) / total * 100 if total > 0 else 0
+
+
+@metric("upcoming_move_ins", "tenant_data", "tenant_move_in", "today", label="Move-ins (Next 90 days)",
+        section="Property Performance", sheet="Move-Ins")
+def upcoming_move_ins(tenant_data, move_in, today):
+    return len(tenant_data.loc[move_in >= pd.Timestamp(today), ["Property Name", "Unit"]].drop_duplicates())
+
+
+@metric("upcoming_move_outs", "tenant_data", "tenant_lease_to", "today", label="Move-outs (Next 90 days)",
+        section="Property Performance", sheet="Move-Outs")
+def upcoming_move_outs(tenant_data, lease_to, today):
+    start = pd.Timestamp(today)
+    expiring = (lease_to >= start) & (lease_to <= start + timedelta(days=LOOKAHEAD_DAYS))
+    return len(tenant_data.loc[expiring, ["Property Name", "Unit"]].drop_duplicates())
+
+
+@metric("recorded_move_outs", "tenant_data", label="Total Move-outs", section="Property Performance")
+def recorded_move_outs(tenant_data):
+    return int(tenant_data["Move-out"].notnull().sum())
+
+
+@metric("delinquent_units", "unit_past_due", label="Delinquent Units", section="Property Performance",
+        sheet="Delinquency")
+def delinquent_units(past_due):
+    return int((past_due > DELINQUENT_PAST_DUE).sum())
+
+
+@metric("total_past_due", "unit_past_due", label="Total Past Due", section="Property Performance",
+        sheet="Delinquency")
+def total_past_due(past_due):
+    return float(past_due.sum())
+
+
+# --- Rent --------------------------------------------------------------------
+
+@metric("total_rent", "unit_rent", label="Total Rent", section="Rent")
+def total_rent(rent):
+    return float(rent.sum())
+
+
+@metric("total_market_rent", "unit_market_rent", label="Total Market Rent", section="Rent")
+def total_market_rent(market_rent):
+    return float(market_rent.sum())
+
+
+@metric("rent_collected_pct", "total_rent", "total_market_rent", label="Total Rent Collected %", section="Rent",
+        sheet="% of Rent Collected")
+def rent_collected_pct(rent, market_rent):
+    return rent / market_rent * 100 if market_rent else 0
+
+
+# --- Maintenance -------------------------------------------------------------
+
+@metric("total_work_orders", "work_orders", label="Total Workorder", section="Maintenance")
+def total_work_orders(work_orders):
+    return len(work_orders)
+
+
+@metric("new_work_orders", "work_order_status_counts", label="New work orders", section="Maintenance",
+        sheet="Work Orders Created vs Work Orders Completed")
+def new_work_orders(status_counts):
+    return int(status_counts.get("New", 0))
+
+
+@metric("urgent_work_orders", "work_orders", label="Urgent Work Orders", section="Maintenance")
+def urgent_work_orders(work_orders):
+    return int((work_orders["Priority"] == "Urgent").sum())
+
+
+@metric("work_order_amount", "work_order_amount", label="Total Amounts", section="Maintenance")
+def work_order_amount(amount):
+    return float(amount.sum())
+
+
+# --- Vacancies ---------------------------------------------------------------
+
+@metric("total_vacancy", "vacancies", label="Total Vacancy", section="Vacancies")
+def total_vacancy(vacancies):
+    return len(vacancies)
+
+
+@metric("rent_ready_units", "vacancies", label="Rent Ready Units", section="Vacancies")
+def rent_ready_units(vacancies):
+    return int((vacancies["Rent Ready"] == "Yes").sum())
+
+
+@metric("vacancy_move_ins", "vacancies", label="Upcoming Move In", section="Vacancies")
+def vacancy_move_ins(vacancies):
+    return int(vacancies["Next Move In"].notnull().sum())
+
+
+@metric("avg_days_vacant", "vacancy_days", label="Avg Days Vacant", section="Vacancies")
+def avg_days_vacant(days):
+    return float(days.mean())
+
+
+# --- Evaluation --------------------------------------------------------------
+
+def plan(names):
+    """Nodes needed for `names`, each once, in an order where every input comes first."""
+    order, seen = [], set()
+
+    def visit(name, path):
+        if name in seen or name in DATASETS or name == "today":
+            return
+        if name not in REGISTRY:
+            raise KeyError(f"Unknown metric or intermediate '{name}'" + (f" (needed by {path[-1]})" if path else ""))
+        if name in path:
+            raise ValueError(f"Metric dependency cycle: {' -> '.join(path + [name])}")
+        for input_name in REGISTRY[name].inputs:
+            visit(input_name, path + [name])
+        seen.add(name)
+        order.append(REGISTRY[name])
+
+    for name in names:
+        visit(name, [])
+    return order
+
+
+class MetricEvaluator:
+    """Evaluates requested metrics over one set of frames, computing each shared node once.
+
+    Values are kept for the evaluator's lifetime, so later requests over the same frames reuse
+    every intermediate already computed. Frames are never modified.
+    """
+
+    def __init__(self, frames, today=None):
+        self.values = {name: frame for name, frame in frames.items() if name in DATASETS and frame is not None}
+        self.values["today"] = today or date.today()
+
+    def evaluate(self, names):
+        for node in plan(names):
+            if node.name in self.values:
+                continue
+            missing = [name for name in node.inputs if name not in self.values]
+            if missing:
+                raise KeyError(f"Metric '{node.name}' needs {', '.join(missing)}")
+            self.values[node.name] = node.compute(*(self.values[name] for name in node.inputs))
+        return {name: self.values[name] for name in names}
+
+
+def evaluate_metrics(frames, names, version, filters=None, today=None):
+    """Metric values for one dataset version and filter state, shared by every worker.
+
+    `version` identifies the snapshots behind `frames` (tab_cache.dataset_version) and
+    `filters` the page's filter state; together with the metric names and date they key
+    the cached result.
+    """
+    today = today or date.today()
+    key = {**(filters or {}), "metrics": list(names), "today": today.isoformat()}
+    return tab_cache.cached("metrics", version, key, lambda: MetricEvaluator(frames, today).evaluate(names))
+
+
+def sheet_metrics(path=METRICS_LIST):
+    """(section, metric, chart type, description) of every metric listed in the workbook."""
+    sheet = pd.read_excel(path)
+    rows, section, heading = [], None, True
+    for name, chart, description in sheet[["Metric", "Chart Type", "Description"]].itertuples(index=False):
+        if pd.isna(name):
+            heading = True  # a blank row ends a section; the next row names the new one
+            continue
+        if heading:
+            section, heading = str(name).strip(), False
+            continue
+        rows.append((section, str(name).strip(), None if pd.isna(chart) else chart,
+                     None if pd.isna(description) else description))
+    return rows
+
+
+def coverage(path=METRICS_LIST):
+    """The workbook's metrics with the registered metrics that implement each (empty if none)."""
+    implemented = {}
+    for node in REGISTRY.values():
+        if node.sheet:
+            implemented.setdefault(node.sheet, []).append(node.name)
+    return [(section, name, implemented.get(name, [])) for section, name, _, _ in sheet_metrics(path)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the metric registry.")
+    parser.add_argument("--metrics-list", default=METRICS_LIST, help="Workbook listing the business metrics")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Print the registered metrics and their inputs")
+    commands.add_parser("coverage", help="Print which workbook metrics the registry implements")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for node in REGISTRY.values():
+            kind = f"{node.section}: {node.label}" if node.is_metric else "intermediate"
+            print(f"{node.name:<26} {kind:<55} <- {', '.join(node.inputs)}")
+    elif args.command == "coverage":
+        if not os.path.exists(args.metrics_list):
+            parser.error(f"{args.metrics_list} not found")
+        for section, name, metrics in coverage(args.metrics_list):
+            print(f"{section:<22} {name:<45} {', '.join(metrics) or '-'}")
@@ -0,0 +1,279 @@
+import argparse
+import html
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from clean_pool import prefix_for_raw_file
+
+REPO_FOLDER = os.path.dirname(os.path.abspath(__file__))
+# Recorded raw exports (e.g. rent_roll-20250418.csv) and pages (<report>.html) are looked up here
+FIXTURE_FOLDERS = [REPO_FOLDER, os.path.join(REPO_FOLDER, "data")]
+SESSION_COOKIE = "_mock_appfolio_session"
+
+# Environment variable appfolio_data.py reads each report page's URL from
+REPORT_URL_ENV = {
+    "rentroll": "APPFOLIO_LOGIN_URL",
+    "tenant_data": "TENANT_URL",
+    "work_order": "WORK_ORDER_URL",
+    "leasing": "LEASING_FUNNEL_URL",
+    "prospect": "PROSPECT_SOURCE_URL",
+    "purchase_order": "PURCHASE_ORDER_URL",
+    "bill": "BILL_URL",
+    "guest": "GUEST_CARD_URL",
+    "general_ledger": "LEDGER_URL",
+}
+
+# What download_csv() drives on each report page: (filter input ids, grid columns it turns on, other controls)
+REPORT_CONTROLS = {
+    "rentroll": (["filters_as_of_to"], [], ""),
+    "tenant_data": ([], ["Move-out"],
+                    '<label><input type="checkbox" name="filters[tenant_statuses][]" value="all"> All statuses</label>'),
+    "work_order": (["filters_status_date_range_from", "filters_status_date_range_to"], [],
+                   '<span class="selected-property">Property <button type="button" class="btn-close">x</button></span>'),
+    "leasing": (["filters_received_on_from", "filters_received_on_to"], [], ""),
+    "prospect": ([], [], ""),
+    "purchase_order": (["filters_created_date_from", "filters_created_date_to"], [], ""),
+    "bill": (["filters_occurred_on_from", "filters_occurred_on_to"], ["Approval Status"], ""),
+    "guest": (["filters_received_on_from", "filters_received_on_to"],
+              ["Property", "Inquiry ID", "Showings", "Source", "Rental Application ID"],
+              '<label><input type="radio" id="filters_float_received_on_from_to" name="filters[float]"> Range</label>'),
+    "general_ledger": (["filters_posted_on_from", "filters_posted_on_to"], ["GL Account"], ""),
+}
+
+LOGIN_PAGE = """<html><head><title>Sign In</title></head><body>
+<form method="post" action="/users/sign_in">
+<p>{error}</p>
+<input type="hidden" name="next" value="{next}">
+<input type="email" id="user_email" name="user[email]">
+<input type="password" id="user_password" name="user[password]">
+<input type="submit" name="commit" value="Sign In">
+</form></body></html>"""
+
+REPORT_PAGE = """<html><head><title>{title}</title></head><body>
+<form id="filters" onsubmit="return false">{controls}{inputs}
+<button type="button" onclick="refresh()">Update</button></form>
+<div class="tool-panel"><input type="text" placeholder="Search...">{columns}</div>
+<div class="dropdown-div js-actions-dropdown">
+<button type="button" onclick="document.getElementById('actions').style.display = 'block'">Actions</button>
+<div id="actions" style="display: none"><button type="button" class="js-export-csv-button">Export CSV</button></div>
+</div>
+<div id="results"></div>
+<script>
+function refresh() {{
+  fetch("/reports/{name}/results").then(r => r.text()).then(t => document.getElementById("results").innerHTML = t);
+}}
+</script>
+</body></html>"""
+
+# Added to every report page, recorded or generated: the export button downloads the fixture
+EXPORT_SCRIPT = """<script>
+document.addEventListener("click", function (e) {{
+  if (e.target.closest(".js-export-csv-button")) {{ e.preventDefault(); window.location.href = "/exports/{name}"; }}
+}}, true);
+</script>"""
+
+
+def find_fixtures(folders=FIXTURE_FOLDERS):
+    """{report: raw export path} of the recorded exports in `folders` (the newest by name per report),
+    and {report: page path} of recorded report pages saved as '<report>.html'."""
+    exports, pages = {}, {}
+    candidates = [os.path.join(os.path.abspath(folder), name) for folder in folders if os.path.isdir(folder)
+                  for name in os.listdir(folder)]
+    for path in sorted(candidates, key=os.path.basename):
+        name = os.path.basename(path)
+        if name.endswith(".csv") and prefix_for_raw_file(name):
+            exports[prefix_for_raw_file(name)] = path
+        elif name.endswith(".html") and name[:-5] in REPORT_CONTROLS:
+            pages[name[:-5]] = path
+    return exports, pages
+
+
+def render_report_page(name):
+    inputs, columns, controls = REPORT_CONTROLS[name]
+    return REPORT_PAGE.format(
+        title=html.escape(name),
+        name=quote(name),
+        controls=controls,
+        inputs="".join(f'<input type="text" id="{input_id}" name="{input_id}">' for input_id in inputs),
+        columns="".join(f'<span data-ref="eLabel">{html.escape(column)}</span>' for column in columns),
+    )
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        logging.debug(f"mock AppFolio: {format % args}")
+
+    def _signed_in(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return SESSION_COOKIE in cookie and cookie[SESSION_COOKIE].value in self.mock.sessions
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _login_page(self, next_path, error="", status=200):
+        body = LOGIN_PAGE.format(next=html.escape(next_path, quote=True), error=html.escape(error))
+        self._send(status, body.encode())
+
+    def do_GET(self):
+        time.sleep(self.mock.latency)
+        path = urlsplit(self.path).path
+        parts = path.strip("/").split("/")
+        if path == "/users/sign_in":
+            return self._login_page("/")
+        if len(parts) >= 2 and parts[0] in ("reports", "exports") and parts[1] in REPORT_CONTROLS:
+            if not self._signed_in():
+                # AppFolio answers any page with the sign-in form and returns there afterwards
+                return self._login_page(path)
+            if parts[0] == "exports":
+                return self._export(parts[1])
+            if parts[2:] == ["results"]:
+                return self._send(200, b"<table><tr><td>Report refreshed</td></tr></table>")
+            return self._report_page(parts[1])
+        if path == "/":
+            return self._send(200, b"<html><body>Dashboard</body></html>")
+        self._send(404, b"Not found")
+
+    def do_POST(self):
+        time.sleep(self.mock.latency)
+        if urlsplit(self.path).path != "/users/sign_in":
+            return self._send(404, b"Not found")
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        email = form.get("user[email]", [""])[0]
+        password = form.get("user[password]", [""])[0]
+        next_path = form.get("next", ["/"])[0]
+        if not self.mock.accepts(email, password):
+            return self._login_page(next_path, "Invalid email or password.", status=401)
+        session = secrets.token_hex(16)
+        self.mock.sessions.add(session)
+        self._send(303, headers={"Location": next_path if next_path.startswith("/") else "/",
+                                 "Set-Cookie": f"{SESSION_COOKIE}={session}; Path=/; HttpOnly"})
+
+    def _report_page(self, name):
+        if name in self.mock.pages:
+            with open(self.mock.pages[name], encoding="utf-8") as f:
+                page = f.read()
+        else:
+            page = render_report_page(name)
+        script = EXPORT_SCRIPT.format(name=quote(name))
+        page = page.replace("</body>", script + "</body>") if "</body>" in page else page + script
+        self._send(200, page.encode())
+
+    def _export(self, name):
+        path = self.mock.exports.get(name)
+        if path is None:
+            return self._send(404, f"No recorded export for {name}".encode())
+        # The time AppFolio takes to generate the export
+        time.sleep(self.mock.export_latency)
+        self.mock.export_count += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+
+class MockAppFolio:
+    """A local stand-in for AppFolio that serves report pages and recorded CSV exports.
+
+    Report pages carry the element ids and buttons download_csv() drives (filters, grid
+    column search, the Actions dropdown and `js-export-csv-button`), or a recorded page saved
+    as '<report>.html' in a fixture folder. Exporting returns the recorded raw export for the
+    report. Every request waits `latency` seconds and every export a further `export_latency`,
+    so runs against it are repeatable.
+    """
+
+    def __init__(self, fixture_folders=FIXTURE_FOLDERS, latency=0.0, export_latency=0.0, host="127.0.0.1", port=0,
+                 username=None, password=None):
+        self.exports, self.pages = find_fixtures(fixture_folders)
+        self.latency = latency
+        self.export_latency = export_latency
+        self.username = username
+        self.password = password
+        self.sessions = set()
+        self.export_count = 0
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def accepts(self, email, password):
+        """Any non-empty login, unless the mock was given one."""
+        if self.username is None:
+            return bool(email and password)
+        return (email, password) == (self.username, self.password)
+
+    def report_url(self, name):
+        return f"{self.url}/reports/{quote(name)}"
+
+    def export_url(self, name):
+        return f"{self.url}/exports/{quote(name)}"
+
+    def environment(self):
+        """Environment variables that point appfolio_data.py at this server."""
+        env = {variable: self.report_url(name) for name, variable in REPORT_URL_ENV.items()}
+        env["APPFOLIO_USERNAME"] = self.username or "bench@example.com"
+        env["APPFOLIO_PASSWORD"] = self.password or "bench"
+        return env
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logging.info(f"[INFO] Mock AppFolio serving {', '.join(sorted(self.exports))} on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded AppFolio report pages and exports locally.")
+    parser.add_argument("--port", type=int, default=8700, help="Port to listen on")
+    parser.add_argument("--fixtures", action="append", help="Folder of recorded exports and pages (repeatable; "
+                                                             "default: the repository and its data folder)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--export-latency", type=float, default=0.0, help="Seconds added to every CSV export")
+    args = parser.parse_args()
+
+    mock = MockAppFolio(args.fixtures or FIXTURE_FOLDERS, args.latency, args.export_latency, port=args.port)
+    print(f"[INFO] Mock AppFolio on {mock.url}; recorded exports: {', '.join(sorted(mock.exports)) or 'none'}")
+    print("[INFO] Point the scraper at it with:")
+    for variable, value in mock.environment().items():
+        print(f"  {variable}={value}")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
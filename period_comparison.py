@@ -0,0 +1,62 @@
+import pandas as pd
+
+# The one definition of an occupied unit: the comparison table, the headline cards, unit
+# history and KPI history all count these statuses
+OCCUPIED_STATUSES = ["Current", "Notice-Rented", "Notice-Unrented", "Evict"]
+
+
+def clean_money(values):
+    """'$1,234.00' -> 1234.0; anything unparseable becomes NaN."""
+    return pd.to_numeric(values.astype(str).str.replace(r"[$,]", "", regex=True).str.strip(), errors="coerce")
+
+
+def stack_periods(frames, group="BD/BA"):
+    """One long frame of every snapshot's units, tagged with its period label.
+
+    `frames` maps a period label (e.g. "Cur", "T3") to that period's Tenant Data snapshot;
+    the label order is kept in the categorical `Period` column.
+    """
+    labels = list(frames)
+    stacked = pd.concat(
+        [df[[group, "Status", "Rent"]].assign(Period=label) for label, df in frames.items()],
+        ignore_index=True,
+    )
+    stacked["Period"] = pd.Categorical(stacked["Period"], categories=labels, ordered=True)
+    stacked["Rent"] = clean_money(stacked["Rent"])
+    stacked["Occupied"] = stacked["Status"].isin(OCCUPIED_STATUSES)
+    return stacked
+
+
+def period_summary(stacked, group="BD/BA"):
+    """Rent, unit and occupied-unit totals per (period, group) in one grouped pass, plus a
+    "Total" row per period."""
+    summary = stacked.groupby(["Period", group], observed=True).agg(
+        Total_Rent=("Rent", "sum"),
+        Total_Units=("Occupied", "size"),
+        Occupied_Units=("Occupied", "sum"),
+    )
+    totals = summary.groupby(level="Period", observed=True).sum()
+    totals.index = pd.MultiIndex.from_arrays([totals.index, ["Total"] * len(totals)], names=["Period", group])
+    summary = pd.concat([summary, totals])
+    summary["Occupancy_Rate"] = (summary["Occupied_Units"] / summary["Total_Units"].where(summary["Total_Units"] > 0)).fillna(0) * 100
+    return summary
+
+
+def comparison_table(frames, group="BD/BA"):
+    """Wide rent and occupancy comparison of several periods, one row per `group` value.
+
+    Columns are "<label> Total" and "<label> Oc. Rate" for each period in `frames` order;
+    groups a period doesn't have show "-". Another period is just another entry in `frames`.
+    """
+    summary = period_summary(stack_periods(frames, group), group)
+
+    formatted = pd.DataFrame({
+        "Total": summary["Total_Rent"].map(lambda x: f"${x:,.2f}"),
+        "Oc. Rate": summary["Occupancy_Rate"].round(2).astype(str) + "%",
+    })
+    wide = formatted.unstack(level="Period")
+    wide.columns = [f"{label} {metric}" for metric, label in wide.columns]
+    wide = wide.reindex(columns=[f"{label} {metric}" for label in frames for metric in ("Total", "Oc. Rate")])
+
+    groups = sorted((g for g in wide.index if g != "Total"), key=str) + ["Total"]
+    return wide.reindex(groups).fillna("-").rename_axis(group).reset_index()
@@ -0,0 +1,136 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+import streamlit as st
+
+# ?profile=1 shows the panel; ?profile=cprofile also records a cProfile of the whole rerun
+QUERY_PARAM = "profile"
+ADMIN_ROLE = "admin"
+
+
+def is_admin(user):
+    """Admins have `role: admin` in users.yaml, or are listed in APPFOLIO_ADMIN_EMAILS."""
+    if not user:
+        return False
+    admin_emails = {e.strip().lower() for e in os.getenv("APPFOLIO_ADMIN_EMAILS", "").split(",") if e.strip()}
+    return user.get("role") == ADMIN_ROLE or user.get("email", "").lower() in admin_emails
+
+
+class RerunProfiler:
+    """Times each dashboard section of one rerun and measures the memory it allocates.
+
+    When disabled, `section()` is a no-op so regular users pay nothing for it. tracemalloc
+    counts every thread, so memory figures include other sessions on the same worker.
+    """
+
+    def __init__(self, enabled=False, use_cprofile=False):
+        self.enabled = enabled
+        self.use_cprofile = enabled and use_cprofile
+        self.records = []
+        self.stack = []
+        self.profile = None
+        self.started = None
+        self.stopped = None
+        self.owns_tracing = False
+
+    def start(self):
+        if not self.enabled:
+            return self
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.owns_tracing = True
+        self.started = time.perf_counter()
+        if self.use_cprofile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def section(self, name):
+        return self._section(name) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _section(self, name):
+        path = " / ".join(self.stack + [name])
+        self.stack.append(name)
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            after, peak = tracemalloc.get_traced_memory()
+            self.stack.pop()
+            self.records.append({
+                "Section": path,
+                "Depth": len(self.stack),
+                "Seconds": seconds,
+                "Allocated MB": (after - before) / 1024 / 1024,
+                "Peak MB": (peak - before) / 1024 / 1024,
+            })
+            # A parent's peak only covers what runs after its last nested section
+            tracemalloc.reset_peak()
+
+    def stop(self):
+        """Stop measuring and return the rerun's seconds; later calls return the same figure."""
+        if self.started is None:
+            return 0.0
+        if self.stopped is None:
+            self.stopped = time.perf_counter()
+            if self.profile is not None:
+                self.profile.disable()
+            if self.owns_tracing:
+                tracemalloc.stop()
+                self.owns_tracing = False
+        return self.stopped - self.started
+
+    def breakdown(self):
+        """Sections ranked by time, slowest first."""
+        df = pd.DataFrame(self.records, columns=["Section", "Depth", "Seconds", "Allocated MB", "Peak MB"])
+        return df.sort_values("Seconds", ascending=False).reset_index(drop=True)
+
+    def profile_bytes(self):
+        """The rerun's cProfile stats in .prof format (open with snakeviz, or flameprof for a flamegraph)."""
+        if self.profile is None:
+            return None
+        # Same payload pstats.Stats.dump_stats() writes to disk
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+    def top_functions(self, limit=25):
+        if self.profile is None:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def render(self, total_seconds):
+        if not self.enabled:
+            return
+        with st.expander(f"⏱️ Profiler: rerun took {total_seconds:.2f}s", expanded=True):
+            st.dataframe(
+                self.breakdown().style.format({"Seconds": "{:.3f}", "Allocated MB": "{:.1f}", "Peak MB": "{:.1f}"}),
+                use_container_width=True,
+            )
+            if self.profile is not None:
+                st.download_button(
+                    "Download cProfile (.prof)",
+                    data=self.profile_bytes(),
+                    file_name=f"dashboard_rerun_{time.strftime('%Y%m%d_%H%M%S')}.prof",
+                    mime="application/octet-stream",
+                )
+                st.code(self.top_functions(), language="text")
+
+
+def profiler_for(user):
+    """Profiler for this rerun: active only for admins who asked for it with ?profile=..."""
+    mode = st.query_params.get(QUERY_PARAM)
+    enabled = bool(mode) and is_admin(user)
+    return RerunProfiler(enabled=enabled, use_cprofile=mode == "cprofile")
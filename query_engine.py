@@ -0,0 +1,227 @@
+import logging
+import os
+import threading
+import time
+
+import duckdb
+import pandas as pd
+
+import tab_cache
+from catalog import SnapshotCatalog
+from file_lock import file_lock
+
+COLUMNAR_FOLDER = ".columnar"
+REGION_FILE = "region_list.csv"
+
+# Hidden columns added to every columnar copy: source order, and 'Date' parsed so range
+# filters can skip row groups using the Parquet min/max statistics
+ROW_COLUMN = "__row"
+PART_COLUMN = "__part"
+DATE_COLUMN = "__date"
+HIDDEN_COLUMNS = (ROW_COLUMN, PART_COLUMN, DATE_COLUMN)
+ROW_GROUP_SIZE = 100000
+# A copy of an older version of a file is kept this long after its replacement is written
+RETIRE_AFTER_SECONDS = 10 * 60
+
+# GL account code ranges used by the Financials tab
+RENT_INCOME_CODES = "code BETWEEN 4100 AND 4104"
+OPERATING_INCOME_CODES = "(code BETWEEN 4100 AND 5721 OR account = 'Liability to Landlord Insurance')"
+OPERATING_EXPENSE_CODES = """(
+    (code >= 6210 AND code < 6521) OR code IN (6561, 6565, 6567, 6564)
+    OR (code >= 6730 AND code < 7611) OR code IN (7626, 7627, 6563)
+)"""
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _to_columnar(conn, csv_path, parquet_path):
+    """Write a cleaned CSV as Parquet with DuckDB, streaming it instead of loading it into pandas.
+
+    Columns are typed as pandas.read_csv would type them for the dashboard: integers, floats,
+    or text (dates stay text; the parsed copy is DATE_COLUMN).
+    """
+    source = "read_csv(?, header = true, auto_type_candidates = ['BIGINT', 'DOUBLE', 'VARCHAR'])"
+    columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source}", [csv_path]).fetchall()]
+    date = (f"TRY_STRPTIME(CAST({_quote('Date')} AS VARCHAR), '%m/%d/%Y')::DATE" if "Date" in columns
+            else "NULL::DATE")
+    # Unique per process and thread; the caller holds the folder lock, this only guards a crashed writer
+    tmp_path = f"{parquet_path}.{os.getpid()}.{threading.get_ident()}.part"
+    conn.execute(
+        f"COPY (SELECT *, row_number() OVER () - 1 AS {ROW_COLUMN}, {date} AS {DATE_COLUMN} FROM {source}) "
+        f"TO '{tmp_path}' (FORMAT parquet, ROW_GROUP_SIZE {ROW_GROUP_SIZE})",
+        [csv_path])
+    os.replace(tmp_path, parquet_path)
+    logging.info(f"Columnar copy of {csv_path}: {parquet_path}")
+
+
+class QueryEngine:
+    """In-process DuckDB layer over the latest cleaned snapshots.
+
+    Each snapshot is converted once to Parquet next to the catalog; queries then read only the
+    columns and row groups they need and return small result sets instead of whole frames.
+    One engine is shared by every session of a Streamlit process; each query uses its own cursor.
+    """
+
+    def __init__(self, folder, region_path=REGION_FILE):
+        self.folder = folder
+        self.columnar_folder = os.path.join(folder, COLUMNAR_FOLDER)
+        os.makedirs(self.columnar_folder, exist_ok=True)
+        self.conn = duckdb.connect()
+        self.lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE regions AS SELECT * FROM read_csv(?, header = true, all_varchar = true)",
+            [region_path],
+        )
+
+    def columnar_path(self, csv_path):
+        """Path of the Parquet copy of `csv_path`, converting it the first time it is asked for."""
+        stat = os.stat(csv_path)
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        name = f"{stem}.{stat.st_mtime_ns}.parquet"
+        parquet_path = os.path.join(self.columnar_folder, name)
+        if os.path.exists(parquet_path):
+            return parquet_path
+
+        # Every worker process converts into the same folder: one conversion at a time, host-wide
+        with self.lock, file_lock(os.path.join(self.columnar_folder, ".lock")):
+            if not os.path.exists(parquet_path):
+                cursor = self.conn.cursor()
+                try:
+                    _to_columnar(cursor, csv_path, parquet_path)
+                finally:
+                    cursor.close()
+                self._retire_superseded(stem)
+        return parquet_path
+
+    def _retire_superseded(self, stem):
+        """Delete copies of older versions of a file (e.g. the cumulative ledger) once their
+        replacement has existed for RETIRE_AFTER_SECONDS, so queries that resolved the old
+        path just before it was replaced, in this or another process, can still read it."""
+        copies = sorted(
+            (int(filename[len(stem) + 1:-len(".parquet")]), os.path.join(self.columnar_folder, filename))
+            for filename in os.listdir(self.columnar_folder)
+            if filename.startswith(stem + ".") and filename.endswith(".parquet")
+            and filename[len(stem) + 1:-len(".parquet")].isdigit()
+        )
+        now = time.time()
+        for (_, path), (_, replacement) in zip(copies, copies[1:]):
+            try:
+                if now - os.path.getmtime(replacement) > RETIRE_AFTER_SECONDS:
+                    os.remove(path)
+                    logging.info(f"Retired columnar copy {path}")
+            except FileNotFoundError:
+                pass
+
+    def latest_paths(self, datasets):
+        with SnapshotCatalog(self.folder) as catalog:
+            return [catalog.latest(dataset) for dataset in datasets]
+
+    def snapshot_version(self, datasets):
+        """Identifies the snapshots a query over `datasets` would read, for result caching."""
+        return tab_cache.dataset_version(*self.latest_paths(datasets))
+
+    def _source(self, datasets):
+        """SQL for the union of the latest snapshot of each dataset, or None if none exist."""
+        paths = self.latest_paths(datasets)
+        parts = [
+            f"SELECT *, {part} AS {PART_COLUMN} FROM read_parquet('{self.columnar_path(path)}')"
+            for part, path in enumerate(paths) if path
+        ]
+        if not parts:
+            return None
+        return "(" + " UNION ALL BY NAME ".join(parts) + ")"
+
+    def _where(self, properties=None, regions=None, start=None, end=None, column_filters=None):
+        clauses, params = [], []
+        if properties:
+            clauses.append('t."Property Name" IN (SELECT UNNEST(?))')
+            params.append(list(properties))
+        if regions:
+            clauses.append('t."Property Name" IN (SELECT "Property Name" FROM regions WHERE "Region" IN (SELECT UNNEST(?)))')
+            params.append(list(regions))
+        if start is not None:
+            clauses.append(f"t.{DATE_COLUMN} >= ?")
+            params.append(pd.Timestamp(start).date())
+        if end is not None:
+            clauses.append(f"t.{DATE_COLUMN} <= ?")
+            params.append(pd.Timestamp(end).date())
+        for column, values in (column_filters or {}).items():
+            if values:
+                clauses.append(f"t.{_quote(column)} IN (SELECT UNNEST(?))")
+                params.append(list(values))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _query(self, sql, params):
+        cursor = self.conn.cursor()
+        try:
+            return cursor.execute(sql, params).df()
+        finally:
+            cursor.close()
+
+    def distinct(self, datasets, column, **filters):
+        """Sorted (case-insensitive) distinct non-null values of `column`, for filter options."""
+        source = self._source(datasets)
+        if source is None:
+            return []
+        where, params = self._where(**filters)
+        if column == "Region":
+            sql = (f'SELECT DISTINCT r."Region" AS value FROM {source} t '
+                   f'JOIN regions r ON t."Property Name" = r."Property Name"{where}')
+        else:
+            sql = f"SELECT DISTINCT t.{_quote(column)} AS value FROM {source} t{where}"
+        values = self._query(sql, params)["value"].dropna().tolist()
+        return sorted(values, key=lambda value: str(value).lower())
+
+    def rows(self, datasets, columns=None, **filters):
+        """Matching rows of the datasets (in file order) with their Region, like a merge on region_list."""
+        source = self._source(datasets)
+        if source is None:
+            return pd.DataFrame(columns=list(columns or []))
+        where, params = self._where(**filters)
+        if columns:
+            select = ", ".join(f"t.{_quote(column)}" for column in columns)
+        else:
+            select = f"t.* EXCLUDE ({', '.join(HIDDEN_COLUMNS)})"
+        sql = (f'SELECT {select}, r."Region" FROM {source} t '
+               f'LEFT JOIN regions r ON t."Property Name" = r."Property Name"{where} '
+               f"ORDER BY t.{PART_COLUMN}, t.{ROW_COLUMN}")
+        return self._query(sql, params)
+
+    def ledger_monthly_summary(self, datasets, by_property=False, **filters):
+        """Monthly rent income, operating income and operating expense from the general ledgers.
+
+        With `by_property`, one row per month and Property Name instead of portfolio totals.
+        """
+        source = self._source(datasets)
+        keys = ["Month", "Property Name"] if by_property else ["Month"]
+        columns = keys + ["Total Rent Income", "Total Operating Income", "Total Operating Expense"]
+        if source is None:
+            return pd.DataFrame(columns=columns)
+        where, params = self._where(**filters)
+        property_select = 'property AS "Property Name",' if by_property else ""
+        property_group = ", property" if by_property else ""
+        sql = f"""
+            WITH gl AS (
+                SELECT
+                    strftime(t.{DATE_COLUMN}, '%Y-%m') AS month,
+                    t."Property Name" AS property,
+                    TRY_CAST(regexp_extract(t."GL Account", '(\\d{{4}})', 1) AS INTEGER) AS code,
+                    t."GL Account" AS account,
+                    ROUND(COALESCE(TRY_CAST(REPLACE(CAST(t."Debit" AS VARCHAR), ',', '') AS DOUBLE), 0), 2) AS debit,
+                    ROUND(COALESCE(TRY_CAST(REPLACE(CAST(t."Credit" AS VARCHAR), ',', '') AS DOUBLE), 0), 2) AS credit
+                FROM {source} t{where}
+            )
+            SELECT
+                month AS "Month",{property_select}
+                COALESCE(SUM(credit - debit) FILTER (WHERE {RENT_INCOME_CODES}), 0) AS "Total Rent Income",
+                COALESCE(SUM(credit - debit) FILTER (WHERE {OPERATING_INCOME_CODES}), 0) AS "Total Operating Income",
+                COALESCE(SUM(debit - credit) FILTER (WHERE {OPERATING_EXPENSE_CODES}), 0) AS "Total Operating Expense"
+            FROM gl
+            WHERE month IS NOT NULL
+              AND ({RENT_INCOME_CODES} OR {OPERATING_INCOME_CODES} OR {OPERATING_EXPENSE_CODES})
+            GROUP BY month{property_group}
+            ORDER BY month{property_group}
+        """
+        return self._query(sql, params)
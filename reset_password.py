@@ -4,10 +4,7 @@ import smtplib
 from email.mime.text import MIMEText
 import yaml
 import uuid
-import datetime
-import os
-
-TOKEN_FILE = "reset_tokens.yaml"
+from token_store import get_token_store
 
 def load_users():
     with open("users.yaml", "r") as f:
@@ -40,36 +37,10 @@ If you didn’t request this, you can ignore this email.
         server.sendmail(from_email, to_email, msg.as_string())
 
 def save_token(email, token):
-    tokens = []
-
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, "r") as f:
-            loaded = yaml.safe_load(f)
-            if loaded and "tokens" in loaded:
-                tokens = loaded["tokens"]
-
-    tokens.append({
-        "email": email,
-        "token": token,
-        "expires": (datetime.datetime.utcnow() + datetime.timedelta(minutes=15)).isoformat()
-    })
-
-    with open(TOKEN_FILE, "w") as f:
-        yaml.safe_dump({"tokens": tokens}, f)
+    get_token_store().save(email, token)
 
 def verify_token(token):
-    if not os.path.exists(TOKEN_FILE):
-        return None
-
-    with open(TOKEN_FILE, "r") as f:
-        tokens = yaml.safe_load(f).get("tokens", [])
-
-    now = datetime.datetime.utcnow()
-    for entry in tokens:
-        if entry["token"] == token:
-            if datetime.datetime.fromisoformat(entry["expires"]) > now:
-                return entry["email"]
-    return None
+    return get_token_store().verify(token)
 
 def update_password(email, new_password):
     users = load_users()
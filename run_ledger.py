@@ -0,0 +1,163 @@
+import argparse
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+RUN_LEDGER_FILENAME = "run_ledger.db"
+# An unfinished run younger than this is resumed; an older one is abandoned and started over
+RESUME_HOURS = float(os.getenv("APPFOLIO_RESUME_HOURS", "12"))
+
+# Report states, in the order a report moves through them
+PENDING, DOWNLOADED, CLEANED, PUBLISHED, FAILED = "pending", "downloaded", "cleaned", "published", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL  -- running, completed, failed or abandoned
+);
+
+CREATE TABLE IF NOT EXISTS reports (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    raw_path TEXT,
+    cleaned_path TEXT,
+    error TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS reports_raw_path ON reports (raw_path);
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class RunLedger:
+    """Checkpoints of each ingestion run: one row per report with its state and attempts.
+
+    A report goes pending -> downloaded -> cleaned -> published (in the snapshot catalog), or
+    to failed once its download attempts are used up. Every step is committed as it happens,
+    so a run that dies part-way can be resumed: reports already published are skipped, and
+    downloaded exports still on disk are cleaned again instead of downloaded again.
+    """
+
+    def __init__(self, folder, db_path=None):
+        self.folder = folder
+        self.db_path = db_path or os.path.join(folder, RUN_LEDGER_FILENAME)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def run(self, run_id=None):
+        """A run's row, the latest run's by default."""
+        if run_id is None:
+            return self.conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+        return self.conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+
+    def start(self, names, resume=True, resume_hours=RESUME_HOURS):
+        """Return the id of the run to work on: the latest unfinished run if it is recent enough
+        (with any report new to the plan added as pending), otherwise a new run."""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            run = self.conn.execute(
+                "SELECT * FROM runs WHERE status IN ('running', 'failed') ORDER BY id DESC LIMIT 1").fetchone()
+            cutoff = (datetime.now() - timedelta(hours=resume_hours)).isoformat(timespec="seconds")
+            if run is not None and resume and run["started_at"] >= cutoff:
+                run_id = run["id"]
+                self.conn.execute("UPDATE runs SET status = 'running', finished_at = NULL WHERE id = ?", (run_id,))
+                logging.info(f"[INFO] Resuming ingestion run {run_id} started at {run['started_at']}")
+            else:
+                if run is not None:
+                    self.conn.execute("UPDATE runs SET status = 'abandoned', finished_at = ? WHERE id = ?",
+                                      (_now(), run["id"]))
+                run_id = self.conn.execute("INSERT INTO runs (started_at, status) VALUES (?, 'running')",
+                                           (_now(),)).lastrowid
+                logging.info(f"[INFO] Started ingestion run {run_id}")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO reports (run_id, name, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(run_id, name, PENDING, _now()) for name in names])
+        return run_id
+
+    def reports(self, run_id):
+        """{report name: row} of a run."""
+        return {row["name"]: row for row in
+                self.conn.execute("SELECT * FROM reports WHERE run_id = ? ORDER BY name", (run_id,))}
+
+    def report_for(self, run_id, raw_path):
+        """Name of the run's report whose export is `raw_path`, or None."""
+        row = self.conn.execute("SELECT name FROM reports WHERE run_id = ? AND raw_path = ?",
+                                (run_id, raw_path)).fetchone()
+        return row["name"] if row else None
+
+    def attempt(self, run_id, name):
+        """Count a download attempt and return how many have been made."""
+        with self.conn:
+            self.conn.execute("UPDATE reports SET attempts = attempts + 1, updated_at = ? WHERE run_id = ? AND name = ?",
+                              (_now(), run_id, name))
+        return self.conn.execute("SELECT attempts FROM reports WHERE run_id = ? AND name = ?",
+                                 (run_id, name)).fetchone()["attempts"]
+
+    def mark(self, run_id, name, state, error=None, **paths):
+        """Move a report to `state`, optionally setting raw_path/cleaned_path. `error` replaces the
+        last error (None clears it)."""
+        columns = {"state": state, "error": error, "updated_at": _now(),
+                   **{column: paths[column] for column in ("raw_path", "cleaned_path") if column in paths}}
+        with self.conn:
+            self.conn.execute(
+                f"UPDATE reports SET {', '.join(f'{column} = ?' for column in columns)} WHERE run_id = ? AND name = ?",
+                (*columns.values(), run_id, name))
+        logging.info(f"[INFO] Run {run_id}: {name} {state}" + (f" ({error})" if error else ""))
+
+    def finish(self, run_id):
+        """Close the run: completed if every report is published, else failed (and resumable).
+        Returns the reports that did not get published."""
+        # A downloaded report without a raw path was handed to the download watcher
+        unfinished = [row for row in self.reports(run_id).values()
+                      if row["state"] != PUBLISHED and not (row["state"] == DOWNLOADED and row["raw_path"] is None)]
+        with self.conn:
+            self.conn.execute("UPDATE runs SET status = ?, finished_at = ? WHERE id = ?",
+                              ("failed" if unfinished else "completed", _now(), run_id))
+        return unfinished
+
+    def abandon(self, run_id):
+        """Mark a run so that the next ingestion starts over instead of resuming it."""
+        with self.conn:
+            self.conn.execute("UPDATE runs SET status = 'abandoned', finished_at = ? WHERE id = ?", (_now(), run_id))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the checkpoints of ingestion runs.")
+    parser.add_argument("--folder", default=os.path.join(os.getcwd(), "data"), help="Data folder holding the run ledger")
+    commands = parser.add_subparsers(dest="command", required=True)
+    status_parser = commands.add_parser("status", help="Print each report's state in a run")
+    status_parser.add_argument("--run", type=int, help="Run id (default: the latest run)")
+    commands.add_parser("abandon", help="Make the next ingestion start over instead of resuming the latest run")
+    args = parser.parse_args()
+
+    with RunLedger(args.folder) as ledger:
+        run = ledger.run(getattr(args, "run", None))
+        if run is None:
+            parser.error("no ingestion run recorded")
+        if args.command == "status":
+            print(f"Run {run['id']}: {run['status']}, started {run['started_at']}, finished {run['finished_at'] or '-'}")
+            for name, row in ledger.reports(run["id"]).items():
+                print(f"  {name:<20} {row['state']:<11} attempts={row['attempts']} {row['error'] or ''}")
+        elif args.command == "abandon":
+            ledger.abandon(run["id"])
+            print(f"[INFO] Run {run['id']} abandoned; the next ingestion starts over")
@@ -0,0 +1,161 @@
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import time
+import urllib.request
+
+RUN_FOLDER = os.path.join("deploy", "run")
+
+# Sessions stick to one worker through a cookie: the first request is routed by its request id,
+# which is then handed back as the cookie, so later requests (and the websocket) hash the same way.
+# Client IP stickiness would send a whole office behind one NAT address to a single worker.
+NGINX_TEMPLATE = """\
+worker_processes auto;
+pid {run_folder}/nginx.pid;
+error_log {run_folder}/nginx-error.log;
+
+events {{
+    worker_connections 1024;
+}}
+
+http {{
+    access_log {run_folder}/nginx-access.log;
+    client_body_temp_path {run_folder}/client_body;
+    proxy_temp_path {run_folder}/proxy;
+    fastcgi_temp_path {run_folder}/fastcgi;
+    uwsgi_temp_path {run_folder}/uwsgi;
+    scgi_temp_path {run_folder}/scgi;
+
+    map $cookie_appfolio_worker $sticky_key {{
+        ""      $request_id;
+        default $cookie_appfolio_worker;
+    }}
+
+    map $cookie_appfolio_worker $sticky_cookie {{
+        ""      "appfolio_worker=$request_id; Path=/; HttpOnly; SameSite=Lax";
+        default "";
+    }}
+
+    map $http_upgrade $connection_upgrade {{
+        default upgrade;
+        ""      close;
+    }}
+
+    upstream streamlit_workers {{
+        hash $sticky_key consistent;
+{servers}
+    }}
+
+    server {{
+        listen {proxy_port};
+
+        location / {{
+            proxy_pass http://streamlit_workers;
+            proxy_http_version 1.1;
+            proxy_set_header Host $host;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+            proxy_set_header X-Real-IP $remote_addr;
+            proxy_set_header Upgrade $http_upgrade;
+            proxy_set_header Connection $connection_upgrade;
+            proxy_read_timeout 86400;
+            add_header Set-Cookie $sticky_cookie;
+        }}
+    }}
+}}
+"""
+
+
+def worker_ports(workers, base_port):
+    return [base_port + i for i in range(workers)]
+
+
+def write_nginx_config(ports, proxy_port, run_folder=RUN_FOLDER):
+    """Render the reverse-proxy config for `ports` and return its path."""
+    run_folder = os.path.abspath(run_folder)
+    os.makedirs(run_folder, exist_ok=True)
+    servers = "\n".join(f"        server 127.0.0.1:{port};" for port in ports)
+    path = os.path.join(run_folder, "nginx.conf")
+    with open(path, "w") as f:
+        f.write(NGINX_TEMPLATE.format(run_folder=run_folder, servers=servers, proxy_port=proxy_port))
+    return path
+
+
+def start_worker(app, port):
+    # The console script, not `python -m streamlit`: this repo's streamlit.py would shadow the package
+    command = [
+        "streamlit", "run", app,
+        "--server.port", str(port),
+        "--server.address", "127.0.0.1",
+        "--server.headless", "true",
+    ]
+    return subprocess.Popen(command)
+
+
+def wait_until_healthy(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_proxy(config_path):
+    if shutil.which("nginx") is None:
+        print(f"[WARNING] nginx not found; start it yourself with: nginx -c {config_path}")
+        return None
+    return subprocess.Popen(["nginx", "-c", config_path, "-g", "daemon off;"])
+
+
+def serve(app="login.py", workers=None, base_port=8601, proxy_port=8501):
+    """Run `workers` Streamlit processes behind nginx until interrupted; return the processes."""
+    workers = workers or os.cpu_count() or 1
+    ports = worker_ports(workers, base_port)
+    processes = [start_worker(app, port) for port in ports]
+    for port in ports:
+        if wait_until_healthy(port):
+            print(f"[INFO] Worker on port {port} is up")
+        else:
+            print(f"[ERROR] Worker on port {port} did not become healthy")
+
+    config_path = write_nginx_config(ports, proxy_port)
+    proxy = start_proxy(config_path)
+    if proxy is not None:
+        processes.append(proxy)
+        print(f"[INFO] Serving {app} on http://localhost:{proxy_port} with {workers} workers")
+    return processes
+
+
+def stop(processes):
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the dashboard as several Streamlit workers behind nginx.")
+    parser.add_argument("app", nargs="?", default="login.py", help="Streamlit script to serve")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--base-port", type=int, default=8601, help="Port of the first worker")
+    parser.add_argument("--proxy-port", type=int, default=8501, help="Port the proxy listens on")
+    args = parser.parse_args()
+
+    processes = serve(args.app, args.workers, args.base_port, args.proxy_port)
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop(processes)
@@ -0,0 +1,140 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+from file_lock import file_lock
+
+# tmpfs, so mapped pages are shared by every process on the host instead of copied per session
+SHM_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+DEFAULT_FOLDER = os.path.join(SHM_ROOT, "appfolio_datasets")
+
+
+def slot_prefix(key):
+    """File name prefix of a dataset slot's shared files: 'Rent Roll' -> 'rent_roll--'."""
+    return re.sub(r"[^0-9a-z]+", "_", key.lower()).strip("_") + "--"
+
+
+def shared_name(csv_path, key=None):
+    """Arrow file name for one version of a snapshot: '[<slot>--]<csv stem>.<mtime_ns>.arrow'.
+
+    Snapshot stems carry their export timestamp, so the slot prefix is what ties a new
+    snapshot's file to the ones it replaces.
+    """
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return f"{slot_prefix(key) if key else ''}{stem}.{os.stat(csv_path).st_mtime_ns}.arrow"
+
+
+def write_ipc(df, path):
+    """Write a DataFrame as an Arrow IPC file, atomically."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = path + f".{os.getpid()}.part"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def map_ipc(path):
+    """Memory-map an Arrow IPC file; the returned table's buffers point into the shared pages."""
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+class SharedDatasetStore:
+    """Publishes each snapshot once as Arrow IPC in shared memory and maps it zero-copy.
+
+    Every Streamlit process on the host maps the same file, and every session in a process
+    shares one DataFrame view of it (string columns stay Arrow-backed, so `.copy()` in a tab
+    doesn't duplicate them). When a newer version of a dataset is loaded the older file is
+    unlinked; processes and sessions still holding it keep a valid mapping until they let go,
+    and the kernel frees the pages when the last reference is dropped.
+    """
+
+    def __init__(self, folder=DEFAULT_FOLDER):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+        self.frames = {}  # dataset slot -> (shared file name, DataFrame)
+        self.lock = threading.Lock()
+
+    def _publish_lock(self):
+        # Serialises publishing across processes so a snapshot is converted only once
+        return file_lock(os.path.join(self.folder, ".lock"))
+
+    def publish(self, csv_path, key=None):
+        """Make sure the current version of `csv_path` is in shared memory; return its path.
+
+        With a dataset slot `key`, files of other snapshots in that slot are retired.
+        """
+        name = shared_name(csv_path, key)
+        path = os.path.join(self.folder, name)
+        if os.path.exists(path):
+            return path
+
+        with self._publish_lock():
+            if not os.path.exists(path):
+                write_ipc(pd.read_csv(csv_path), path)
+                logging.info(f"Published {csv_path} to shared memory: {path}")
+                if key:
+                    self._unlink_older(key, name)
+        return path
+
+    def _unlink_older(self, key, name):
+        prefix = slot_prefix(key)
+        for filename in os.listdir(self.folder):
+            if filename != name and filename.startswith(prefix) and filename.endswith(".arrow"):
+                self._retire(filename)
+
+    def frame(self, csv_path, key=None):
+        """Shared read-only DataFrame for the current version of `csv_path`.
+
+        `key` names the dataset slot (e.g. "Rent Roll"); when it is asked for with a newer
+        snapshot the old view is swapped out and its shared file retired. Callers must
+        `.copy()` before modifying the frame, as the dashboard tabs already do.
+        """
+        name = shared_name(csv_path, key)
+        slot = key or csv_path
+        with self.lock:
+            cached = self.frames.get(slot)
+            if cached and cached[0] == name:
+                return cached[1]
+
+        df = map_ipc(self.publish(csv_path, key)).to_pandas(split_blocks=True)
+        with self.lock:
+            previous = self.frames.get(slot)
+            # Swapping drops this process's reference to the old mapping
+            self.frames[slot] = (name, df)
+        if previous and previous[0] != name:
+            self._retire(previous[0])
+        return df
+
+    def _retire(self, name):
+        # Other processes' mappings stay valid after unlink; the pages go when the last one closes
+        try:
+            os.remove(os.path.join(self.folder, name))
+            logging.info(f"Retired shared snapshot {name}")
+        except FileNotFoundError:
+            pass
+
+    def release(self, key=None):
+        """Drop this process's views of one dataset slot (or all of them)."""
+        with self.lock:
+            if key is None:
+                self.frames.clear()
+            else:
+                self.frames.pop(key, None)
+
+    def gc(self, keep_paths=()):
+        """Remove shared files that aren't the current version of any of `keep_paths`, in any slot."""
+        keep = {shared_name(path) for path in keep_paths if os.path.exists(path)}
+        removed = []
+        with self._publish_lock():
+            for filename in os.listdir(self.folder):
+                if filename.endswith(".arrow") and filename.split("--", 1)[-1] not in keep:
+                    os.remove(os.path.join(self.folder, filename))
+                    removed.append(filename)
+        return removed
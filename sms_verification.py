@@ -0,0 +1,234 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CODE_PATTERN = re.compile(r"\b\d{6}\b")  # AppFolio sends a 6-digit code
+
+
+def parse_retry_after(value, now=None):
+    """Convert a Retry-After header (seconds or HTTP date) into seconds to wait."""
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class TokenBucket:
+    """Simple thread-safe token bucket: `rate` tokens per second, up to `capacity`."""
+
+    def __init__(self, rate=1.0, capacity=2, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def drain(self, seconds):
+        """Empty the bucket so the next token is only available after `seconds`."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class SimpleTextingBackend:
+    """Reads the newest message from the SimpleTexting API over one keep-alive session."""
+
+    def __init__(self, api_url, api_token, account_phone, session=None, bucket=None,
+                 max_retries=5, backoff_base=1.0, backoff_cap=30.0, timeout=10, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.api_url = api_url
+        self.account_phone = account_phone
+        self.bucket = bucket or TokenBucket(rate=1.0, capacity=2)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        session.headers.update({"Authorization": f"Bearer {api_token}", "Accept": "application/json"})
+        self.session = session
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before the next attempt, preferring the server's Retry-After."""
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap)
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)  # jitter so retries don't line up
+
+    def latest_message(self, time_budget=None):
+        """Fetch the latest message, retrying 429/5xx and network errors with backoff.
+
+        With a `time_budget` (seconds), gives up instead of starting a wait or request that
+        would end after it, so a caller's own timeout holds.
+        """
+        params = {"page": 0, "size": 1, "accountPhone": self.account_phone}
+        deadline = None if time_budget is None else self.clock() + time_budget
+
+        for attempt in range(self.max_retries):
+            self.bucket.acquire()
+            timeout = self.timeout if deadline is None else min(self.timeout, deadline - self.clock())
+            if timeout <= 0:
+                break
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=timeout)
+            except requests.RequestException as e:
+                delay = self._backoff(attempt)
+                if not self._can_retry(attempt, delay, deadline):
+                    print(f"API Error: {e}")
+                    logging.info(f"API Error: {e}")
+                    break
+                print(f"API Error: {e}. Retrying in {delay:.1f}s")
+                logging.info(f"API Error: {e}. Retrying in {delay:.1f}s")
+                self.sleep(delay)
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                delay = self._backoff(attempt, response)
+                if not self._can_retry(attempt, delay, deadline):
+                    print(f"SimpleTexting returned {response.status_code}.")
+                    logging.info(f"SimpleTexting returned {response.status_code}.")
+                    break
+                print(f"SimpleTexting returned {response.status_code}. Waiting {delay:.1f}s before retrying...")
+                logging.info(f"SimpleTexting returned {response.status_code}. Waiting {delay:.1f}s before retrying...")
+                self.bucket.drain(delay)  # the next acquire() waits out the delay
+                continue
+
+            try:
+                response.raise_for_status()
+                messages = response.json().get("content", [])
+            except (requests.RequestException, ValueError) as e:
+                print(f"API Error: {e}")
+                logging.info(f"API Error: {e}")
+                return None
+            return messages[0] if messages else None
+
+        print("Failed to retrieve messages after multiple attempts.")
+        logging.info("Failed to retrieve messages after multiple attempts.")
+        return None
+
+    def _can_retry(self, attempt, delay, deadline):
+        # No wait after the last attempt (it would only delay the next caller), nor past the deadline
+        if attempt == self.max_retries - 1:
+            return False
+        return deadline is None or self.clock() + delay < deadline
+
+    def close(self):
+        self.session.close()
+
+
+class FakeSmsBackend:
+    """In-memory backend for tests and offline runs; push messages, read the newest."""
+
+    def __init__(self, messages=None):
+        self.messages = list(messages or [])
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def push(self, text, message_id=None):
+        with self.lock:
+            message_id = message_id or f"fake-{len(self.messages) + 1}"
+            self.messages.append({"id": message_id, "text": text})
+            return message_id
+
+    def latest_message(self, time_budget=None):
+        with self.lock:
+            self.calls += 1
+            return dict(self.messages[-1]) if self.messages else None
+
+    def close(self):
+        pass
+
+
+class VerificationCodeProvider:
+    """Waits for a new 2FA code using whichever backend it was given."""
+
+    def __init__(self, backend, timeout=30, poll_interval=0.5, max_poll_interval=3.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.backend = backend
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.clock = clock
+        self.sleep = sleep
+
+    def get_latest_message(self):
+        return self.backend.latest_message(time_budget=self.timeout)
+
+    def latest_message_id(self):
+        message = self.backend.latest_message(time_budget=self.timeout)
+        return message["id"] if message else None
+
+    def wait_for_new_code(self, previous_message_id):
+        """Poll until a message newer than `previous_message_id` carries a code."""
+        deadline = self.clock() + self.timeout
+        interval = self.poll_interval
+
+        while self.clock() < deadline:
+            # The backend's retries count against this deadline too
+            message = self.backend.latest_message(time_budget=max(0.0, deadline - self.clock()))
+            if message and message["id"] != previous_message_id:
+                match = CODE_PATTERN.search(message.get("text") or "")
+                if match:
+                    return match.group(0)
+            self.sleep(min(interval, max(0.0, deadline - self.clock())))
+            interval = min(self.max_poll_interval, interval * 1.5)
+
+        print(" Failed to retrieve a new verification code within the time limit.")
+        logging.info(" Failed to retrieve a new verification code within the time limit.")
+        return None
+
+
+def build_provider(backend_name=None):
+    """Create a provider from env settings. SMS_CODE_BACKEND=fake selects the offline backend."""
+    backend_name = (backend_name or os.getenv("SMS_CODE_BACKEND", "simpletexting")).lower()
+    if backend_name == "fake":
+        backend = FakeSmsBackend()
+    else:
+        backend = SimpleTextingBackend(
+            api_url=os.getenv("SIMPLE_TEXTING_API_URL"),
+            api_token=os.getenv("SIMPLE_TEXTING_API_TOKEN"),
+            account_phone=os.getenv("SIMPLE_TEXTING_ACCOUNT_PHONE"),
+        )
+    return VerificationCodeProvider(backend)
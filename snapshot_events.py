@@ -0,0 +1,266 @@
+import argparse
+import logging
+import os
+import sqlite3
+from datetime import date, datetime
+
+import pandas as pd
+
+from catalog import SnapshotCatalog, parse_snapshot_name
+from unit_history import DELINQUENT_PAST_DUE
+
+EVENTS_FILENAME = "events.db"
+KEY_COLUMNS = ["Property Name", "Unit"]
+
+# Datasets that are diffed unit by unit, and the columns whose changes are tracked
+TRACKED_COLUMNS = {
+    "rentroll": ["Tenant", "Status", "Rent", "Past Due"],
+    "tenant_data": ["Tenant", "Status", "Rent", "Move-in", "Move-out", "Lease To"],
+}
+
+EVENT_TYPES = ("unit_added", "unit_removed", "move_in", "move_out", "status_change", "rent_change", "new_delinquency")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    property TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    event TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    snapshot TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_trend ON events (dataset, event, as_of);
+CREATE INDEX IF NOT EXISTS events_unit ON events (dataset, property, unit);
+
+-- Last seen values of every unit, so a new snapshot is only compared on the rows that changed
+CREATE TABLE IF NOT EXISTS unit_state (
+    dataset TEXT NOT NULL,
+    property TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    row_hash INTEGER NOT NULL,
+    "values" TEXT NOT NULL,
+    PRIMARY KEY (dataset, property, unit)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS diffed_snapshots (
+    dataset TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+SEPARATOR = "\x1f"  # joins a unit's tracked values in unit_state
+
+
+def is_blank(value):
+    return value is None or value == "" or value == "nan"
+
+
+def money(value):
+    """'$1,234.00' -> 1234.0 for a single cell; None when blank or unparseable."""
+    if is_blank(value):
+        return None
+    try:
+        return float(value.replace("$", "").replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def read_units(path, columns):
+    """Tracked columns of a snapshot, one row per unit, as strings keyed by (Property Name, Unit)."""
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [column for column in columns if column in header]
+    df = pd.read_csv(path, usecols=KEY_COLUMNS + columns, dtype=str, keep_default_na=False)
+    df = df[(df["Property Name"] != "") & (df["Unit"] != "")]
+    df = df.drop_duplicates(subset=KEY_COLUMNS, keep="last").set_index(KEY_COLUMNS)
+    return df, columns
+
+
+def unit_changes(old, new, columns):
+    """Events for one unit whose tracked values changed: (event, old value, new value) tuples."""
+    old = dict(zip(columns, old))
+    new = dict(zip(columns, new))
+    changes = []
+    if "Tenant" in new and old.get("Tenant") != new["Tenant"]:
+        if not is_blank(old.get("Tenant")):
+            changes.append(("move_out", old["Tenant"], new["Tenant"]))
+        if not is_blank(new["Tenant"]):
+            changes.append(("move_in", old.get("Tenant"), new["Tenant"]))
+    if "Status" in new and old.get("Status") != new["Status"]:
+        changes.append(("status_change", old.get("Status"), new["Status"]))
+    if "Rent" in new:
+        old_rent, new_rent = money(old.get("Rent")), money(new["Rent"])
+        if old_rent is not None and new_rent is not None and old_rent != new_rent:
+            changes.append(("rent_change", old["Rent"], new["Rent"]))
+    if "Past Due" in new:
+        old_due, new_due = money(old.get("Past Due")) or 0, money(new["Past Due"]) or 0
+        if old_due <= DELINQUENT_PAST_DUE < new_due:
+            changes.append(("new_delinquency", old.get("Past Due"), new["Past Due"]))
+    return changes
+
+
+class EventLog:
+    """Append-only log of unit events (move-ins, move-outs, status, rent and delinquency changes).
+
+    Each new snapshot of a tracked dataset is diffed against the unit state left by the previous
+    one. Rows are compared by hash first, so the per-unit comparison, the events written and the
+    state updated are all proportional to what changed since the last snapshot.
+    """
+
+    def __init__(self, folder, db_path=None):
+        self.folder = folder
+        self.db_path = db_path or os.path.join(folder, EVENTS_FILENAME)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def record(self, path, dataset, as_of, created_at):
+        """Diff a snapshot against the previous one of its dataset and append the events.
+
+        Returns the number of events written, or None when the snapshot was skipped (untracked
+        dataset, or not newer than the last snapshot diffed).
+        """
+        if dataset not in TRACKED_COLUMNS:
+            return None
+        with self.conn:
+            # Cleaner processes publish concurrently; diffs of the log run one at a time
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self._record(path, dataset, str(as_of), str(created_at))
+
+    def _record(self, path, dataset, as_of, created_at):
+        last = self.conn.execute("SELECT * FROM diffed_snapshots WHERE dataset = ?", (dataset,)).fetchone()
+        if last and (as_of, created_at) <= (last["as_of"], last["created_at"]):
+            logging.info(f"Not diffing {path}: {dataset} already diffed up to {last['as_of']}")
+            return None
+
+        units, columns = read_units(path, TRACKED_COLUMNS[dataset])
+        new_hashes = pd.util.hash_pandas_object(units, index=False).astype("int64")
+        old_hashes = pd.Series(
+            {(row["property"], row["unit"]): row["row_hash"] for row in
+             self.conn.execute("SELECT property, unit, row_hash FROM unit_state WHERE dataset = ?", (dataset,))},
+            dtype="int64",
+        )
+        seeding = last is None
+
+        added = new_hashes.index.difference(old_hashes.index)
+        removed = old_hashes.index.difference(new_hashes.index)
+        common = new_hashes.index.intersection(old_hashes.index)
+        changed = common[new_hashes[common].to_numpy() != old_hashes[common].to_numpy()]
+
+        touched = added.append(changed)
+        new_values = dict(zip(touched, map(list, units.loc[touched].itertuples(index=False))))
+        events = []
+        for key in changed:
+            old_values = self.conn.execute(
+                'SELECT "values" FROM unit_state WHERE dataset = ? AND property = ? AND unit = ?', (dataset, *key)
+            ).fetchone()["values"].split(SEPARATOR)
+            for event, old, new in unit_changes(old_values, new_values[key], columns):
+                events.append((dataset, as_of, *key, event, old, new, path))
+        if not seeding:
+            events += [(dataset, as_of, *key, "unit_added", None, None, path) for key in added]
+            events += [(dataset, as_of, *key, "unit_removed", None, None, path) for key in removed]
+
+        upserts = [
+            (dataset, *key, int(hash_), SEPARATOR.join(new_values[key]))
+            for key, hash_ in new_hashes[touched].items()
+        ]
+        self.conn.executemany(
+            "INSERT INTO events (dataset, as_of, property, unit, event, old_value, new_value, snapshot) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", events)
+        self.conn.executemany(
+            'INSERT INTO unit_state (dataset, property, unit, row_hash, "values") VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(dataset, property, unit) DO UPDATE SET row_hash = excluded.row_hash, "values" = excluded."values"',
+            upserts)
+        self.conn.executemany(
+            "DELETE FROM unit_state WHERE dataset = ? AND property = ? AND unit = ?",
+            [(dataset, *key) for key in removed])
+        self.conn.execute(
+            "INSERT INTO diffed_snapshots (dataset, path, as_of, created_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(dataset) DO UPDATE SET path = excluded.path, as_of = excluded.as_of, "
+            "created_at = excluded.created_at",
+            (dataset, path, as_of, created_at))
+
+        action = "Seeded unit state from" if seeding else "Diffed"
+        logging.info(f"{action} {dataset} as of {as_of}: {len(changed)} changed, {len(added)} added, "
+                     f"{len(removed)} removed units, {len(events)} events")
+        return len(events)
+
+    def replay(self, catalog):
+        """Diff every catalogued snapshot of the tracked datasets, oldest first, that isn't in the log yet."""
+        written = 0
+        for dataset in TRACKED_COLUMNS:
+            for row in reversed(catalog.snapshots(dataset)):
+                if os.path.exists(row["path"]):
+                    written += self.record(row["path"], dataset, row["as_of"], row["created_at"]) or 0
+        return written
+
+    def events(self, dataset, event=None, since=None, properties=None):
+        """Logged events as a DataFrame, optionally of one type, from a date, for some properties."""
+        query = "SELECT as_of, property, unit, event, old_value, new_value FROM events WHERE dataset = ?"
+        params = [dataset]
+        if event:
+            query += " AND event = ?"
+            params.append(event)
+        if since:
+            query += " AND as_of >= ?"
+            params.append(since.isoformat() if isinstance(since, date) else since)
+        df = pd.read_sql_query(query + " ORDER BY as_of, id", self.conn, params=params)
+        df.columns = ["As Of", "Property Name", "Unit", "Event", "Old", "New"]
+        if properties is not None:
+            df = df[df["Property Name"].isin(properties)]
+        return df
+
+    def monthly_counts(self, dataset, events=EVENT_TYPES, properties=None):
+        """Events per month and type: the log's answer to trend charts, with no snapshot scan."""
+        query = (
+            "SELECT substr(as_of, 1, 7) AS month, event, property, COUNT(*) AS n FROM events "
+            f"WHERE dataset = ? AND event IN ({', '.join('?' * len(events))}) GROUP BY month, event, property"
+        )
+        df = pd.read_sql_query(query, self.conn, params=[dataset, *events])
+        if properties is not None:
+            df = df[df["property"].isin(properties)]
+        counts = df.pivot_table(index="month", columns="event", values="n", aggfunc="sum", fill_value=0)
+        return counts.reindex(columns=list(events), fill_value=0).rename_axis("Month").rename_axis(None, axis=1)
+
+
+def record_snapshot_events(path):
+    """Append the events of a freshly published snapshot to the log in its folder."""
+    dataset, as_of, created_at = parse_snapshot_name(path)
+    if dataset not in TRACKED_COLUMNS:
+        return None
+    folder = os.path.dirname(os.path.abspath(path))
+    created_at = created_at or datetime.fromtimestamp(os.stat(path).st_mtime)
+    as_of = as_of or created_at.date()
+    with EventLog(folder) as log:
+        return log.record(os.path.abspath(path), dataset, as_of.isoformat(), created_at.isoformat(timespec="seconds"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and inspect the unit event log diffed from snapshots.")
+    parser.add_argument("--folder", default=os.path.join(os.getcwd(), "data"), help="Data folder holding the snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("replay", help="Diff catalogued snapshots not yet in the log, oldest first")
+    summary_parser = commands.add_parser("summary", help="Print monthly event counts")
+    summary_parser.add_argument("dataset", choices=sorted(TRACKED_COLUMNS))
+    args = parser.parse_args()
+
+    with EventLog(args.folder) as log:
+        if args.command == "replay":
+            with SnapshotCatalog(args.folder) as catalog:
+                print(f"[INFO] Logged {log.replay(catalog)} events")
+        elif args.command == "summary":
+            print(log.monthly_counts(args.dataset).to_string())
@@ -2,12 +2,13 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
-import plotly.io as pio
 import plotly.graph_objects as go
 import json
 import os
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+from catalog import latest_snapshots
+from period_comparison import comparison_table
+from metric_registry import evaluate_metrics
+import tab_cache
 
 # Set page layout
 st.set_page_config(page_title="Appfolio Dashboards", layout="wide")
@@ -21,50 +22,18 @@ except ImportError:
 BASE_DIR = os.path.join(os.getcwd(), "data")  # Use relative path
 IMG_DIR = "plotly_pdf_images"
 st.title("📊 Appfolio Dashboards")
-# Define file prefixes
-file_prefixes = {
-    "Tenant Data": "tenant_data_cleaned",
-    "Work Orders": "work_order_cleaned",
-    "Vacancies": "vacancy_cleaned",
-    "T_rent": "t_rent_cleaned",
-    "Beg Year": "beg_year_cleaned",
-    "Sameday": "same_day_cleaned",
+# Catalog dataset behind each category
+datasets = {
+    "Tenant Data": "tenant_data",
+    "Work Orders": "work_order",
+    "Vacancies": "vacancy",
+    "T_rent": "t_rent",
+    "Beg Year": "beg_year",
+    "Sameday": "same_day",
 }
 
-# Initialize a dictionary to store the latest file for each category
-latest_files = {}
-
-# List all files in the BASE_DIR
-files_in_directory = os.listdir(BASE_DIR)
-
-# Function to extract date from the filename
-def extract_timestamp_from_filename(filename):
-    """
-    Extracts datetime object from filenames like 'tenant_data_cleaned_20250321_115751.csv'
-    """
-    try:
-        # Extract the last two underscore-separated parts before .csv
-        parts = filename.rsplit("_", 2)  # ['tenant_data_cleaned', '20250321', '115751.csv']
-        if len(parts) < 3:
-            raise ValueError("Invalid filename format")
-        
-        date_str, time_str = parts[-2], parts[-1].split(".")[0]  # Get YYYYMMDD and HHMMSS
-
-        # Convert to datetime object
-        return datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
-    except ValueError as e:
-        print(f"Error parsing date from {filename}: {e}")
-        return datetime.min  # Return a minimal datetime to avoid crashing
-
-# Iterate through each category and find the latest file
-for category, prefix in file_prefixes.items():
-    # Filter files based on the prefix
-    relevant_files = [f for f in files_in_directory if f.startswith(prefix) and f.endswith(".csv")]
-    
-    if relevant_files:
-        # Sort the files by timestamp extracted from their filenames in descending order (latest first)
-        latest_file = max(relevant_files, key=extract_timestamp_from_filename)
-        latest_files[category] = os.path.join(BASE_DIR, latest_file)
+# Look up the newest snapshot of each dataset in the catalog (data/catalog.db)
+latest_files = {category: path for category, path in latest_snapshots(BASE_DIR, datasets).items() if path}
 
 # Print the latest files for each category
 for category, file_path in latest_files.items():
@@ -86,6 +55,16 @@ for name, path in FILES.items():
         dfs[name] = pd.read_csv(path)
     else:
         st.warning(f"⚠️ File not found: {path}")
+
+# Headline metrics for the cards and metrics.json, evaluated once from the metric registry
+headline = evaluate_metrics(
+    {"units": dfs.get("Tenant Data"), "tenant_data": dfs.get("Tenant Data"),
+     "work_orders": dfs.get("Work Orders"), "vacancies": dfs.get("Vacancies")},
+    ["total_units", "occupancy_rate", "total_rent", "recorded_move_outs",
+     "total_work_orders", "new_work_orders", "urgent_work_orders", "work_order_amount",
+     "total_vacancy", "rent_ready_units", "vacancy_move_ins", "avg_days_vacant"],
+    tab_cache.dataset_version(FILES["Tenant Data"], FILES["Work Orders"], FILES["Vacancies"]),
+)
 # Create folder for images
 IMG_DIR = "plotly_images"
 os.makedirs(IMG_DIR, exist_ok=True)
@@ -99,27 +78,16 @@ if dfs:
 with tab1:
     col1, col2, col3, col4 = st.columns(4)
     
-    # Filter rows where Status == 'Current' and count them
-    current = dfs["Tenant Data"][dfs["Tenant Data"]["Status"] == "Current"].shape[0]
-    unrented = dfs["Tenant Data"][dfs["Tenant Data"]["Status"] == "Notice-Unrented"].shape[0]
-    vacant_units = dfs["Tenant Data"][dfs["Tenant Data"]["Status"] == "Notice-Rented"].shape[0]
-    current_units = current+unrented+vacant_units
-    # Count total rows (all units)
-    all_units = dfs["Tenant Data"].shape[0]
-
-    # Calculate occupancy percentage
-    occupied = (current_units / all_units) * 100
-    
+    all_units = headline["total_units"]
+    occupied = headline["occupancy_rate"]
+    total_rent = headline["total_rent"]
+    total_move_out = headline["recorded_move_outs"]
+
     dfs["Tenant Data"]["Rent"] = dfs["Tenant Data"]["Rent"].replace("[\$,]", "", regex=True)  # Remove $ and ,
     dfs["Tenant Data"]["Rent"] = pd.to_numeric(dfs["Tenant Data"]["Rent"], errors="coerce")  # Convert to number
     dfs["Tenant Data"]["Market Rent"] = dfs["Tenant Data"]["Market Rent"].replace("[\$,]", "", regex=True)  # Remove $ and ,
     dfs["Tenant Data"]["Market Rent"] = pd.to_numeric(dfs["Tenant Data"]["Market Rent"], errors="coerce")  # Convert to number
 
-    # Calculate total rent
-    total_rent = dfs["Tenant Data"]["Rent"].sum()
-    market_total_rent = dfs["Tenant Data"]["Market Rent"].sum()
-    total_move_out = dfs["Tenant Data"]["Move-out"].notnull().sum()
-
     # Display the metric card
     col1.metric(label="🏠Total Unit", value=f"{all_units}")
     col2.metric(label="📊 Occupancy Rate", value=f"{occupied:.2f}%")
@@ -131,218 +99,16 @@ with tab1:
 
     with col5:
 
-        tenant_df = dfs["Tenant Data"]  # Ensure the correct dataset key
-        tenant_df["Rent"] = pd.to_numeric(tenant_df["Rent"], errors="coerce")
-        total_units = tenant_df.groupby("BD/BA").size()
-        occupied_units = tenant_df[tenant_df["Status"].isin(["Current", "Notice-Unrented", "Notice-Rented"])].groupby("BD/BA").size()
-        bd_ba_summary = pd.DataFrame({
-            "Total_Rent": tenant_df.groupby("BD/BA")["Rent"].sum(),
-            "Total_Units": total_units,
-            "Occupied_Units": occupied_units
-        }).fillna(0)  # Fill NaN for BD/BA groups without occupied units
-
-        bd_ba_summary["Occupancy_Rate"] = (bd_ba_summary["Occupied_Units"] / bd_ba_summary["Total_Units"]) * 100
-        bd_ba_summary["Occupancy_Rate"] = bd_ba_summary["Occupancy_Rate"].round(2).astype(str) + "%"
-
-
-        total_rent = bd_ba_summary["Total_Rent"].sum()
-        total_units_all = bd_ba_summary["Total_Units"].sum()
-        occupied_units_all = bd_ba_summary["Occupied_Units"].sum()
-
-        overall_occupancy_rate = (occupied_units_all / total_units_all) * 100 if total_units_all > 0 else 0
-        overall_occupancy_rate = f"{round(overall_occupancy_rate, 2)}%"
-        bd_ba_summary["Total_Rent"] = bd_ba_summary["Total_Rent"].apply(lambda x: f"${x:,.2f}")
-
-        # 🔹 **Append "Total" Row**
-        total_row = pd.DataFrame([{
-            "BD/BA": "Total",
-            "Total_Rent": f"${total_rent:,.2f}",
-            "Occupancy_Rate": overall_occupancy_rate
-        }])
-
-        bd_ba_summary = bd_ba_summary.drop(columns=["Total_Units", "Occupied_Units"])
-        bd_ba_summary = bd_ba_summary.reset_index()
-        bd_ba_summary = pd.concat([bd_ba_summary, total_row], ignore_index=True)
-
-        three_month_df = dfs["T_rent"]  # Ensure the correct dataset key
-
-        # 1. Clean the Rent column (remove $ and ,)
-        three_month_df["Rent"] = (
-            three_month_df["Rent"]
-            .astype(str)
-            .str.replace(r"[$,]", "", regex=True)
-            .str.strip()
-        )
-
-        # 2. Then convert to numeric
-        three_month_df["Rent"] = pd.to_numeric(three_month_df["Rent"], errors="coerce")
-
-        # ✅ Print to confirm
-        three_month_total_units = three_month_df.groupby("BD/BA").size()
-        three_month_occupied_units = three_month_df[three_month_df["Status"].isin(["Current", "Notice-Unrented", "Notice-Rented"])].groupby("BD/BA").size()
-        three_month_bd_ba_summary = pd.DataFrame({
-            "Total_Rent": three_month_df.groupby("BD/BA")["Rent"].sum(),
-            "Total_Units": three_month_total_units,
-            "Occupied_Units": three_month_occupied_units
-        }).fillna(0)  # Fill NaN for BD/BA groups without occupied units
-
-        three_month_bd_ba_summary["Occupancy_Rate"] = (three_month_bd_ba_summary["Occupied_Units"] / three_month_bd_ba_summary["Total_Units"]) * 100
-        three_month_bd_ba_summary["Occupancy_Rate"] = three_month_bd_ba_summary["Occupancy_Rate"].round(2).astype(str) + "%"
-
-        three_month_total_rent = three_month_bd_ba_summary["Total_Rent"].sum()
-        three_month_total_units_all = three_month_bd_ba_summary["Total_Units"].sum()
-        three_month_occupied_units_all = three_month_bd_ba_summary["Occupied_Units"].sum()
-
-        three_month_overall_occupancy_rate = (three_month_occupied_units_all / three_month_total_units_all) * 100 if three_month_total_units_all > 0 else 0
-        three_month_overall_occupancy_rate = f"{round(three_month_overall_occupancy_rate, 2)}%"
-        three_month_bd_ba_summary["Total_Rent"] = three_month_bd_ba_summary["Total_Rent"].apply(lambda x: f"${x:,.2f}")
-
-        # 🔹 **Append "Total" Row**
-        three_month_total_row = pd.DataFrame([{
-            "BD/BA": "Total",
-            "Total_Rent": f"${three_month_total_rent:,.2f}",
-            "Occupancy_Rate": three_month_overall_occupancy_rate
-        }])
-
-        three_month_bd_ba_summary = three_month_bd_ba_summary.drop(columns=["Total_Units", "Occupied_Units"])
-        three_month_bd_ba_summary = three_month_bd_ba_summary.reset_index()
-        three_month_bd_ba_summary = pd.concat([three_month_bd_ba_summary, three_month_total_row], ignore_index=True)
-
-        beg_year_df = dfs["Beg Year"]  # Ensure the correct dataset key
-
-        # 1. Clean the Rent column (remove $ and ,)
-        beg_year_df["Rent"] = (
-            beg_year_df["Rent"]
-            .astype(str)
-            .str.replace(r"[$,]", "", regex=True)
-            .str.strip()
-        )
-
-        # 2. Then convert to numeric
-        beg_year_df["Rent"] = pd.to_numeric(beg_year_df["Rent"], errors="coerce")
-
-        # ✅ Print to confirm
-        beg_year_total_units = beg_year_df.groupby("BD/BA").size()
-        beg_year_occupied_units = beg_year_df[beg_year_df["Status"].isin(["Current", "Notice-Unrented", "Notice-Rented"])].groupby("BD/BA").size()
-        beg_year_bd_ba_summary = pd.DataFrame({
-            "Total_Rent": beg_year_df.groupby("BD/BA")["Rent"].sum(),
-            "Total_Units": beg_year_total_units,
-            "Occupied_Units": beg_year_occupied_units
-        }).fillna(0)  # Fill NaN for BD/BA groups without occupied units
-
-        beg_year_bd_ba_summary["Occupancy_Rate"] = (beg_year_bd_ba_summary["Occupied_Units"] / beg_year_bd_ba_summary["Total_Units"]) * 100
-        beg_year_bd_ba_summary["Occupancy_Rate"] = beg_year_bd_ba_summary["Occupancy_Rate"].round(2).astype(str) + "%"
-
-
-        beg_year_total_rent = beg_year_bd_ba_summary["Total_Rent"].sum()
-        beg_year_total_units_all = beg_year_bd_ba_summary["Total_Units"].sum()
-        beg_year_occupied_units_all = beg_year_bd_ba_summary["Occupied_Units"].sum()
-
-        beg_year_overall_occupancy_rate = (beg_year_occupied_units_all / beg_year_total_units_all) * 100 if beg_year_total_units_all > 0 else 0
-        beg_year_overall_occupancy_rate = f"{round(beg_year_overall_occupancy_rate, 2)}%"
-        beg_year_bd_ba_summary["Total_Rent"] = beg_year_bd_ba_summary["Total_Rent"].apply(lambda x: f"${x:,.2f}")
-
-        # 🔹 **Append "Total" Row**
-        beg_year_total_row = pd.DataFrame([{
-            "BD/BA": "Total",
-            "Total_Rent": f"${beg_year_total_rent:,.2f}",
-            "Occupancy_Rate": beg_year_overall_occupancy_rate
-        }])
-
-        beg_year_bd_ba_summary = beg_year_bd_ba_summary.drop(columns=["Total_Units", "Occupied_Units"])
-        beg_year_bd_ba_summary = beg_year_bd_ba_summary.reset_index()
-        beg_year_bd_ba_summary = pd.concat([beg_year_bd_ba_summary, beg_year_total_row], ignore_index=True)
-
-        same_day_df = dfs["Sameday"]  # Ensure the correct dataset key
-
-        # 1. Clean the Rent column (remove $ and ,)
-        same_day_df["Rent"] = (
-            same_day_df["Rent"]
-            .astype(str)
-            .str.replace(r"[$,]", "", regex=True)
-            .str.strip()
-        )
-
-        # 2. Then convert to numeric
-        same_day_df["Rent"] = pd.to_numeric(same_day_df["Rent"], errors="coerce")
-
-        # ✅ Print to confirm
-        same_day_total_units = same_day_df.groupby("BD/BA").size()
-        same_day_occupied_units = same_day_df[same_day_df["Status"].isin(["Current", "Notice-Unrented", "Notice-Rented"])].groupby("BD/BA").size()
-        same_day_bd_ba_summary = pd.DataFrame({
-            "Total_Rent": same_day_df.groupby("BD/BA")["Rent"].sum(),
-            "Total_Units": same_day_total_units,
-            "Occupied_Units": same_day_occupied_units
-        }).fillna(0)  # Fill NaN for BD/BA groups without occupied units
-
-        same_day_bd_ba_summary["Occupancy_Rate"] = (same_day_bd_ba_summary["Occupied_Units"] / same_day_bd_ba_summary["Total_Units"]) * 100
-        same_day_bd_ba_summary["Occupancy_Rate"] = same_day_bd_ba_summary["Occupancy_Rate"].round(2).astype(str) + "%"
-
-
-        same_day_total_rent = same_day_bd_ba_summary["Total_Rent"].sum()
-        same_day_total_units_all = same_day_bd_ba_summary["Total_Units"].sum()
-        same_day_occupied_units_all = same_day_bd_ba_summary["Occupied_Units"].sum()
-
-        same_day_overall_occupancy_rate = (same_day_occupied_units_all / same_day_total_units_all) * 100 if same_day_total_units_all > 0 else 0
-        same_day_overall_occupancy_rate = f"{round(same_day_overall_occupancy_rate, 2)}%"
-        same_day_bd_ba_summary["Total_Rent"] = same_day_bd_ba_summary["Total_Rent"].apply(lambda x: f"${x:,.2f}")
-
-        # 🔹 **Append "Total" Row**
-        same_day_total_row = pd.DataFrame([{
-            "BD/BA": "Total",
-            "Total_Rent": f"${same_day_total_rent:,.2f}",
-            "Occupancy_Rate": same_day_overall_occupancy_rate
-        }])
-
-        same_day_bd_ba_summary = same_day_bd_ba_summary.drop(columns=["Total_Units", "Occupied_Units"])
-        same_day_bd_ba_summary = same_day_bd_ba_summary.reset_index()
-        same_day_bd_ba_summary = pd.concat([same_day_bd_ba_summary, same_day_total_row], ignore_index=True)
-
-            # Rename columns before merging
-        bd_ba_summary = bd_ba_summary.rename(columns={
-            "Total_Rent": "Cur Total",
-            "Occupancy_Rate": "Cur Oc. Rate"
-        })
-
-        three_month_bd_ba_summary = three_month_bd_ba_summary.rename(columns={
-            "Total_Rent": "T3 Total",
-            "Occupancy_Rate": "T3 Oc. Rate"
-        })
-        beg_year_bd_ba_summary = beg_year_bd_ba_summary.rename(columns={
-            "Total_Rent": "BOY Total",
-            "Occupancy_Rate": "BOY Oc. Rate"
-        })
-        same_day_bd_ba_summary = same_day_bd_ba_summary.rename(columns={
-            "Total_Rent": "SDLY Total",
-            "Occupancy_Rate": "SDLY Oc. Rate"
-        })
-
-
-        # Merge on "BD/BA"
-        combined_summary = pd.merge(
-            bd_ba_summary,
-            three_month_bd_ba_summary,
-            on="BD/BA",
-            how="outer"
-        )
-
-        # Then merge with beginning of year summary
-        combined_summary = pd.merge(
-            combined_summary,
-            beg_year_bd_ba_summary,
-            on="BD/BA",
-            how="outer"
-        )
-
-        combined_summary = pd.merge(
-            combined_summary,
-            same_day_bd_ba_summary,
-            on="BD/BA",
-            how="outer"
+        # Period label -> snapshot; a new period is one more entry, computed in the same grouped pass
+        comparison_periods = {
+            "Cur": "Tenant Data",
+            "T3": "T_rent",
+            "BOY": "Beg Year",
+            "SDLY": "Sameday",
+        }
+        combined_summary = comparison_table(
+            {label: dfs[name] for label, name in comparison_periods.items() if name in dfs}
         )
-
-        # Optional: Fill missing with "-"
-        combined_summary = combined_summary.fillna("-")
      
           # Display in Streamlit
         st.write("### 📊 Comparison: Current vs 3-Month-Ago Rent & Occupancy")
@@ -351,7 +117,8 @@ with tab1:
         st.dataframe(combined_summary.reset_index(drop=True), use_container_width=True)
         
         def save_table_as_image(df, path):
-            
+            import matplotlib.pyplot as plt
+
             fig, ax = plt.subplots(figsize=(12, max(1.2, len(df) * 0.3)))  # Min height control
             ax.axis('tight')
             ax.axis('off')
@@ -530,20 +297,10 @@ with tab1:
 with tab2:
     col21, col22, col23, col24 = st.columns(4)
     
-    # Filter rows where Status == 'Current' and count them
-    new_work_orders = dfs["Work Orders"][dfs["Work Orders"]["Status"] == "New"].shape[0]
-    urgent_work_orders = dfs["Work Orders"][dfs["Work Orders"]["Priority"] == "Urgent"].shape[0]
-    # Count total rows (all units)
-    all_work_order= dfs["Work Orders"].shape[0]
-
-    
-    dfs["Work Orders"]["Amount"] = dfs["Work Orders"]["Amount"].replace("[\$,]", "", regex=True)  # Remove $ and ,
-    dfs["Work Orders"]["Amount"] = pd.to_numeric(dfs["Work Orders"]["Amount"], errors="coerce")  # Convert to number
-
-    # Calculate total rent
-    total_amount = dfs["Work Orders"]["Amount"].sum()
-    market_total_rent = dfs["Tenant Data"]["Market Rent"].sum()
-    total_move_out = dfs["Tenant Data"]["Move-out"].notnull().sum()
+    new_work_orders = headline["new_work_orders"]
+    urgent_work_orders = headline["urgent_work_orders"]
+    all_work_order = headline["total_work_orders"]
+    total_amount = headline["work_order_amount"]
 
     # Display the metric card
     col21.metric(label="🛠️ Total work order", value=f"{all_work_order}")
@@ -654,21 +411,16 @@ with tab2:
 with tab3:
     col31, col32, col33, col34 = st.columns(4)
 
-        # **Filter Vacancy and Work Order Counts**
-    rent_ready = dfs["Vacancies"][dfs["Vacancies"]["Rent Ready"] == "Yes"].shape[0]
-    urgent_work_orders = dfs["Work Orders"][dfs["Work Orders"]["Priority"] == "Urgent"].shape[0]
-    next_move_in = dfs["Vacancies"]["Next Move In"].notnull().sum()
-    
-    total_vacancy = dfs["Vacancies"].shape[0]
+    rent_ready = headline["rent_ready_units"]
+    next_move_in = headline["vacancy_move_ins"]
+    total_vacancy = headline["total_vacancy"]
 
         # **Convert "Days Vacant" to Numeric**
     dfs["Vacancies"]["Days Vacant"] = pd.to_numeric(
         dfs["Vacancies"]["Days Vacant"].replace("[\$,]", "", regex=True), 
         errors="coerce"
     )
-
-        # **Calculate Average Days Vacant**
-    avg_days_vacant = dfs["Vacancies"]["Days Vacant"].mean()
+    avg_days_vacant = headline["avg_days_vacant"]
 
         # **Display Metric Cards**
     col31.metric(label="🏠 Total Vacancy", value=f"{total_vacancy}")
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+
+# Shared by every Streamlit worker on the host; override to point workers at another disk
+CACHE_FOLDER = os.getenv("APPFOLIO_TAB_CACHE_DIR", os.path.join("data", ".tab_cache"))
+MAX_ENTRIES = 500
+
+
+def dataset_version(*paths):
+    """Version string of the snapshot files a result was computed from (name and mtime of each)."""
+    parts = []
+    for path in paths:
+        if path and os.path.exists(path):
+            parts.append(f"{os.path.basename(path)}:{os.stat(path).st_mtime_ns}")
+        else:
+            parts.append(f"{path}:missing")
+    return "|".join(parts)
+
+
+def cache_key(name, version, filters):
+    """Key for one computed result: which block, which data, and which filter state."""
+    payload = json.dumps(
+        {"name": name, "version": version,
+         "filters": {key: sorted(map(str, value)) if isinstance(value, (list, tuple, set)) else str(value)
+                     for key, value in sorted((filters or {}).items())}},
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def cached(name, version, filters, compute, folder=CACHE_FOLDER):
+    """Return the stored result for (name, version, filters), computing and storing it on a miss.
+
+    Results live on disk so every worker process reuses them; a new snapshot changes the
+    version and therefore the key, so nothing has to be invalidated explicitly.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{name}-{cache_key(name, version, filters)}.pkl")
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except (EOFError, pickle.UnpicklingError) as e:
+        logging.info(f"Discarding unreadable cache entry {path}: {e}")
+
+    result = compute()
+    # Sessions are threads of one process, so the temp name needs the thread as well as the pid
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    try:
+        os.replace(tmp_path, path)
+    except FileNotFoundError:
+        pass  # the folder was cleared under us; the result is still returned
+    prune(folder)
+    return result
+
+
+def prune(folder=CACHE_FOLDER, max_entries=MAX_ENTRIES):
+    """Keep only the `max_entries` most recently written results."""
+    entries = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".pkl")]
+    if len(entries) <= max_entries:
+        return 0
+    entries.sort(key=lambda p: os.stat(p).st_mtime)
+    for path in entries[:-max_entries]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another worker pruned it first
+    return len(entries) - max_entries
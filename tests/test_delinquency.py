@@ -0,0 +1,40 @@
+import pandas as pd
+
+from delinquency import DelinquencyLedger
+
+
+def write_rent_roll(folder, name, past_due):
+    path = folder / name
+    pd.DataFrame({
+        "Property Name": ["Elm St"], "Unit": ["1A"], "Tenant": ["CSL PLASMA INC"], "BD/BA": ["2/1"],
+        "Past Due": [past_due], "Late Count": ["0"],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_credits_are_not_stored_as_balances(tmp_path):
+    with DelinquencyLedger(str(tmp_path)) as ledger:
+        ledger.record(write_rent_roll(tmp_path, "credit.csv", "-1,250.00"), "2024-05-31", "2024-05-31T08:00:00")
+        assert ledger.balances(threshold=-10_000).empty
+        assert ledger.conn.execute("SELECT COUNT(*) FROM aging").fetchone()[0] == 0
+
+
+def test_debt_after_a_credit_is_aged_from_when_it_is_first_owed(tmp_path):
+    with DelinquencyLedger(str(tmp_path)) as ledger:
+        ledger.record(write_rent_roll(tmp_path, "credit.csv", "-1,250.00"), "2024-05-31", "2024-05-31T08:00:00")
+        ledger.record(write_rent_roll(tmp_path, "owing.csv", "$583.00"), "2025-05-06", "2025-05-06T08:00:00")
+        ledger.record(write_rent_roll(tmp_path, "still_owing.csv", "$583.00"), "2025-05-20", "2025-05-20T08:00:00")
+        balances = ledger.balances(threshold=500)
+
+    assert balances["Delinquent Since"].tolist() == ["2025-05-06"]
+    assert balances["Days Past Due"].tolist() == [14]
+    assert balances["Aging"].tolist() == ["0-30"]
+
+
+def test_ledger_with_credits_from_before_the_fix_is_emptied(tmp_path):
+    with DelinquencyLedger(str(tmp_path)) as ledger:
+        ledger.conn.execute("PRAGMA user_version = 0")
+        ledger.conn.execute("INSERT INTO balances VALUES ('old.csv', 'Elm St', '1A', 'X', '2/1', -50, 0)")
+        ledger.conn.commit()
+    with DelinquencyLedger(str(tmp_path)) as ledger:
+        assert ledger.conn.execute("SELECT COUNT(*) FROM balances").fetchone()[0] == 0
@@ -0,0 +1,106 @@
+from sms_verification import FakeSmsBackend, SimpleTextingBackend, TokenBucket, VerificationCodeProvider
+
+
+class FakeClock:
+    """Monotonic clock whose sleep() only moves time forward, optionally running a hook."""
+
+    def __init__(self, on_sleep=None):
+        self.now = 0.0
+        self.on_sleep = on_sleep
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+        if self.on_sleep:
+            self.on_sleep(self.now)
+
+
+class FakeResponse:
+    def __init__(self, status_code, json_body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._json = json_body or {}
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Answers with the queued responses, repeating the last one."""
+
+    def __init__(self, responses):
+        self.headers = {}
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+
+def simpletexting(clock, responses, **kwargs):
+    session = FakeSession(responses)
+    backend = SimpleTextingBackend("https://api.test/messages", "token", "5550100", session=session,
+                                   bucket=TokenBucket(rate=1.0, capacity=2, clock=clock, sleep=clock.sleep),
+                                   clock=clock, sleep=clock.sleep, **kwargs)
+    return backend, session
+
+
+def test_new_code_from_fake_backend():
+    backend = FakeSmsBackend([{"id": "old", "text": "Your code is 111111"}])
+    clock = FakeClock(on_sleep=lambda now: now > 2 and len(backend.messages) == 1
+                      and backend.push("Your AppFolio code is 424242"))
+    provider = VerificationCodeProvider(backend, timeout=30, clock=clock, sleep=clock.sleep)
+
+    assert provider.wait_for_new_code(provider.latest_message_id()) == "424242"
+    assert clock.now < 30
+
+
+def test_no_new_code_gives_up_at_the_timeout():
+    backend = FakeSmsBackend([{"id": "old", "text": "Your code is 111111"}])
+    clock = FakeClock()
+    provider = VerificationCodeProvider(backend, timeout=30, clock=clock, sleep=clock.sleep)
+
+    assert provider.wait_for_new_code("old") is None
+    assert clock.now == 30
+
+
+def test_rate_limited_backend_stays_within_the_provider_timeout():
+    clock = FakeClock()
+    backend, _ = simpletexting(clock, [FakeResponse(429, headers={"Retry-After": "30"})])
+    provider = VerificationCodeProvider(backend, timeout=30, clock=clock, sleep=clock.sleep)
+
+    # Five attempts 30s apart used to block for up to 150s
+    assert provider.wait_for_new_code("old") is None
+    assert clock.now <= 30
+
+
+def test_retries_until_the_api_recovers():
+    clock = FakeClock()
+    message = {"id": "m2", "text": "Your code is 424242"}
+    backend, session = simpletexting(clock, [
+        FakeResponse(503, headers={"Retry-After": "5"}),
+        FakeResponse(200, {"content": [message]}),
+    ])
+
+    assert backend.latest_message(time_budget=30) == message
+    assert session.calls == 2
+    assert 5 <= clock.now < 30
+
+
+def test_last_attempt_leaves_no_delay_for_the_next_caller():
+    clock = FakeClock()
+    backend, session = simpletexting(clock, [FakeResponse(429, headers={"Retry-After": "10"})], max_retries=2)
+
+    assert backend.latest_message() is None
+    assert clock.now == 10  # one wait between the two attempts, none after the last
+
+    session.responses = [FakeResponse(200, {"content": []})]
+    started = clock.now
+    assert backend.latest_message() is None
+    assert clock.now - started <= 1  # the bucket's usual 1 request/s, not the 10s backoff
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# Event date of each dashboard dataset and the format AppFolio exports it in
+EVENT_DATES = {
+    "Guest": ("Inquiry Received", "%m/%d/%Y at %I:%M %p"),  # 05/01/2024 at 06:12 AM
+    "Work Orders": ("Created At", "%m/%d/%Y"),
+    "Bill": ("Bill Date", "%m/%d/%Y"),
+}
+
+
+def parse_event_dates(values, fmt):
+    """Parse with the explicit format; only values that don't match it fall back to inference."""
+    parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+    leftover = parsed.isna() & values.notna()
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(values[leftover], format="mixed", errors="coerce")
+    return parsed
+
+
+class TimeIndex:
+    """A dataset's rows ordered by one event date, parsed once.
+
+    The frame itself is left untouched (it may be a shared read-only view); the index holds
+    the sort order and the sorted dates, and `between()` binary-searches them so a date range
+    costs O(log n) plus copying the rows in it. Rows without a date sort after all others
+    and are only returned by `all()`.
+    """
+
+    def __init__(self, df, column, fmt):
+        self.df = df
+        self.column = column
+        parsed = parse_event_dates(df[column], fmt).to_numpy("datetime64[ns]")
+        self.order = np.argsort(parsed, kind="stable")  # NaT sorts last
+        self.dates = parsed[self.order]
+        self.dated = int(np.count_nonzero(~np.isnat(self.dates)))
+
+    def __len__(self):
+        return len(self.order)
+
+    def _rows(self, lo, hi):
+        rows = self.df.take(self.order[lo:hi])
+        rows[self.column] = self.dates[lo:hi]
+        return rows
+
+    def bounds(self, start=None, end=None):
+        """Positions [lo, hi) of the rows with start <= date <= end."""
+        dated = self.dates[:self.dated]
+        lo = 0 if start is None else int(np.searchsorted(dated, np.datetime64(pd.Timestamp(start), "ns"), side="left"))
+        hi = self.dated if end is None else int(np.searchsorted(dated, np.datetime64(pd.Timestamp(end), "ns"), side="right"))
+        return lo, max(lo, hi)
+
+    def between(self, start=None, end=None):
+        """Rows dated within [start, end] (either may be None), as a new frame in date order."""
+        return self._rows(*self.bounds(start, end))
+
+    def all(self):
+        """Every row in date order, undated rows last, with the date column parsed."""
+        return self._rows(0, len(self.order))
+
+
+def time_index(name, df):
+    """TimeIndex of a dashboard dataset on its event date (see EVENT_DATES)."""
+    column, fmt = EVENT_DATES[name]
+    return TimeIndex(df, column, fmt)
@@ -0,0 +1,142 @@
+import datetime
+import hashlib
+import logging
+import os
+import threading
+
+import yaml
+
+from file_lock import file_lock
+
+TOKEN_FILE = "reset_tokens.yaml"
+TOKEN_TTL = datetime.timedelta(minutes=15)
+PRUNE_INTERVAL = 60  # seconds between background sweeps of expired tokens
+
+
+def hash_token(token):
+    """Tokens are stored and indexed by SHA-256, so the file never holds a usable token."""
+    return hashlib.sha256(token.strip().encode()).hexdigest()
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def parse_expiry(value):
+    expires = datetime.datetime.fromisoformat(value)
+    # Entries written before this store are naive UTC
+    return expires if expires.tzinfo else expires.replace(tzinfo=datetime.timezone.utc)
+
+
+class TokenStore:
+    """Password-reset tokens indexed by token hash, shared by every process through one YAML file.
+
+    Lookups hit an in-memory dict that is reloaded only when the file changes. Writes take an
+    exclusive lock, re-read the file, drop expired tokens and replace it atomically, so the file
+    only ever holds the handful of tokens issued in the last TOKEN_TTL.
+    """
+
+    def __init__(self, path=TOKEN_FILE, ttl=TOKEN_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.index = {}  # token hash -> (email, expires)
+        self.version = None
+        self.lock = threading.Lock()
+
+    def _file_lock(self):
+        return file_lock(self.path + ".lock")
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _reload_if_changed(self):
+        version = self._file_version()
+        if version == self.version:
+            return
+        index = {}
+        if version is not None:
+            with open(self.path, "r") as f:
+                entries = (yaml.safe_load(f) or {}).get("tokens") or []
+            for entry in entries:
+                # Migrates the old format, which stored the token itself
+                token_hash = entry.get("token_hash") or hash_token(entry["token"])
+                index[token_hash] = (entry["email"], parse_expiry(entry["expires"]))
+        self.index = index
+        self.version = version
+
+    def _prune(self, now):
+        expired = [token_hash for token_hash, (_, expires) in self.index.items() if expires <= now]
+        for token_hash in expired:
+            del self.index[token_hash]
+        return len(expired)
+
+    def _write(self):
+        entries = [
+            {"email": email, "expires": expires.isoformat(), "token_hash": token_hash}
+            for token_hash, (email, expires) in self.index.items()
+        ]
+        tmp_path = f"{self.path}.{os.getpid()}.part"
+        with open(tmp_path, "w") as f:
+            yaml.safe_dump({"tokens": entries}, f)
+        os.replace(tmp_path, self.path)
+        self.version = self._file_version()
+
+    def save(self, email, token):
+        """Record `token` for `email`, valid for the store's TTL."""
+        with self.lock, self._file_lock():
+            self._reload_if_changed()
+            now = utcnow()
+            self._prune(now)
+            self.index[hash_token(token)] = (email, now + self.ttl)
+            self._write()
+
+    def verify(self, token):
+        """Email the token was issued to, or None if it is unknown or expired."""
+        with self.lock:
+            self._reload_if_changed()
+            entry = self.index.get(hash_token(token or ""))
+        if entry is None or entry[1] <= utcnow():
+            return None
+        return entry[0]
+
+    def prune(self):
+        """Remove expired tokens from the file; return how many were dropped."""
+        with self.lock, self._file_lock():
+            self._reload_if_changed()
+            dropped = self._prune(utcnow())
+            if dropped:
+                self._write()
+                logging.info(f"Pruned {dropped} expired reset tokens")
+            return dropped
+
+    def start_pruning(self, interval=PRUNE_INTERVAL):
+        """Sweep expired tokens every `interval` seconds on a daemon thread."""
+        def sweep():
+            while not stop.is_set():
+                try:
+                    self.prune()
+                except Exception as e:
+                    logging.info(f"Reset token pruning failed: {e}")
+                stop.wait(interval)
+
+        stop = threading.Event()
+        threading.Thread(target=sweep, name="reset-token-pruner", daemon=True).start()
+        return stop
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_token_store(path=TOKEN_FILE):
+    """The process-wide TokenStore, with its background pruner running."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = TokenStore(path)
+            _store.start_pruning()
+        return _store
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from period_comparison import OCCUPIED_STATUSES, clean_money
+
+DELINQUENT_PAST_DUE = 500  # the delinquency chart's threshold
+
+TRANSITIONS = ("vacated", "leased", "went_delinquent")
+
+
+class UnitHistory:
+    """Every unit's month-end timeline from the trailing rent rolls, as (units x snapshots) arrays.
+
+    A unit's row is found through a dict keyed by (Property Name, Unit), so one timeline is a
+    single lookup and a slice. Transitions between consecutive snapshots are computed once for
+    all units:
+      vacated          occupied -> not occupied
+      leased           not occupied -> occupied
+      went_delinquent  Past Due crossed DELINQUENT_PAST_DUE
+    Units missing from a snapshot have status -1 and NaN amounts there, and never transition
+    into or out of it.
+    """
+
+    def __init__(self, keys, dates, statuses, status, rent, market_rent, past_due):
+        self.keys = keys  # list of (Property Name, Unit)
+        self.positions = {key: i for i, key in enumerate(keys)}
+        self.dates = dates  # sorted datetime64 snapshot dates
+        self.statuses = statuses  # status code -> status name
+        self.status = status  # int16 codes, -1 where the unit isn't in that snapshot
+        self.rent = rent
+        self.market_rent = market_rent
+        self.past_due = past_due
+
+        present = status >= 0
+        occupied = np.isin(status, [i for i, name in enumerate(statuses) if name in OCCUPIED_STATUSES])
+        both = present[:, :-1] & present[:, 1:]
+        self.transitions = {
+            "vacated": both & occupied[:, :-1] & ~occupied[:, 1:],
+            "leased": both & ~occupied[:, :-1] & occupied[:, 1:],
+            "went_delinquent": (past_due[:, :-1] <= DELINQUENT_PAST_DUE) & (past_due[:, 1:] > DELINQUENT_PAST_DUE),
+        }
+        self.vacant = present & ~occupied
+
+    @classmethod
+    def from_rentrolls(cls, df, date_column="date_str", date_format="%m-%d-%Y"):
+        """Build from the long 12-month table `union_rentrolls()` writes (one row per unit per month)."""
+        df = df.dropna(subset=["Property Name", "Unit"])
+        unit_codes, units = pd.factorize(pd.MultiIndex.from_arrays(
+            [df["Property Name"].astype(str), df["Unit"].astype(str)]
+        ))
+        date_codes, dates = pd.factorize(pd.to_datetime(df[date_column], format=date_format), sort=True)
+        status_codes, statuses = pd.factorize(df["Status"])
+
+        shape = (len(units), len(dates))
+        status = np.full(shape, -1, dtype=np.int16)
+        status[unit_codes, date_codes] = status_codes
+        amounts = {}
+        for column in ("Rent", "Market Rent", "Past Due"):
+            values = np.full(shape, np.nan, dtype=np.float32)
+            values[unit_codes, date_codes] = clean_money(df[column]).to_numpy(dtype=np.float32, na_value=np.nan)
+            amounts[column] = values
+
+        return cls(list(units), np.asarray(dates, dtype="datetime64[ns]"), list(statuses), status,
+                   amounts["Rent"], amounts["Market Rent"], amounts["Past Due"])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def units(self, properties=None):
+        """(Property Name, Unit) keys, optionally only those of `properties`."""
+        if properties is None:
+            return list(self.keys)
+        properties = set(properties)
+        return [key for key in self.keys if key[0] in properties]
+
+    def timeline(self, property_name, unit):
+        """One unit's status and amounts at each snapshot it appears in."""
+        i = self.positions[(str(property_name), str(unit))]
+        present = self.status[i] >= 0
+        return pd.DataFrame({
+            "Date": self.dates[present],
+            "Status": [self.statuses[code] for code in self.status[i][present]],
+            "Rent": self.rent[i][present],
+            "Market Rent": self.market_rent[i][present],
+            "Past Due": self.past_due[i][present],
+        })
+
+    def _rows(self, properties):
+        if properties is None:
+            return np.arange(len(self.keys))
+        properties = set(properties)
+        return np.array([i for i, key in enumerate(self.keys) if key[0] in properties], dtype=np.intp)
+
+    def events(self, kind, properties=None):
+        """Every `kind` transition (see TRANSITIONS) as rows of Property Name, Unit and the snapshot
+        Date it was first seen in."""
+        rows = self._rows(properties)
+        unit_idx, step = np.nonzero(self.transitions[kind][rows])
+        return pd.DataFrame({
+            "Property Name": [self.keys[rows[i]][0] for i in unit_idx],
+            "Unit": [self.keys[rows[i]][1] for i in unit_idx],
+            "Date": self.dates[step + 1],
+        })
+
+    def event_counts(self, properties=None):
+        """Transitions of each kind per snapshot date."""
+        rows = self._rows(properties)
+        return pd.DataFrame(
+            {kind: self.transitions[kind][rows].sum(axis=0) for kind in TRANSITIONS},
+            index=pd.DatetimeIndex(self.dates[1:], name="Date"),
+        )
+
+    def vacancy_durations(self, properties=None):
+        """Units vacant in the latest snapshot, with how long they have been vacant.
+
+        `Vacant Snapshots` counts consecutive month-ends vacant up to the latest one;
+        `Vacant Since` is the first of them.
+        """
+        rows = self._rows(properties)
+        vacant = self.vacant[rows]
+        # Consecutive vacant snapshots counted back from the latest one
+        streak = np.cumprod(vacant[:, ::-1], axis=1).sum(axis=1)
+        current = np.nonzero(streak)[0]
+        since = self.dates[len(self.dates) - streak[current]]
+        latest = self.dates[-1] if len(self.dates) else None
+        return pd.DataFrame({
+            "Property Name": [self.keys[rows[i]][0] for i in current],
+            "Unit": [self.keys[rows[i]][1] for i in current],
+            "Status": [self.statuses[code] for code in self.status[rows[current], -1]],
+            "Vacant Snapshots": streak[current],
+            "Vacant Since": since,
+            "Days Vacant": (latest - since).astype("timedelta64[D]").astype(int) if latest is not None else [],
+        }).sort_values("Vacant Snapshots", ascending=False, ignore_index=True)
@@ -0,0 +1,187 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as VerifyTimeout
+from contextlib import contextmanager
+
+import bcrypt
+import yaml
+
+USERS_FILE = "users.yaml"
+# Failed logins, shared by every worker on the host (next to the tab cache and the other data stores)
+THROTTLE_DB = os.getenv("APPFOLIO_THROTTLE_DB", os.path.join("data", "login_throttle.db"))
+
+THROTTLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS login_failures (
+    key TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS login_failures_key ON login_failures (key, failed_at);
+"""
+
+# Verified against when the email is unknown, so a miss costs the same single bcrypt check as a hit.
+# A fixed cost-12 hash of a throwaway password: hashing one at import would add a bcrypt round to startup.
+_DUMMY_HASH = "$2b$12$ST9zyD1U/hWt505oiO1lo.Mrt7DhamhB2oVdr6jt0NeOnna8F9ENO"
+
+# bcrypt releases the GIL, so verifying in a small pool keeps other sessions' reruns moving
+_verify_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bcrypt")
+
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+def verify_password(check, *args, timeout=10):
+    """Run a password check on the bcrypt pool. Raises LoginBusy if it isn't done within `timeout`."""
+    future = _verify_pool.submit(check, *args)
+    try:
+        return future.result(timeout)
+    except VerifyTimeout:
+        future.cancel()  # still queued behind a login burst: drop it
+        raise LoginBusy(timeout) from None
+
+
+class LoginBusy(Exception):
+    """Raised when a login can't be verified in time because the server is busy."""
+
+    def __init__(self, timeout):
+        super().__init__(f"Password check not done within {timeout:g}s")
+        self.timeout = timeout
+
+
+class LoginThrottled(Exception):
+    """Raised when an email or client has too many recent failed logins."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed logins; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LoginThrottle:
+    """Sliding-window limit on failed logins per key (an email or a client IP).
+
+    Failures are kept in a SQLite table every Streamlit worker on the host shares, so the
+    limit holds across workers and restarts.
+    """
+
+    def __init__(self, max_failures=5, window=15 * 60, db_path=THROTTLE_DB, clock=time.time):
+        self.max_failures = max_failures
+        self.window = window
+        self.db_path = db_path
+        self.clock = clock
+        self.initialised = False
+
+    @contextmanager
+    def _connect(self):
+        if not self.initialised:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            if not self.initialised:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(THROTTLE_SCHEMA)
+                self.initialised = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def check(self, *keys):
+        """Raise LoginThrottled if any key is over the limit."""
+        now = self.clock()
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT COUNT(*), MIN(failed_at) FROM login_failures WHERE key IN ({', '.join('?' * len(keys))}) "
+                "AND failed_at > ? GROUP BY key", (*keys, now - self.window)).fetchall()
+        for failures, oldest in rows:
+            if failures >= self.max_failures:
+                raise LoginThrottled(self.window - (now - oldest))
+
+    def record_failure(self, *keys):
+        now = self.clock()
+        with self._connect() as conn:
+            conn.executemany("INSERT INTO login_failures (key, failed_at) VALUES (?, ?)", [(key, now) for key in keys])
+            conn.execute("DELETE FROM login_failures WHERE failed_at <= ?", (now - self.window,))
+
+    def reset(self, *keys):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM login_failures WHERE key IN ({', '.join('?' * len(keys))})", keys)
+
+
+class UserStore:
+    """users.yaml parsed once per change and indexed by normalised email.
+
+    A login costs one dictionary lookup and exactly one bcrypt verification, done on a
+    worker thread, whatever the number of users.
+    """
+
+    def __init__(self, path=USERS_FILE, throttle=None, verify_timeout=10):
+        self.path = path
+        self.throttle = throttle or LoginThrottle()
+        self.verify_timeout = verify_timeout
+        self.by_email = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        stat = os.stat(self.path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            with open(self.path, "r") as f:
+                users = (yaml.safe_load(f) or {}).get("users", [])
+            self.by_email = {normalize_email(user["email"]): user for user in users}
+            self.version = version
+            logging.info(f"Loaded {len(self.by_email)} users from {self.path}")
+
+    def users(self):
+        self._reload_if_changed()
+        return list(self.by_email.values())
+
+    def get(self, email):
+        """The users.yaml entry for `email`, or None."""
+        self._reload_if_changed()
+        return self.by_email.get(normalize_email(email))
+
+    def authenticate(self, email, password, client_ip=None):
+        """Return {"name", "email", "role"} for valid credentials, else None.
+
+        Raises LoginThrottled when the email or client IP has too many recent failures, and
+        LoginBusy when the password check doesn't get a turn on the bcrypt pool in time.
+        """
+        email = normalize_email(email)
+        keys = [f"email:{email}"] + ([f"ip:{client_ip}"] if client_ip else [])
+        self.throttle.check(*keys)
+
+        user = self.get(email)
+        hashed = user["password"] if user else _DUMMY_HASH
+        try:
+            match = verify_password(bcrypt.checkpw, password.encode(), hashed.encode(), timeout=self.verify_timeout)
+        except ValueError as e:  # malformed hash in users.yaml
+            logging.info(f"bcrypt error for {email}: {e}")
+            match = False
+
+        if user and match:
+            self.throttle.reset(f"email:{email}")
+            return {"name": user["name"], "email": user["email"], "role": user.get("role", "user")}
+
+        self.throttle.record_failure(*keys)
+        return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_user_store(path=USERS_FILE):
+    """The process-wide UserStore, shared by every session."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = UserStore(path)
+        return _store
@@ -1,24 +1,18 @@
-import psycopg2
 import hashlib
 
+from db_auth import get_db_backend
+from user_store import LoginThrottled
+
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def check_login(email, password):
-    hashed_pw = hash_password(password)
     try:
-        conn = psycopg2.connect(
-            host="localhost",
-            database="appfolio_db",  # Replace with your actual database name
-            user="postgres",  # Replace with your username
-            password="123"  # Replace with your password (use env vars in production!)
-        )
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE email=%s AND password=%s", (email, hashed_pw))
-        user = cur.fetchone()  # Fetch the user data
-        cur.close()
-        conn.close()
-        return user  # Return the user data (or None if not found)
+        # Pooled connection with a prepared lookup, instead of a new connection per login
+        return get_db_backend().authenticate(email, password)  # {"name", "email", "role"} or None
+    except LoginThrottled as e:
+        print(f"Login throttled: {e}")
+        return None
     except Exception as e:
         print(f"Database error: {e}")  # Log the error
-        return None  # Return None on error
\ No newline at end of file
+        return None  # Return None on error
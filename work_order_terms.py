@@ -0,0 +1,101 @@
+import io
+from functools import lru_cache
+
+import pandas as pd
+
+import tab_cache
+
+EXTRA_STOPWORDS = {
+    "unit", "please", "de", "la", "y", "need", "working", "lo", "needs", "por", "come", "fix", "que", "se", "en", "el",
+    "agua", "funciona", "cocina"
+}
+
+# WordCloud's own tokenizer pattern, so the index counts the same words generate() would
+TOKEN_PATTERN = r"\w[\w']*"
+MAX_WORDS = 100
+
+
+@lru_cache(maxsize=1)
+def custom_stopwords():
+    # wordcloud pulls in matplotlib, so it is only imported once a word cloud is needed
+    from wordcloud import STOPWORDS
+
+    return {word.lower() for word in STOPWORDS} | EXTRA_STOPWORDS
+
+
+def build_term_index(df_work):
+    """Term counts per property and month of `Created At`, tokenizing every description once.
+
+    Returns a long frame of (Property Name, Month, Term, Count).
+    """
+    descriptions = df_work[["Property Name", "Created At", "Job Description"]].dropna(subset=["Job Description"])
+    months = pd.to_datetime(descriptions["Created At"], errors="coerce").dt.strftime("%Y-%m")
+
+    terms = (
+        descriptions["Job Description"].astype(str).str.lower()
+        .str.findall(TOKEN_PATTERN)
+        .explode()
+        .dropna()
+    )
+    terms = terms.str.replace(r"'s$", "", regex=True)
+    terms = terms[~terms.str.isdigit() & ~terms.isin(custom_stopwords()) & (terms != "")]
+
+    tokens = pd.DataFrame({
+        "Property Name": descriptions["Property Name"].reindex(terms.index).to_numpy(),
+        "Month": months.reindex(terms.index).to_numpy(),
+        "Term": terms.to_numpy(),
+    })
+    return tokens.groupby(["Property Name", "Month", "Term"], dropna=False).size().rename("Count").reset_index()
+
+
+def term_index(df_work, version):
+    """The term index of one Work Orders snapshot, built once and shared by every worker."""
+    return tab_cache.cached("work_order_terms", version, {}, lambda: build_term_index(df_work))
+
+
+def term_frequencies(index, properties=None, months=None, max_words=MAX_WORDS):
+    """Top `max_words` terms for the given properties and months (all when None)."""
+    if properties is not None:
+        index = index[index["Property Name"].isin(properties)]
+    if months is not None:
+        index = index[index["Month"].isin(months)]
+    counts = index.groupby("Term")["Count"].sum()
+
+    # Fold plurals into their singular, as WordCloud's normalize_plurals does
+    plurals = [term for term in counts.index if term.endswith("s") and not term.endswith("ss") and term[:-1] in counts.index]
+    if plurals:
+        counts = counts.add(pd.Series(counts[plurals].to_numpy(), index=[term[:-1] for term in plurals]), fill_value=0)
+        counts = counts.drop(plurals).astype(int)
+
+    return counts.nlargest(max_words).to_dict()
+
+
+def render_word_cloud(frequencies):
+    """PNG bytes of the word cloud for pre-aggregated term frequencies."""
+    from wordcloud import WordCloud
+
+    cloud = WordCloud(
+        width=800,
+        height=400,
+        background_color='white',
+        colormap='tab10',
+        max_words=MAX_WORDS,
+        contour_width=0.5,
+        contour_color='steelblue',
+    ).generate_from_frequencies(frequencies)
+    out = io.BytesIO()
+    cloud.to_image().save(out, format="PNG")
+    return out.getvalue()
+
+
+def word_cloud_png(df_work, version, properties, filters):
+    """Cached word cloud image for one filter state, or None when there are no terms.
+
+    `properties` are the Property Name values left after the tab's filters; `filters` is the
+    widget state that produced them and keys the image cache.
+    """
+    def compute():
+        frequencies = term_frequencies(term_index(df_work, version), properties=properties)
+        return render_word_cloud(frequencies) if frequencies else None
+
+    return tab_cache.cached("work_order_cloud", version, filters, compute)